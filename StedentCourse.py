@@ -1,57 +1,410 @@
+import time
+# 启动计时从导入本模块开始
+STARTUP_STARTED = time.perf_counter()
+import os
 import sys
-import pandas as pd
 from PyQt5 import QtWidgets, QtGui, QtCore
 from PyQt5.QtWidgets import (QFileDialog, QMessageBox, QLabel, QTableWidget,
                              QTableWidgetItem, QComboBox, QCompleter, QLineEdit,
                              QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
-                             QInputDialog)
+                             QInputDialog, QTableView, QHeaderView,
+                             QAbstractItemView, QStyledItemDelegate, QCheckBox)
 from PyQt5.QtGui import QIntValidator, QDoubleValidator
-from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtCore import Qt, pyqtSignal, QStringListModel
 import sqlite3
-import matplotlib.pyplot as plt
 from collections import defaultdict
-import matplotlib.font_manager as fm
+from schedule_engine import ScheduleEngine, week_mask
+import schedule_clash
+import schedule_db
+import schedule_io
+import schedule_search
+import schedule_trace
+from schedule_trace import traced
+from schedule_tasks import Task, TaskRunner
+# pandas、matplotlib 导入较慢，只在导出和绘图时才导入
+IMPORT_SECONDS = time.perf_counter() - STARTUP_STARTED
+
+# 设置后关闭窗口时把性能记录写入该 JSON 文件
+TRACE_FILE_ENV = "SCHEDULE_TRACE"
+
+# 主课表的列定义
+SCHEDULE_HEADERS = schedule_db.SCHEDULE_HEADERS
+COL_STUDENT, COL_CLASS, COL_COURSE, COL_CREDIT, COL_WEEKDAY, COL_TIME_SLOT, COL_SEMESTER, COL_CLASSROOM = range(8)
+# 班级、学分、周数由学生/课程自动填充，不可直接编辑
+EDITABLE_COLUMNS = {COL_STUDENT, COL_COURSE, COL_WEEKDAY, COL_TIME_SLOT, COL_CLASSROOM}
+CLASSROOM_PATTERN = r"H?[124]\d{2}[1-9]"
+# 筛选栏输入停顿多久（毫秒）后才查询
+FILTER_DELAY_MS = 300
+
+
+class ScheduleTableModel(QtCore.QAbstractTableModel):
+    """课表数据模型：只保存行数据，由视图按需绘制可见行
+
+    每行对应一条课表记录的 id（新增的行为 None），编辑和删除时记录改动的 id，
+    保存时只写入新增、修改和删除的行。用 set_query 加载时先只读第一页，视图
+    滚动到底部时再通过 fetchMore 读取下一页；点击表头排序时发出 sort_requested，
+    由窗口按新的排序重新查询。
+    """
+    # 学生或课程单元格被编辑后发出 (行号, 列号, 新值)，用于自动填充班级/学分/周数
+    cell_edited = pyqtSignal(int, int, str)
+    # 点击表头排序时发出 (列号, 是否降序)，列号为 -1 表示取消排序
+    sort_requested = pyqtSignal(int, bool)
+    # 滚动时读取下一页失败（如数据库被锁住）时发出错误信息，滚动到底部时会再次读取
+    fetch_failed = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+        self.ids = []
+        # 修改过的行和删除的行的课表 id
+        self.dirty_ids = set()
+        self.deleted_ids = set()
+        # 分页读取：page_loader(起点) -> (行, 下一页的起点)，next_after 为 None 表示已全部读入
+        self.page_loader = None
+        self.next_after = None
+        # 在本地新增并保存的行的 id，之后的分页结果中再出现时跳过
+        self.local_ids = set()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(SCHEDULE_HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return self.rows[index.row()][index.column()]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return SCHEDULE_HEADERS[section]
+        return str(section + 1)
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if index.column() in EDITABLE_COLUMNS:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        value = "" if value is None else str(value)
+        row, column = index.row(), index.column()
+        if self.rows[row][column] == value:
+            return False
+        self.set_cell(row, column, value)
+        if column in (COL_STUDENT, COL_COURSE):
+            self.cell_edited.emit(row, column, value)
+        return True
+
+    def set_cell(self, row, column, value):
+        """直接写入单元格（不触发自动填充）"""
+        self.rows[row][column] = value
+        if self.ids[row] is not None:
+            self.dirty_ids.add(self.ids[row])
+        index = self.index(row, column)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+
+    @staticmethod
+    def split_rows(rows):
+        """SCHEDULE_ROWS_SQL 的结果 -> (显示的行, 课表 id)，None 显示为空字符串"""
+        return ([["" if value is None else str(value) for value in row[:-1]] for row in rows],
+                [row[-1] for row in rows])
+
+    def set_rows(self, rows, page_loader=None, next_after=None):
+        """整体替换为 SCHEDULE_ROWS_SQL 的结果，丢弃未保存的改动"""
+        self.beginResetModel()
+        self.rows, self.ids = self.split_rows(rows)
+        self.dirty_ids.clear()
+        self.deleted_ids.clear()
+        self.local_ids.clear()
+        self.page_loader = page_loader
+        self.next_after = next_after
+        self.endResetModel()
+
+    def set_query(self, page_loader):
+        """按 page_loader 分页加载：先读第一页，其余在滚动时读取"""
+        rows, next_after = page_loader(None)
+        self.set_rows(rows, page_loader, next_after)
+
+    def canFetchMore(self, parent=QtCore.QModelIndex()):
+        return not parent.isValid() and self.next_after is not None
+
+    def fetchMore(self, parent=QtCore.QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        try:
+            rows, self.next_after = self.page_loader(self.next_after)
+        except sqlite3.Error as e:
+            # 在 Qt 事件循环中抛出的异常会使程序退出，这里只报告错误
+            print(f"读取课表失败: {str(e)}")
+            self.fetch_failed.emit(str(e))
+            return
+        rows = [row for row in rows if row[-1] not in self.local_ids]
+        if not rows:
+            return
+        # 读到的行放在末尾尚未保存的新行之前
+        first = len(self.rows)
+        while first > 0 and self.ids[first - 1] is None:
+            first -= 1
+        values, ids = self.split_rows(rows)
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(rows) - 1)
+        self.rows[first:first] = values
+        self.ids[first:first] = ids
+        self.endInsertRows()
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        self.sort_requested.emit(column, order == Qt.DescendingOrder)
+
+    def append_row(self, values=None):
+        """追加一个尚未保存的新行"""
+        row = len(self.rows)
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self.rows.append(list(values) if values else [""] * len(SCHEDULE_HEADERS))
+        self.ids.append(None)
+        self.endInsertRows()
+        return row
+
+    def append_rows(self, rows):
+        """追加已写入数据库的 SCHEDULE_ROWS_SQL 结果；还有未读的页时不追加，由分页按顺序读入"""
+        if not rows or self.next_after is not None:
+            return
+        first = len(self.rows)
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(rows) - 1)
+        values, ids = self.split_rows(rows)
+        self.rows.extend(values)
+        self.ids.extend(ids)
+        self.endInsertRows()
+
+    def remove_row(self, row):
+        """移除一行，已保存的行按 id 记为待删除"""
+        if 0 <= row < len(self.rows):
+            self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+            schedule_id = self.ids.pop(row)
+            del self.rows[row]
+            if schedule_id is not None:
+                self.dirty_ids.discard(schedule_id)
+                self.deleted_ids.add(schedule_id)
+            self.endRemoveRows()
+
+    def has_changes(self):
+        """有待删除、修改过的行，或填了内容的新行；空白的新行不算改动"""
+        return bool(self.deleted_ids or self.dirty_ids or
+                    any(schedule_id is None and any(values) for schedule_id, values in zip(self.ids, self.rows)))
+
+    def changed_rows(self):
+        """需要保存的行号：新增的行和修改过的行"""
+        dirty_ids = self.dirty_ids
+        return [row for row, schedule_id in enumerate(self.ids)
+                if schedule_id is None or schedule_id in dirty_ids]
+
+    def mark_saved(self, rows, saved_ids):
+        """保存成功后记下新行的 id 并清空改动记录"""
+        for row, schedule_id in zip(rows, saved_ids):
+            if self.ids[row] is None and schedule_id is not None:
+                self.local_ids.add(schedule_id)
+            self.ids[row] = schedule_id
+        self.dirty_ids.clear()
+        self.deleted_ids.clear()
+
+
+class ScheduleItemDelegate(QStyledItemDelegate):
+    """只为正在编辑的单元格创建编辑控件"""
+
+    def __init__(self, manager, parent=None):
+        super().__init__(parent)
+        self.manager = manager
+
+    def createEditor(self, parent, option, index):
+        column = index.column()
+        if column == COL_STUDENT:
+            return self.manager.create_student_combobox(parent=parent)
+        if column == COL_COURSE:
+            return self.manager.create_course_combobox(parent=parent)
+        if column == COL_WEEKDAY:
+            return self.manager.create_weekday_combobox(parent=parent)
+        if column == COL_TIME_SLOT:
+            return self.manager.create_time_slot_combobox(parent=parent)
+        if column == COL_CLASSROOM:
+            return self.manager.create_classroom_combobox(index.row(), parent)
+        return None
+
+    def setEditorData(self, editor, index):
+        value = index.data(Qt.EditRole) or ""
+        if isinstance(editor, QComboBox):
+            editor.setCurrentText(value)
+        elif isinstance(editor, QLineEdit):
+            editor.setText(value)
+
+    def setModelData(self, editor, model, index):
+        if isinstance(editor, QComboBox) and index.column() == COL_CLASSROOM:
+            text = editor.currentText().strip()
+            # 列表中的教室直接接受，手动输入的须符合教室编号格式
+            if text and editor.findText(text) < 0 and not editor.lineEdit().hasAcceptableInput():
+                return
+            if text:
+                self.manager.add_classroom_prefix(editor.lineEdit())
+            model.setData(index, editor.currentText().strip())
+        elif isinstance(editor, QComboBox):
+            model.setData(index, editor.currentText().strip())
+        elif isinstance(editor, QLineEdit):
+            if index.column() == COL_CLASSROOM:
+                if not editor.hasAcceptableInput() and editor.text():
+                    return
+                if editor.text():
+                    self.manager.add_classroom_prefix(editor)
+            model.setData(index, editor.text())
+
+    def updateEditorGeometry(self, editor, option, index):
+        editor.setGeometry(option.rect)
+
+
+class SearchCompleter(QCompleter):
+    """候选来自检索索引的补全器：每次输入后重新查询，弹出的候选不再按前缀过滤"""
+
+    def __init__(self, search, parent=None):
+        super().__init__(parent)
+        self.search = search
+        self.setModel(QStringListModel(self))
+        self.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+        self.setMaxVisibleItems(schedule_search.SEARCH_LIMIT)
+
+    def attach(self, widget):
+        """装到文本框或可编辑的下拉框上；输入框先发出 textEdited，之后才弹出候选"""
+        widget.setCompleter(self)
+        line_edit = widget if isinstance(widget, QLineEdit) else widget.lineEdit()
+        line_edit.textEdited.connect(self.update_matches)
+
+    def update_matches(self, text):
+        self.model().setStringList(self.search(text))
+
 
 class ScheduleManager(QtWidgets.QMainWindow):
     def __init__(self):
         super().__init__()
+        started = time.perf_counter()
         self.db_connection = self.connect_to_database()
+        # 自动填充班级、学分、周数时使用的缓存，学生或课程变化时失效；
+        # 启动时用一次查询把学生和课程全部读入
+        self.lookup_cache = schedule_db.LookupCache(self.db_connection)
+        self.lookup_cache.load_snapshot()
+        self.db_open_seconds = time.perf_counter() - started
+        schedule_trace.TRACER.add_span("打开数据库", self.db_open_seconds)
         self.imported_file_path = None
+        self.schedule_engine = None  # 当前课表的排课引擎，用于增量排课
+        # 只登记教室占用的引擎，用于列出空闲教室：在后台建立，保存时增量更新
+        self.room_engine = None
+        self.room_engine_version = 0
+        self.room_engine_task = None
+        self.chart_panel = None  # 统计图表面板，第一次打开时创建
+        self.trace_panel = None  # 性能面板，第一次打开时创建
+        self.search_indexes = None  # 姓名、班级、课程的检索索引，第一次补全时建立
+        # 主表格的筛选条件和排序列（None 表示按录入顺序），由筛选栏和表头设置
+        self.schedule_filters = {}
+        self.sort_column = None
+        self.sort_descending = False
         self.student_list = []  # 添加学生列表属性
         self.course_list = []   # 添加课程列表属性
+        self.time_slots = schedule_db.TIME_SLOTS
+        self.weekdays = schedule_db.WEEKDAYS
+        # 所有下拉框和补全器共用的列表模型，刷新时只需更新一次
+        self.student_model = QStringListModel(self)
+        self.course_model = QStringListModel(self)
+        self.time_slot_model = QStringListModel(self.time_slots, self)
+        self.weekday_model = QStringListModel(self.weekdays, self)
         self.initUI()
-        self.load_courses()
+        # 耗时操作在后台线程中执行，进度显示在状态栏
+        self.task_runner = TaskRunner(self, schedule_db.DB_PATH)
+        self.task_runner.writing_changed.connect(self.on_writing_changed)
         self.update_dropdowns()  # 初始化时更新下拉列表
-        self.time_slots = ["上午一段", "上午二段", "下午一段", "下午二段", "晚修"]
-        self.weekdays = ["周一", "周二", "周三", "周四", "周五", "周六"]  # 添加星期几列表
+        self.reload_room_engine()
+        # 窗口第一次绘制时记录启动耗时（见 paintEvent）
+        self.first_paint_seconds = None
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.first_paint_seconds is None:
+            self.first_paint_seconds = time.perf_counter() - STARTUP_STARTED
+            # 本次绘制结束后再汇报，显示状态栏消息引起的重绘不计入启动耗时
+            QtCore.QTimer.singleShot(0, self.report_startup_time)
+
+    def report_startup_time(self):
+        first_paint = self.first_paint_seconds
+        schedule_trace.TRACER.add_span("启动", first_paint)
+        message = (f"启动耗时 {first_paint:.2f} 秒（导入模块 {IMPORT_SECONDS:.2f} 秒，"
+                   f"打开数据库 {self.db_open_seconds:.2f} 秒）")
+        print(message)
+        self.statusBar().showMessage(message, 5000)
+
+    def on_writing_changed(self, writing):
+        """后台任务写入数据库期间暂停编辑、排序和筛选，结束后恢复"""
+        if writing:
+            self.filter_timer.stop()
+        self.table_view.setEditTriggers(QAbstractItemView.NoEditTriggers if writing else self.edit_triggers)
+        self.table_view.horizontalHeader().setSectionsClickable(not writing)
+        self.table_view.verticalHeader().setSectionsClickable(not writing)
+        for widget in [*self.filter_edits.values(), self.filter_weekday_combobox, self.filter_week_combobox,
+                       self.clear_filter_btn, self.add_row_btn, self.init_btn,
+                       self.manage_students_btn, self.manage_courses_btn]:
+            widget.setEnabled(not writing)
+
+    def closeEvent(self, event):
+        self.task_runner.shutdown()
+        trace_file = os.environ.get(TRACE_FILE_ENV)
+        if trace_file:
+            schedule_trace.TRACER.dump(trace_file)
+        super().closeEvent(event)
 
     def initUI(self):
         self.setWindowTitle("学生课表管理程序")
-        self.setGeometry(100, 100, 1100, 670) 
+        self.setGeometry(100, 100, 1100, 710) 
 
         # Status Label
         self.status_label = QLabel("等待导入表格中（如不导入数据则无法导出为 Excel 表格）", self)
         self.status_label.setGeometry(50, 10, 1000, 30)
         self.status_label.setStyleSheet("color: gray;")
 
-        # Table Widget
-        self.table_widget = QTableWidget(self)
-        self.table_widget.setGeometry(50, 50, 1000, 400)
-        self.table_widget.setColumnCount(8)
-        self.table_widget.setHorizontalHeaderLabels(['学生姓名', '班级', '课程名称', '学分', '星期', '行课时间', '周数', '教室'])
-    
+        self.create_filter_bar()
+
+        # Table View：模型保存数据，委托只在编辑时创建控件
+        self.schedule_model = ScheduleTableModel(self)
+        self.schedule_model.cell_edited.connect(self.on_schedule_cell_edited)
+        self.table_view = QTableView(self)
+        self.table_view.setGeometry(50, 80, 1000, 380)
+        self.table_view.setModel(self.schedule_model)
+        # 排序由数据库完成；初始不排序，按录入顺序显示
+        self.table_view.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.table_view.setSortingEnabled(True)
+        self.schedule_model.sort_requested.connect(self.on_sort_requested)
+        self.schedule_model.fetch_failed.connect(
+            lambda message: self.statusBar().showMessage(f"读取课表失败: {message}", 5000))
+        self.table_view.setItemDelegate(ScheduleItemDelegate(self, self.table_view))
+        self.edit_triggers = (QAbstractItemView.DoubleClicked | QAbstractItemView.SelectedClicked |
+                              QAbstractItemView.EditKeyPressed | QAbstractItemView.AnyKeyPressed)
+        self.table_view.setEditTriggers(self.edit_triggers)
+        # 固定行高，滚动时无需逐行计算高度
+        self.table_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.table_view.verticalHeader().setDefaultSectionSize(26)
+
         # 调整列宽
-        self.table_widget.setColumnWidth(0, 100)  # 学生姓名列
-        self.table_widget.setColumnWidth(1, 160)  # 班级列
-        self.table_widget.setColumnWidth(2, 200)  # 课程名称列
-        self.table_widget.setColumnWidth(3, 40)   # 学分列
-        self.table_widget.setColumnWidth(4, 60)   # 星期列
-        self.table_widget.setColumnWidth(5, 120)  # 行课时间列
-        self.table_widget.setColumnWidth(6, 40)  # 周数列
-        self.table_widget.setColumnWidth(7, 100)  # 教室列
+        self.table_view.setColumnWidth(0, 100)  # 学生姓名列
+        self.table_view.setColumnWidth(1, 160)  # 班级列
+        self.table_view.setColumnWidth(2, 200)  # 课程名称列
+        self.table_view.setColumnWidth(3, 40)   # 学分列
+        self.table_view.setColumnWidth(4, 60)   # 星期列
+        self.table_view.setColumnWidth(5, 120)  # 行课时间列
+        self.table_view.setColumnWidth(6, 40)  # 周数列
+        self.table_view.setColumnWidth(7, 100)  # 教室列
 
-        
-        self.table_widget.verticalHeader().sectionClicked.connect(self.delete_row)
+        self.table_view.verticalHeader().sectionClicked.connect(self.delete_row)
 
         # Original Buttons
         self.import_btn = QtWidgets.QPushButton("导入课程信息", self)
@@ -121,6 +474,11 @@ class ScheduleManager(QtWidgets.QMainWindow):
         self.student_combobox.setGeometry(790, 620, 200, 30)
         self.load_student_combobox()
 
+        # 学生或课程变化时只调整受影响的排课，而不是重新排课
+        self.incremental_checkbox = QCheckBox("增量排课", self)
+        self.incremental_checkbox.setGeometry(1000, 620, 90, 30)
+        self.incremental_checkbox.setChecked(True)
+
         self.plot_btn = QtWidgets.QPushButton("统计上课频次", self)
         self.plot_btn.setGeometry(50, 570, 200, 40)
         self.plot_btn.clicked.connect(self.plot_class_frequency)
@@ -133,531 +491,498 @@ class ScheduleManager(QtWidgets.QMainWindow):
         self.export_class_btn.setGeometry(470, 570, 200, 40)
         self.export_class_btn.clicked.connect(self.export_class_statistics)
 
-    def count_classes_per_weekday(self):
-        selected_class = self.class_combobox.currentText()
-        selected_week = self.week_combobox.currentText().replace("第", "").replace("周", "")
-        
-        cursor = self.db_connection.cursor()
-        cursor.execute("""
-            SELECT s.weekday, COUNT(*) 
-            FROM schedule s
-            JOIN students st ON s.student_name = st.student_name
-            JOIN courses c ON s.course_name = c.course_name
-            WHERE st.class_name = ? AND ? BETWEEN CAST(SUBSTR(c.semester, 1, INSTR(c.semester, '-') - 1) AS INTEGER)
-            AND CAST(SUBSTR(c.semester, INSTR(c.semester, '-') + 1) AS INTEGER)
-            GROUP BY s.weekday
-        """, (selected_class, selected_week))
-        rows = cursor.fetchall()
-
-        # 定义每周的天数（不包括星期天）
-        weekdays = ["周一", "周二", "周三", "周四", "周五", "周六"]
-        class_count = {day: 0 for day in weekdays}
-
-        # 统计上课频次
-        for weekday, count in rows:
-            if weekday in class_count:
-                class_count[weekday] = count
-
-        return class_count, weekdays
+        # 勾选后上面两个按钮一次导出全部学生/班级，每人或每班一个文件
+        self.bulk_export_checkbox = QCheckBox("批量导出全部学生/班级", self)
+        self.bulk_export_checkbox.setGeometry(260, 660, 200, 30)
+
+        self.clash_btn = QtWidgets.QPushButton("冲突检查", self)
+        self.clash_btn.setGeometry(680, 660, 200, 30)
+        self.clash_btn.clicked.connect(lambda: self.check_clashes())
+
+        self.trace_btn = QtWidgets.QPushButton("性能面板", self)
+        self.trace_btn.setGeometry(890, 660, 160, 30)
+        self.trace_btn.clicked.connect(self.show_trace_panel)
+
+    def create_filter_bar(self):
+        """主表格上方的筛选栏：文本框按前缀匹配，输入停顿后才查询"""
+        self.filter_edits = {}
+        for name, placeholder, x, width in (("student", "学生姓名", 50, 110), ("class", "班级", 170, 110),
+                                            ("course", "课程名称", 290, 150), ("classroom", "教室", 550, 90)):
+            edit = QLineEdit(self)
+            edit.setGeometry(x, 45, width, 28)
+            edit.setPlaceholderText(placeholder)
+            edit.setClearButtonEnabled(True)
+            edit.textChanged.connect(lambda _: self.filter_timer.start())
+            if name != "classroom":
+                self.create_search_completer(name, edit)
+            self.filter_edits[name] = edit
+        self.filter_weekday_combobox = QComboBox(self)
+        self.filter_weekday_combobox.setGeometry(450, 45, 90, 28)
+        self.filter_weekday_combobox.addItems(["全部星期"] + self.weekdays)
+        self.filter_weekday_combobox.currentIndexChanged.connect(lambda _: self.apply_filters())
+        self.filter_week_combobox = QComboBox(self)
+        self.filter_week_combobox.setGeometry(650, 45, 90, 28)
+        self.filter_week_combobox.addItems(["全部周"] + [f"第{week}周" for week in range(1, 18)])
+        self.filter_week_combobox.currentIndexChanged.connect(lambda _: self.apply_filters())
+        self.clear_filter_btn = QtWidgets.QPushButton("清除筛选", self)
+        self.clear_filter_btn.setGeometry(750, 45, 80, 28)
+        self.clear_filter_btn.clicked.connect(self.clear_filters)
+        self.filter_count_label = QLabel("", self)
+        self.filter_count_label.setGeometry(840, 45, 210, 28)
+        self.filter_timer = QtCore.QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(FILTER_DELAY_MS)
+        self.filter_timer.timeout.connect(self.apply_filters)
+
+    def current_filters(self):
+        filters = {name: edit.text().strip() for name, edit in self.filter_edits.items()}
+        if self.filter_weekday_combobox.currentIndex() > 0:
+            filters["weekday"] = self.filter_weekday_combobox.currentText()
+        filters["week"] = self.filter_week_combobox.currentIndex()
+        return {name: value for name, value in filters.items() if value}
+
+    def clear_filters(self):
+        for widget in [*self.filter_edits.values(), self.filter_weekday_combobox, self.filter_week_combobox]:
+            widget.blockSignals(True)
+            if isinstance(widget, QLineEdit):
+                widget.clear()
+            else:
+                widget.setCurrentIndex(0)
+            widget.blockSignals(False)
+        self.apply_filters()
+
+    def save_pending_changes(self):
+        """换筛选条件或排序前先保存表格中的改动，保存失败时返回 False"""
+        if self.schedule_model.has_changes() and not self.save_to_database():
+            QMessageBox.critical(self, "错误", "保存数据失败，请先修正表格中的改动")
+            return False
+        return True
+
+    def apply_filters(self):
+        filters = self.current_filters()
+        # 保存成功后才换用新的筛选条件，失败时表格和筛选条件都保持不变
+        if filters != self.schedule_filters and self.save_pending_changes():
+            previous, self.schedule_filters = self.schedule_filters, filters
+            if not self.load_schedule_into_table():
+                # 读取失败时仍按原条件显示，之后修改筛选条件会再次查询
+                self.schedule_filters = previous
+
+    def on_sort_requested(self, column, descending):
+        if self.save_pending_changes():
+            previous = self.sort_column, self.sort_descending
+            self.sort_column = None if column < 0 else column
+            self.sort_descending = descending
+            if self.load_schedule_into_table():
+                return
+            self.sort_column, self.sort_descending = previous
+        # 表头的排序标记恢复为当前的排序，恢复时不再触发排序
+        header = self.table_view.horizontalHeader()
+        header.blockSignals(True)
+        header.setSortIndicator(-1 if self.sort_column is None else self.sort_column,
+                                Qt.DescendingOrder if self.sort_descending else Qt.AscendingOrder)
+        header.blockSignals(False)
+
+    def selected_week(self):
+        return int(self.week_combobox.currentText().replace("第", "").replace("周", ""))
 
     def plot_class_frequency(self):
-        class_count, weekdays = self.count_classes_per_weekday()
-
-        # 生成数据
-        frequencies = [class_count[day] for day in weekdays]
-
-        font_path = './ubuntu.ttf'
-        font_prop = fm.FontProperties(fname=font_path)
-        plt.rcParams['font.sans-serif'] = [font_path]
-        plt.rcParams['axes.unicode_minus'] = False
-        plt.rcParams.update({'font.size': 14})
-
-        # 绘制柱状图
-        plt.figure(figsize=(12, 8))
-        plt.bar(weekdays, frequencies, color='skyblue')
-        plt.xlabel('星期', fontsize=16, fontproperties=font_prop)
-        plt.ylabel('上课频次', fontsize=16, fontproperties=font_prop)
-        plt.title('每周每天上课频次统计', fontsize=20, fontproperties=font_prop)
-        plt.xticks(fontsize=14, fontproperties=font_prop)
-        plt.yticks(fontsize=14, fontproperties=font_prop)
-        plt.show()
+        """打开统计图表面板，之后切换班级或周数时原地刷新"""
+        if self.chart_panel is None:
+            from schedule_charts import ChartPanel
+
+            self.chart_panel = ChartPanel(self.db_connection, self.weekdays, self.time_slots, self)
+            self.class_combobox.currentTextChanged.connect(self.refresh_chart)
+            self.week_combobox.currentTextChanged.connect(self.refresh_chart)
+        self.chart_panel.show()
+        self.chart_panel.raise_()
+        self.refresh_chart()
+
+    def show_trace_panel(self):
+        """打开性能面板，显示最慢的操作和查询"""
+        if self.trace_panel is None:
+            from schedule_trace_panel import TracePanel
+
+            self.trace_panel = TracePanel(self)
+        self.trace_panel.show()
+        self.trace_panel.raise_()
+
+    def check_clashes(self, report_clean=True):
+        """在后台检查整个课表中学生和教室的时间冲突"""
+        self.task_runner.start("冲突检查", schedule_clash.find_clashes,
+                               on_finished=lambda report: self.show_clash_report(report, report_clean))
+
+    def show_clash_report(self, report, report_clean=True):
+        """列出前几处冲突，并可导出完整的冲突报告"""
+        if not report.clashes:
+            if report_clean:
+                QMessageBox.information(self, "冲突检查", f"检查了 {report.checked} 行课表，未发现冲突")
+            return
+        counts = report.counts()
+        lines = "\n".join(f"{kind} {name} {weekday} {time_slot} 第{weeks}周：{first} / {second}"
+                          for kind, name, weekday, time_slot, weeks, first, second, _, _ in
+                          schedule_clash.clash_rows(self.db_connection, report.clashes[:10]))
+        reply = QMessageBox.question(
+            self, "发现冲突",
+            f"发现 {len(report.clashes)} 处冲突（学生 {counts.get('学生', 0)} 处，教室 {counts.get('教室', 0)} 处）：\n"
+            f"{lines}\n\n是否导出冲突报告？")
+        if reply != QMessageBox.Yes:
+            return
+        file_name, _ = QFileDialog.getSaveFileName(self, "导出冲突报告", "冲突报告.xlsx", "Excel Files (*.xlsx)")
+        if file_name:
+            if not file_name.endswith('.xlsx'):
+                file_name += '.xlsx'
+            self.task_runner.start(
+                "导出冲突报告", schedule_clash.export_clash_report, report.clashes, file_name,
+                on_finished=lambda count: QMessageBox.information(self, "成功", f"冲突报告已导出，共 {count} 处冲突"))
+
+    @traced("刷新图表")
+    def refresh_chart(self):
+        if self.chart_panel is not None:
+            self.chart_panel.set_filter(self.class_combobox.currentText(), self.selected_week())
 
     def load_class_combobox(self):
-        cursor = self.db_connection.cursor()
-        cursor.execute("SELECT DISTINCT class_name FROM students")
-        classes = [row[0] for row in cursor.fetchall()]
-        self.class_combobox.addItems(classes)
+        classes = dict.fromkeys(class_name for class_name in self.lookup_cache.students().values() if class_name)
+        self.class_combobox.addItems(list(classes))
 
     def load_week_combobox(self):
         weeks = [f"第{week}周" for week in range(1, 18)]
         self.week_combobox.addItems(weeks)
 
     def load_student_combobox(self):
-        cursor = self.db_connection.cursor()
-        cursor.execute("SELECT student_name FROM students")
-        students = [row[0] for row in cursor.fetchall()]
-        self.student_combobox.addItems(students)
+        self.student_combobox.setModel(self.student_model)
+
+    def export_all_schedules(self, sql, count_sql, title):
+        """每个学生或班级导出一个 Excel 文件，保存为 zip 或目录"""
+        file_name, _ = QFileDialog.getSaveFileName(self, title, "", "Zip Files (*.zip);;文件夹 (*)")
+        if not file_name:
+            return
+        total = self.db_connection.execute(count_sql).fetchone()[0]
+        self.task_runner.start(
+            title, schedule_io.export_grouped_excel, sql, schedule_db.STUDENT_SCHEDULE_HEADERS, file_name, None, total,
+            on_finished=lambda count: QMessageBox.information(self, "成功", f"已导出 {count} 个文件到 {file_name}"))
 
     def export_student_schedule(self):
+        if self.bulk_export_checkbox.isChecked():
+            self.export_all_schedules(schedule_db.ALL_STUDENT_SCHEDULES_SQL,
+                                      schedule_db.ALL_STUDENT_SCHEDULES_COUNT_SQL, "批量导出学生课程安排")
+            return
         selected_student = self.student_combobox.currentText()
-        cursor = self.db_connection.cursor()
-        cursor.execute("SELECT * FROM schedule WHERE student_name = ?", (selected_student,))
-        rows = cursor.fetchall()
-
-        if not rows:
+        if self.db_connection.execute(schedule_db.STUDENT_SCHEDULE_SQL + " LIMIT 1", (selected_student,)).fetchone() is None:
             QMessageBox.information(self, "提示", "没有找到该学生的课程安排")
             return
 
-        data = {
-            '学生姓名': [],
-            '课程名称': [],
-            '学分': [],
-            '星期': [],
-            '行课时间': [],
-            '教室': []
-        }
-
-        for row in rows:
-            data['学生姓名'].append(row[1])
-            data['课程名称'].append(row[2])
-            data['学分'].append(row[3])
-            data['星期'].append(row[4])
-            data['行课时间'].append(row[5])
-            data['教室'].append(row[6])
-
-        df = pd.DataFrame(data)
         file_name, _ = QFileDialog.getSaveFileName(self, "导出课程安排", "", "Excel Files (*.xlsx);;All Files (*)")
-        
         if file_name:
             if not file_name.endswith('.xlsx'):
                 file_name += '.xlsx'
-            df.to_excel(file_name, index=False)
+            with schedule_trace.span("导出学生课程安排"):
+                schedule_io.export_student_schedule(self.db_connection, selected_student, file_name)
             QMessageBox.information(self, "成功", "课程安排已成功导出")
 
     def export_class_statistics(self):
+        if self.bulk_export_checkbox.isChecked():
+            self.export_all_schedules(schedule_db.ALL_CLASS_SCHEDULES_SQL,
+                                      schedule_db.ALL_CLASS_SCHEDULES_COUNT_SQL, "批量导出班级统计信息")
+            return
         selected_class = self.class_combobox.currentText()
-        cursor = self.db_connection.cursor()
-        cursor.execute("""
-            SELECT s.student_name, s.course_name, s.credit, s.weekday, s.time_slot, s.classroom
-            FROM schedule s
-            JOIN students st ON s.student_name = st.student_name
-            WHERE st.class_name = ?
-        """, (selected_class,))
-        rows = cursor.fetchall()
-
-        if not rows:
+        if self.db_connection.execute(schedule_db.CLASS_SCHEDULE_SQL + " LIMIT 1", (selected_class,)).fetchone() is None:
             QMessageBox.information(self, "提示", "没有找到该班级的统计信息")
             return
 
-        data = {
-            '学生姓名': [],
-            '课程名称': [],
-            '学分': [],
-            '星期': [],
-            '行课时间': [],
-            '教室': []
-        }
-
-        for row in rows:
-            data['学生姓名'].append(row[0])
-            data['课程名称'].append(row[1])
-            data['学分'].append(row[2])
-            data['星期'].append(row[3])
-            data['行课时间'].append(row[4])
-            data['教室'].append(row[5])
-
-        df = pd.DataFrame(data)
         file_name, _ = QFileDialog.getSaveFileName(self, "导出统计信息", "", "Excel Files (*.xlsx);;All Files (*)")
-        
         if file_name:
             if not file_name.endswith('.xlsx'):
                 file_name += '.xlsx'
-            df.to_excel(file_name, index=False)
+            with schedule_trace.span("导出班级统计信息"):
+                schedule_io.export_class_schedule(self.db_connection, selected_class, file_name)
             QMessageBox.information(self, "成功", "班级统计信息已成功导出")
 
     def auto_schedule(self):
-        """自动排课"""
-        try:
-            print("开始自动排课...")
-            cursor = self.db_connection.cursor()
-            
-            # 检查数据库连接
-            if not self.db_connection:
-                raise Exception("数据库连接失败")
-            
-            # 获取学生列表
-            try:
-                cursor.execute("SELECT student_name FROM students")
-                students = [row[0] for row in cursor.fetchall()]
-                print(f"获取到 {len(students)} 名学生")
-            except Exception as e:
-                raise Exception(f"获取学生列表失败: {str(e)}")
-
-            # 获取课程列表
-            try:
-                cursor.execute("SELECT course_name, credit FROM courses")
-                courses = cursor.fetchall()
-                print(f"获取到 {len(courses)} 门课程")
-            except Exception as e:
-                raise Exception(f"获取课程列表失败: {str(e)}")
-
-            # 检查数据是否足够
-            if not students:
-                raise Exception("没有找到学生信息")
-            if not courses:
-                raise Exception("没有找到课程信息")
-
-            print("清空现有课表...")
-            try:
-                # 清空现有课表
-                cursor.execute("DELETE FROM schedule")
-            except Exception as e:
-                raise Exception(f"清空课表失败: {str(e)}")
-            
-            # 准备插入的数据
-            print("生成排课数据...")
-            schedule = []
-            try:
-                import random
-                building_numbers = [1, 2, 4]  # 可选的教学楼号
-                
-                for student in students:
-                    for course_name, credit in courses:
-                        weekday = self.weekdays[len(schedule) % len(self.weekdays)]
-                        time_slot = self.time_slots[len(schedule) % len(self.time_slots)]
-                        
-                        # 生成四位教室号：H + 教学楼号(1/2/4) + 两位房间号(01-20)
-                        building = random.choice(building_numbers)
-                        room_number = f"H{building}{random.randint(1, 20):02d}"
-
-                        schedule.append((
-                            student,
-                            course_name,
-                            credit,
-                            weekday,
-                            time_slot,
-                            room_number
-                        ))
-                print(f"生成了 {len(schedule)} 条排课记录")
-            except Exception as e:
-                raise Exception(f"生成排课数据失败: {str(e)}")
-
-
-            # 批量插入数据
-            print("插入排课数据到数据库...")
-            try:
-                cursor.executemany("""
-                    INSERT INTO schedule 
-                    (student_name, course_name, credit, weekday, time_slot, classroom)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, schedule)
-                
-                self.db_connection.commit()
-                print("数据库提交成功")
-            except Exception as e:
-                self.db_connection.rollback()
-                raise Exception(f"插入数据失败: {str(e)}")
-
-            # 刷新表格显示
-            print("更新表格显示...")
-            try:
-                self.load_schedule_into_table()
-            except Exception as e:
-                raise Exception(f"更新表格显示失败: {str(e)}")
-
-            print("自动排课完成")
+        """自动排课（在后台执行，可在状态栏取消）"""
+        self.task_runner.start("自动排课", schedule_db.auto_schedule, self.weekdays, self.time_slots,
+                               on_finished=self.on_auto_schedule_finished, writes=True)
+
+    @traced("排课后刷新")
+    def on_auto_schedule_finished(self, outcome):
+        engine, result = outcome
+        self.schedule_engine = engine
+        self.reload_room_engine()
+        # 刷新表格显示
+        self.load_schedule_into_table()
+        if result.unplaced:
+            course_names = {course_id: name for name, course_id in
+                            schedule_db.name_ids(self.db_connection, "courses", "course_name").items()}
+            unplaced = "、".join(f"{class_name} {course_names.get(course_id, '')}"
+                                for class_name, course_id in result.unplaced[:10])
+            QMessageBox.warning(self, "部分完成",
+                                f"自动排课完成，但有 {len(result.unplaced)} 个教学班因时段或教室不足无法安排：\n{unplaced}")
+        else:
             QMessageBox.information(self, "成功", "自动排课成功")
-            
-        except Exception as e:
-            error_msg = f"自动排课失败: {str(e)}"
-            print(error_msg)
-            QMessageBox.critical(self, "错误", error_msg)
-            # 打印详细的错误堆栈
-            import traceback
-            traceback.print_exc()
 
     def show_student_manager(self):
         """显示学生管理窗口"""
         self.student_manager = StudentManager(self.db_connection, self)
-        self.student_manager.reload_students_signal.connect(self.load_students)
+        self.student_manager.student_updated.connect(self.on_student_updated)
         self.student_manager.show()
 
     def show_course_manager(self):
         """显示课程管理窗口"""
         self.course_manager = CourseManager(self.db_connection, self)
-        self.course_manager.reload_courses_signal.connect(self.load_courses)
+        self.course_manager.course_updated.connect(self.on_course_updated)
         self.course_manager.show()
 
-    def initialize_data(self):
-        """初始化学生与课程信息或导出课表"""
+    def on_student_updated(self, action, student_id, old_class=""):
+        """学生信息变化后刷新列表和检索索引，并按需增量调整课表
+
+        old_class 为编辑前的班级：引擎可能是修改提交后才从数据库建立的，
+        只能由调用方在修改前读出。
+        """
+        self.lookup_cache.invalidate_students()
+        self.load_students()
+        if self.search_indexes is not None:
+            schedule_search.refresh_student(self.search_indexes, self.db_connection, student_id)
+        if self.incremental_checkbox.isChecked():
+            self.reschedule_student(action, student_id, old_class)
+        # 删除学生和增量排课都会改变教室占用
+        self.reload_room_engine()
+
+    def on_course_updated(self, action, course_id, old_semester=""):
+        """课程信息变化后刷新列表和检索索引，并按需增量调整课表
+
+        old_semester 为编辑前的周数，原因同 on_student_updated。
+        """
+        self.lookup_cache.invalidate_courses()
+        self.load_courses()
+        if self.search_indexes is not None:
+            schedule_search.refresh_course(self.search_indexes, self.db_connection, course_id)
+        if self.incremental_checkbox.isChecked():
+            self.reschedule_course(action, course_id, old_semester)
+        # 课程的周数、删除课程和增量排课都会改变教室占用
+        self.reload_room_engine()
+
+    def reload_room_engine(self):
+        """在后台线程中按课表重建教室占用索引；建好之前教室下拉框不列出空闲教室"""
+        self.room_engine = None
+        self.room_engine_version += 1
+        version = self.room_engine_version
+        task = Task(schedule_db.DB_PATH, schedule_db.load_room_engine, (self.weekdays, self.time_slots))
+        task.signals.finished.connect(lambda engine: self.on_room_engine_loaded(engine, version))
+        self.room_engine_task = task
+        # 与其他后台任务共用线程池，关闭窗口时一并等待结束
+        self.task_runner.submit(task)
+
+    def on_room_engine_loaded(self, engine, version):
+        # 建立期间又重新开始建立时，旧的结果可能不含之后的改动，丢弃
+        if version == self.room_engine_version:
+            self.room_engine = engine
+            self.room_engine_task = None
+
+    def get_schedule_engine(self):
+        """返回与当前课表一致的排课引擎（以学生、课程 id 为键），课表为空时返回 None"""
+        if self.schedule_engine is None:
+            cursor = self.db_connection.cursor()
+            cursor.execute("SELECT 1 FROM schedule LIMIT 1")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute(schedule_db.ENGINE_ROWS_SQL)
+            engine = ScheduleEngine(self.weekdays, self.time_slots, schedule_db.load_classrooms(self.db_connection))
+            engine.load(cursor.fetchall())
+            self.schedule_engine = engine
+        return self.schedule_engine
+
+    def insert_schedule_rows(self, rows, append_to_table=True):
+        """插入增量排课结果，并追加到表格末尾"""
+        cursor = self.db_connection.cursor()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM schedule")
+        last_id = cursor.fetchone()[0]
+        cursor.executemany(schedule_db.INSERT_SCHEDULE_SQL, (
+            (student_id, course_id, weekday, time_slot, classroom)
+            for student_id, course_id, _, weekday, time_slot, classroom, _ in rows
+        ))
+        if append_to_table:
+            cursor.execute(schedule_db.SCHEDULE_ROWS_SQL + " WHERE s.id > ?", (last_id,))
+            self.schedule_model.append_rows(cursor.fetchall())
+
+    @traced("增量排课（学生）")
+    def reschedule_student(self, action, student_id, old_class=""):
+        """只为新增的学生排课或删除离开学生的排课，其余安排保持不变"""
         try:
+            engine = self.get_schedule_engine()
+            if engine is None:
+                return
             cursor = self.db_connection.cursor()
-            
-            # 清空现有数据
-            cursor.execute("DELETE FROM schedule")
-            cursor.execute("DELETE FROM students")
-            cursor.execute("DELETE FROM courses")
-            
-            # 重置自增ID
-            cursor.execute("DELETE FROM sqlite_sequence WHERE name IN ('students', 'courses', 'schedule')")
-            
-            # 初始化默认学生 - 移除多余的空格
-            default_students = [
-                ('林悦溪', '自动化211'), ('苏逸晨', '自动化211'), ('林宇轩', '自动化212'),
-                ('叶梓豪', '自动化213'), ('苏锦瑶', '自动化212'), ('沈俊辉', '自动化221'),
-                ('秦泽凯', '自动化222'), ('许皓阳', '自动化223'), ('叶婉清', '自动化213'),
-                ('唐文昊', '自动化231'), ('白睿渊', '自动化232'), ('楚晨峰', '自动化233'),
-                ('沈梦璃', '自动化221'), ('柳靖琪', '自动化234'), ('赵景铄', '自动化211'),
-                ('陈俊驰', '自动化212'), ('秦诗涵', '自动化222'), ('周远航', '自动化213'),
-                ('陆博超', '自动化221'), ('郑子轩', '自动化222'), ('许静雅', '自动化223'),
-                ('何宇澄', '自动化223'), ('冯睿晨', '自动化231'), ('罗嘉豪', '自动化232'),
-                ('唐晓萱', '自动化231'), ('萧启铭', '自动化233'), ('田耀辉', '自动化234'),
-                ('孙逸飞', '自动化211'), ('白若冰', '自动化232'), ('钱锦程', '自动化212'),
-                ('吴梓轩', '自动化213'), ('梁梓铭', '自动化221'), ('楚依琳', '自动化233'),
-                ('谢翰飞', '自动化222'), ('傅晨熙', '自动化223'), ('彭俊楠', '自动化231'),
-                ('柳雨薇', '自动化234'), ('蒋睿峰', '自动化232'), ('韩浩宇', '自动化233'),
-                ('曹宇翔', '自动化234'), ('赵灵芸', '自动化211'), ('陈佳凝', '自动化212'),
-                ('周语蝶', '自动化213'), ('陆芷晴', '自动化221'), ('郑雅琪', '自动化222'),
-                ('何思瑶', '自动化223'), ('田雨昕', '自动化234'), ('钱浅兮', '自动化212'),
-                ('谢诗韵', '自动化222'), ('傅冰清', '自动化223'), ('彭晓兰', '自动化231'),
-                ('蒋雨桐', '自动化232'), ('韩紫菱', '自动化233'), ('曹静婉', '自动化234')
-            ]
-            
-            # 使用参数化查询插入数据
-            cursor.executemany("""
-                INSERT INTO students (student_name, class_name)
-                VALUES (?, ?)
-            """, [(name.strip(), class_name.strip()) for name, class_name in default_students])
-            
-            # 初始化默认课程
-            default_courses = [
-                ('高等数学', 4.0, '3-16'),
-                ('线性代数', 3.0, '3-14'),
-                ('大学物理', 4.0, '6-15'),
-                ('Python编程技术', 2.5, '3-16'),
-                ('思想道德与法治', 3.5, '9-14')
-            ]
-            
-            cursor.executemany("""
-                INSERT INTO courses (course_name, credit, semester)
-                VALUES (?, ?, ?)
-            """, [(name.strip(), credit, semester.strip()) for name, credit, semester in default_courses])
-            
+            cursor.execute("SELECT student_name, class_name FROM students WHERE id = ?", (student_id,))
+            student = cursor.fetchone()
+            class_name = student[1] if student else None
+
+            if action == "edit":
+                if (old_class or "") == (class_name or ""):
+                    # 只改了姓名，课表通过外键关联，排课不变
+                    self.load_schedule_into_table()
+                    return
+
+            reload_table = False
+            if action in ("edit", "delete"):
+                # 删除学生时外键已级联删除其课表
+                cursor.execute("DELETE FROM schedule WHERE student_id = ?", (student_id,))
+                engine.remove_student(student_id)
+                reload_table = True
+
+            unplaced = []
+            if action in ("add", "edit") and student:
+                cursor.execute("SELECT id, credit, semester FROM courses")
+                result = engine.add_student(student_id, class_name, cursor.fetchall())
+                unplaced = result.unplaced
+                self.insert_schedule_rows(result.rows, append_to_table=not reload_table)
+
             self.db_connection.commit()
-            
-            # 清空并重新加载表格
-            self.table_widget.setRowCount(0)
-            self.load_courses()
-            
-            QMessageBox.information(self, "成功", "学生与课程信息已初始化")
-            
+            if reload_table:
+                self.load_schedule_into_table()
+            print(f"增量排课完成: {action} 学生 {student_id}")
+            if unplaced:
+                QMessageBox.warning(self, "提示", f"{student[0]} 有 {len(unplaced)} 门课程因时段或教室不足无法安排")
+        except Exception as e:
+            self.db_connection.rollback()
+            self.schedule_engine = None
+            print(f"增量排课失败: {str(e)}")
+            QMessageBox.critical(self, "错误", f"增量排课失败: {str(e)}")
+
+    @traced("增量排课（课程）")
+    def reschedule_course(self, action, course_id, old_semester=""):
+        """只为新增的课程排课或删除被删课程的排课，其余安排保持不变"""
+        try:
+            engine = self.get_schedule_engine()
+            if engine is None:
+                return
+            cursor = self.db_connection.cursor()
+            cursor.execute("SELECT id, credit, semester, course_name FROM courses WHERE id = ?", (course_id,))
+            course = cursor.fetchone()
+
+            if action == "edit" and course:
+                if week_mask(old_semester) == week_mask(course[2]):
+                    # 周数未变，名称和学分通过外键关联，排课不变
+                    self.load_schedule_into_table()
+                    return
+
+            reload_table = False
+            if action in ("edit", "delete"):
+                # 删除课程时外键已级联删除其课表
+                cursor.execute("DELETE FROM schedule WHERE course_id = ?", (course_id,))
+                engine.remove_course(course_id)
+                reload_table = True
+
+            unplaced = []
+            if action in ("add", "edit") and course:
+                cursor.execute("SELECT id, class_name FROM students")
+                classes = defaultdict(list)
+                for student_id, class_name in cursor.fetchall():
+                    classes[class_name or ""].append(student_id)
+                result = engine.add_course(course[:3], classes)
+                unplaced = result.unplaced
+                self.insert_schedule_rows(result.rows, append_to_table=not reload_table)
+
+            self.db_connection.commit()
+            if reload_table:
+                self.load_schedule_into_table()
+            print(f"增量排课完成: {action} 课程 {course_id}")
+            if unplaced:
+                QMessageBox.warning(self, "提示", f"{course[3]} 有 {len(unplaced)} 个教学班因时段或教室不足无法安排")
         except Exception as e:
             self.db_connection.rollback()
+            self.schedule_engine = None
+            print(f"增量排课失败: {str(e)}")
+            QMessageBox.critical(self, "错误", f"增量排课失败: {str(e)}")
+
+    @traced("初始化数据")
+    def initialize_data(self):
+        """初始化学生与课程信息或导出课表"""
+        try:
+            schedule_db.initialize_data(self.db_connection)
+        except Exception as e:
             QMessageBox.critical(self, "错误", f"初始化失败: {str(e)}")
             return
 
+        # 清空并重新加载表格
+        self.schedule_engine = None
+        self.reload_room_engine()
+        self.lookup_cache.invalidate()
+        self.schedule_model.set_rows([])
+        self.update_dropdowns()
+
+        QMessageBox.information(self, "成功", "学生与课程信息已初始化")
+
     def update_student_course_data(self):
         """更新学生和课程数据，并更新选择学生下拉菜单"""
-        # 获取最新的学生和课程列表
-        cursor = self.db_connection.cursor()
-        
-        # 更新学生列表
-        cursor.execute("SELECT student_name FROM students")
-        self.student_list = [row[0] for row in cursor.fetchall()]
-        
-        # 更新课程列表
-        cursor.execute("SELECT course_name FROM courses")
-        self.course_list = [row[0] for row in cursor.fetchall()]
-        
-        # 更新选择学生的下拉菜单
-        self.student_combobox.clear()
-        self.student_combobox.addItems(self.student_list)
-        
-        # 只更新现有行的下拉菜单选项，不改变已选择的值
-        for row in range(self.table_widget.rowCount()):
-            # 更新学生下拉菜单（第0列）
-            student_widget = self.table_widget.cellWidget(row, 0)
-            if isinstance(student_widget, QComboBox):
-                current_student = student_widget.currentText()
-                student_widget.clear()
-                student_widget.addItems(self.student_list)
-                student_widget.setCurrentText(current_student)
-            
-            # 更新课程下拉菜单（第2列）
-            course_widget = self.table_widget.cellWidget(row, 2)
-            if isinstance(course_widget, QComboBox):
-                current_course = course_widget.currentText()
-                course_widget.clear()
-                course_widget.addItems(self.course_list)
-                course_widget.setCurrentText(current_course)
-        
+        # 重新读取最新的学生和课程列表，所有下拉框共用的模型随之更新
+        self.lookup_cache.invalidate()
+        self.update_dropdowns()
         QMessageBox.information(self, "成功", "下拉菜单选项已更新")
     
     def export_to_excel(self):
         """导出课表到Excel文件"""
-        try:
-            # 收集表格数据
-            data = {
-                '学生姓名': [],
-                '班级': [],
-                '课程名称': [],
-                '学分': [],
-                '星期': [],
-                '行课时间': [],
-                '周数': [],
-                '教室': []
-            }
-            
-            # 从表格中获取数据
-            for row in range(self.table_widget.rowCount()):
-                # 获取各列的数据，根据控件类型使用不同的方法获取值
-                student_widget = self.table_widget.cellWidget(row, 0)
-                class_widget = self.table_widget.cellWidget(row, 1)
-                course_widget = self.table_widget.cellWidget(row, 2)
-                credit_widget = self.table_widget.cellWidget(row, 3)
-                weekday_widget = self.table_widget.cellWidget(row, 4)
-                time_widget = self.table_widget.cellWidget(row, 5)
-                semester_widget = self.table_widget.cellWidget(row, 6)
-                classroom_widget = self.table_widget.cellWidget(row, 7)
-
-                # 根据控件类型获取值
-                data['学生姓名'].append(student_widget.currentText() if isinstance(student_widget, QComboBox) else "")
-                data['班级'].append(class_widget.text() if isinstance(class_widget, QLineEdit) else "")
-                data['课程名称'].append(course_widget.currentText() if isinstance(course_widget, QComboBox) else "")
-                data['学分'].append(credit_widget.text() if isinstance(credit_widget, QLineEdit) else "")
-                data['星期'].append(weekday_widget.currentText() if isinstance(weekday_widget, QComboBox) else "")
-                data['行课时间'].append(time_widget.currentText() if isinstance(time_widget, QComboBox) else "")
-                data['周数'].append(semester_widget.text() if isinstance(semester_widget, QLineEdit) else "")
-                data['教室'].append(classroom_widget.text() if isinstance(classroom_widget, QLineEdit) else "")
-            
-            # 创建DataFrame
-            df = pd.DataFrame(data)
-            
-            # 选择保存位置
-            options = QFileDialog.Options()
-            file_name, _ = QFileDialog.getSaveFileName(
-                self,
-                "导出课表",
-                "",
-                "Excel Files (*.xlsx);;All Files (*)",
-                options=options
-            )
-            
-            if file_name:
-                # 如果文件名没有.xlsx后缀，添加它
-                if not file_name.endswith('.xlsx'):
-                    file_name += '.xlsx'
-                
-                # 导出到Excel
-                df.to_excel(file_name, index=False)
-                QMessageBox.information(self, "成功", "课表已成功导出")
-                
-        except Exception as e:
-            error_msg = f"导出失败: {str(e)}"
-            print(error_msg)  # 打印错误信息到控制台
-            QMessageBox.critical(self, "错误", error_msg)
-            # 打印详细的错误堆栈
-            import traceback
-            traceback.print_exc()
+        # 选择保存位置
+        options = QFileDialog.Options()
+        file_name, _ = QFileDialog.getSaveFileName(
+            self,
+            "导出课表",
+            "",
+            "Excel Files (*.xlsx);;All Files (*)",
+            options=options
+        )
+
+        if file_name:
+            # 如果文件名没有.xlsx后缀，添加它
+            if not file_name.endswith('.xlsx'):
+                file_name += '.xlsx'
+
+            # 直接从数据库分块读取并流式写入，不经过表格
+            self.task_runner.start(
+                "导出课表", schedule_io.export_schedule_excel, file_name,
+                on_finished=lambda count: QMessageBox.information(self, "成功", f"课表已成功导出，共 {count} 行"))
 
     def connect_to_database(self):
         """初始化数据库连接并创建必要的表"""
         try:
-            conn = sqlite3.connect("schedule.db")
-            cursor = conn.cursor()
-
-            # 先删除旧表以确保表结构更新
-            cursor.execute("DROP TABLE IF EXISTS schedule")
-            
-            # 创建新的课程表，确保包含所有必要的列
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS schedule (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    student_name TEXT,
-                    course_name TEXT,
-                    credit REAL,
-                    weekday TEXT,
-                    time_slot TEXT,
-                    classroom TEXT,
-                    semester TEXT
-                )
-            """)
-            
-            # 创建或更新学生表
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS students (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    student_name TEXT UNIQUE,
-                    class_name TEXT
-                )
-            """)
-            
-            # 创建或更新课程表
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS courses (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    course_name TEXT UNIQUE,
-                    credit REAL,
-                    semester TEXT
-                )
-            """)
-            
-            conn.commit()
-            return conn
+            # 按 PRAGMA user_version 执行尚未应用的迁移步骤，已有课表原样保留
+            return schedule_db.connect(schedule_db.DB_PATH)
         except sqlite3.Error as err:
             QMessageBox.critical(self, "数据库错误", str(err))
             sys.exit()
 
     def load_students(self):
-        cursor = self.db_connection.cursor()
-        cursor.execute("SELECT student_name FROM students")
-        self.student_list = [row[0] for row in cursor.fetchall()]
-        self.update_comboboxes()
+        self.student_list = list(self.lookup_cache.students())
+        self.student_model.setStringList(self.student_list)
 
     def load_courses(self):
-        cursor = self.db_connection.cursor()
-        cursor.execute("SELECT course_name FROM courses")
-        self.course_list = [row[0] for row in cursor.fetchall()]
-        self.update_comboboxes()
-
-    def update_comboboxes(self):
-        for row in range(self.table_widget.rowCount()):
-            student_combo = self.create_student_combobox(self.table_widget.item(row, 0).text() if self.table_widget.item(row, 0) else "")
-            self.table_widget.setCellWidget(row, 0, student_combo)
-            course_combo = self.create_course_combobox(self.table_widget.item(row, 1).text() if self.table_widget.item(row, 1) else "")
-            self.table_widget.setCellWidget(row, 1, course_combo)
+        self.course_list = list(self.lookup_cache.courses())
+        self.course_model.setStringList(self.course_list)
 
     def import_schedule(self):
         options = QFileDialog.Options()
         file_name, _ = QFileDialog.getOpenFileName(self, "选择 Excel 文件", "", "Excel Files (*.xlsx);;All Files (*)", options=options)
         if file_name:
-            try:
-                df = pd.read_excel(file_name, dtype=str)  # Ensure all data is read as strings
-
-                cursor = self.db_connection.cursor()
-                cursor.execute("DELETE FROM schedule")
-                self.db_connection.commit()
-
-                for index, row in df.iterrows():
-                    student_name = row['学生姓名']
-                    course_name = row['课程名称']
-                    credit = int(row['学分'])  # Ensure credit is an integer
-                    time_slot = row['行课时间']
-                    classroom = f"H{row['教室']}"  # Add 'H' prefix
-
-                    cursor.execute("""
-                        INSERT INTO schedule (student_name, course_name, credit, time_slot, classroom)
-                        VALUES (?, ?, ?, ?, ?)
-                    """, (student_name, course_name, credit, time_slot, classroom))
-                
-                self.db_connection.commit()
-                self.imported_file_path = file_name
-                self.update_status_label("excel")
-                self.load_schedule_into_table()
-                QMessageBox.information(self, "成功", "课程信息导入成功")
-            except Exception as e:
-                print(f"导入失败: {str(e)}")
-                QMessageBox.critical(self, "错误", f"导入失败: {str(e)}")
+            # 按块流式读取并批量写入，表中没有的学生或课程会自动补录
+            self.task_runner.start("导入课程信息", schedule_io.import_schedule_excel, file_name,
+                                   on_finished=lambda outcome: self.on_schedule_imported(file_name, *outcome),
+                                   on_cancelled=self.on_schedule_import_stopped, writes=True)
+
+    def on_schedule_imported(self, file_name, count, rate):
+        self.imported_file_path = file_name
+        self.update_status_label("excel")
+        self.on_schedule_import_stopped()
+        QMessageBox.information(self, "成功", f"课程信息导入成功，共 {count} 行（{rate:.0f} 行/秒）")
+        self.check_clashes(report_clean=False)
+
+    @traced("导入后刷新")
+    def on_schedule_import_stopped(self):
+        """导入完成或取消（整个导入已回滚）后，都按数据库中的课表刷新"""
+        self.schedule_engine = None
+        self.reload_room_engine()
+        # 导入时可能补录了学生或课程
+        self.lookup_cache.invalidate()
+        if self.search_indexes is not None:
+            schedule_search.add_new_names(self.search_indexes, self.db_connection)
+        self.load_schedule_into_table()
 
     def update_status_label(self, source):
         if source == "excel":
@@ -673,137 +998,117 @@ class ScheduleManager(QtWidgets.QMainWindow):
             self.status_label.setText("等待导入表格中")
             self.status_label.setStyleSheet("color: gray;")
 
+    @traced("加载表格")
     def load_schedule_into_table(self):
-        self.table_widget.setRowCount(0)
+        """按当前筛选条件和排序读入第一页，其余各页在滚动时读取
 
-        cursor = self.db_connection.cursor()
-        # 修改 SQL 查询，移除注释
-        cursor.execute("""
-            SELECT 
-                s.student_name, 
-                st.class_name, 
-                s.course_name, 
-                c.credit, 
-                s.weekday, 
-                s.time_slot, 
-                c.semester, 
-                s.classroom
-            FROM schedule s
-            LEFT JOIN students st ON s.student_name = st.student_name
-            LEFT JOIN courses c ON s.course_name = c.course_name
-        """)
-        rows = cursor.fetchall()
-
-        for row_data in rows:
-            row_position = self.table_widget.rowCount()
-            self.table_widget.insertRow(row_position)
-            
-            for column, data in enumerate(row_data):
-                if isinstance(data, bytes):
-                    data = data.decode('utf-8')
-
-                if column == 0:  # 学生姓名
-                    combo = self.create_student_combobox(str(data))
-                    self.table_widget.setCellWidget(row_position, column, combo)
-                elif column == 1:  # 班级
-                    line_edit = QLineEdit(str(data))
-                    line_edit.setReadOnly(True)
-                    self.table_widget.setCellWidget(row_position, column, line_edit)
-                elif column == 2:  # 课程名称
-                    combo = self.create_course_combobox(str(data))
-                    self.table_widget.setCellWidget(row_position, column, combo)
-                elif column == 3:  # 学分
-                    line_edit = QLineEdit(str(data))
-                    line_edit.setReadOnly(True)
-                    self.table_widget.setCellWidget(row_position, column, line_edit)
-                elif column == 4:  # 星期
-                    combo = self.create_weekday_combobox(str(data))
-                    self.table_widget.setCellWidget(row_position, column, combo)
-                elif column == 5:  # 时间段
-                    combo = self.create_time_slot_combobox(str(data))
-                    self.table_widget.setCellWidget(row_position, column, combo)
-                elif column == 6:  # 周数
-                    line_edit = QLineEdit(str(data))
-                    line_edit.setReadOnly(True)
-                    self.table_widget.setCellWidget(row_position, column, line_edit)
-                elif column == 7:  # 教室列
-                    line_edit = QLineEdit(str(data))
-                    # 创建自定义的验证器，允许后缀
-                    validator = QtGui.QRegExpValidator(QtCore.QRegExp(r"H?[124]\d{2}[1-9]"))
-                    line_edit.setValidator(validator)
-                    line_edit.editingFinished.connect(lambda le=line_edit: self.add_classroom_prefix(le))
-                    self.table_widget.setCellWidget(row_position, column, line_edit)
-
-    def update_student_class(self, student_name, combo):
-        """更新学生班级信息"""
+        读取失败（如数据库被锁住）时表格保持不变，提示后返回 False。
+        """
+        conn, filters = self.db_connection, self.schedule_filters
+        sort_column, descending = self.sort_column, self.sort_descending
         try:
-            cursor = self.db_connection.cursor()
-            cursor.execute("SELECT class_name FROM students WHERE student_name = ?", (student_name,))
-            result = cursor.fetchone()
-            
-            if result:
-                row = self.table_widget.indexAt(combo.pos()).row()
-                class_edit = self.table_widget.cellWidget(row, 1)  # 班级列
-                if class_edit and isinstance(class_edit, QLineEdit):
-                    class_edit.setText(result[0])
-        except Exception as e:
-            print(f"更新班级信息失败: {str(e)}")
+            self.schedule_model.set_query(
+                lambda after: schedule_db.schedule_page(conn, filters, sort_column, descending, after))
+            count = schedule_db.count_schedule(conn, filters)
+        except sqlite3.Error as e:
+            print(f"读取课表失败: {str(e)}")
+            QMessageBox.warning(self, "提示", f"读取课表失败，请稍后重试: {str(e)}")
+            return False
+        self.filter_count_label.setText(f"筛选出 {count} 行" if filters else f"共 {count} 行")
+        self.refresh_chart()
+        return True
+
+    def on_schedule_cell_edited(self, row, column, text):
+        """学生或课程被修改后自动填充其余列"""
+        if column == COL_STUDENT:
+            self.update_student_class(row, text)
+        elif column == COL_COURSE:
+            self.update_course_info(row, text)
+
+    def update_student_class(self, row, student_name):
+        """更新学生班级信息"""
+        students = self.lookup_cache.students()
+        if student_name in students:
+            self.schedule_model.set_cell(row, COL_CLASS, students[student_name] or "")
 
-    def update_course_info(self, course_name, combo):
+    def update_course_info(self, row, course_name):
         """更新课程学分和周数信息"""
-        try:
-            cursor = self.db_connection.cursor()
-            cursor.execute("SELECT credit, semester FROM courses WHERE course_name = ?", (course_name,))
-            result = cursor.fetchone()
-            
-            if result:
-                row = self.table_widget.indexAt(combo.pos()).row()
-                credit_edit = self.table_widget.cellWidget(row, 3)  # 学分列
-                semester_edit = self.table_widget.cellWidget(row, 6)  # 周数列
-                
-                if credit_edit and isinstance(credit_edit, QLineEdit):
-                    credit_edit.setText(str(result[0]))
-                if semester_edit and isinstance(semester_edit, QLineEdit):
-                    semester_edit.setText(str(result[1]))
-        except Exception as e:
-            print(f"更新课程信息失败: {str(e)}")
-
-
-    def create_course_combobox(self, current_text=""):
-        """创建课程下拉框"""
-        combo = QComboBox()
-        combo.addItems(self.course_list)
-        combo.setEditable(True)
+        course = self.lookup_cache.courses().get(course_name)
+        if course is not None:
+            credit, semester = course
+            self.schedule_model.set_cell(row, COL_CREDIT, str(credit))
+            self.schedule_model.set_cell(row, COL_SEMESTER, str(semester))
+
+
+    def create_list_combobox(self, model, current_text="", parent=None, editable=True, search_kind=None):
+        """创建使用共享列表模型的下拉框；可编辑时附带补全器，给出 search_kind 时
+        按该类名称的检索索引补全，否则按同一模型做前缀补全"""
+        combo = QComboBox(parent)
+        combo.setModel(model)
+        if editable:
+            combo.setEditable(True)
+            # 输入的新内容不能写回共享模型
+            combo.setInsertPolicy(QComboBox.NoInsert)
+            if search_kind:
+                self.create_search_completer(search_kind, combo)
+            else:
+                completer = QCompleter(model, combo)
+                completer.setCompletionMode(QCompleter.PopupCompletion)
+                completer.setCaseSensitivity(QtCore.Qt.CaseInsensitive)
+                combo.setCompleter(completer)
         combo.setCurrentText(current_text)
+        return combo
 
-        completer = QCompleter(self.course_list, combo)
-        completer.setCompletionMode(QCompleter.PopupCompletion)
-        completer.setCaseSensitivity(QtCore.Qt.CaseInsensitive)
-        combo.setCompleter(completer)
-
-        # 添加信号连接
-        combo.currentTextChanged.connect(lambda text, c=combo: self.update_course_info(text, c))
+    def get_search_indexes(self):
+        """姓名、班级和课程的检索索引，第一次使用时整表建立，之后增量更新"""
+        if self.search_indexes is None:
+            with schedule_trace.span("建立检索索引"):
+                self.search_indexes = schedule_search.load_indexes(self.db_connection)
+        return self.search_indexes
 
-        return combo
+    def create_search_completer(self, kind, widget):
+        """给文本框或可编辑的下拉框装上按 kind（student/class/course）检索的补全器"""
+        completer = SearchCompleter(lambda text: self.get_search_indexes()[kind].search(text), widget)
+        completer.attach(widget)
+        return completer
 
-    def create_time_slot_combobox(self, current_text=""):
-        combo = QComboBox()
-        combo.addItems(self.time_slots)
-        combo.setEditable(True)
-        combo.setCurrentText(current_text)
+    def create_course_combobox(self, current_text="", parent=None):
+        """创建课程下拉框"""
+        return self.create_list_combobox(self.course_model, current_text, parent, search_kind="course")
 
-        completer = QCompleter(self.time_slots, combo)
-        completer.setCompletionMode(QCompleter.PopupCompletion)
-        completer.setCaseSensitivity(QtCore.Qt.CaseInsensitive)
-        combo.setCompleter(completer)
+    def create_time_slot_combobox(self, current_text="", parent=None):
+        return self.create_list_combobox(self.time_slot_model, current_text, parent)
 
-        return combo
-    
-    def create_weekday_combobox(self, current_text=""):
+    def create_weekday_combobox(self, current_text="", parent=None):
         """创建星期下拉框"""
-        combo = QComboBox()
-        combo.addItems(self.weekdays)
-        combo.setCurrentText(current_text)
+        return self.create_list_combobox(self.weekday_model, current_text, parent, editable=False)
+
+    def free_classrooms(self, row):
+        """某行所在时段、课程周次内空闲且能容纳整个班级的教室 [(教室, 容量)]"""
+        values = self.schedule_model.rows[row]
+        course = self.lookup_cache.courses().get(values[COL_COURSE])
+        engine = self.room_engine
+        if course is None or engine is None:
+            return []
+        size = self.lookup_cache.class_sizes().get(values[COL_CLASS] or None, 1)
+        rooms = engine.free_rooms(values[COL_WEEKDAY], values[COL_TIME_SLOT], week_mask(course[1]), size)
+        return [(room, engine.rooms.capacity.get(room)) for room in rooms]
+
+    def create_classroom_combobox(self, row, parent=None):
+        """教室下拉框：列出可用的空闲教室，也可以按教室编号格式手动输入"""
+        combo = QComboBox(parent)
+        combo.setEditable(True)
+        combo.setInsertPolicy(QComboBox.NoInsert)
+        current = self.schedule_model.rows[row][COL_CLASSROOM]
+        rooms = self.free_classrooms(row)
+        if current and current not in {room for room, _ in rooms}:
+            combo.addItem(current)
+        for room, capacity in rooms:
+            combo.addItem(room)
+            if capacity != float("inf"):
+                combo.setItemData(combo.count() - 1, f"容量 {capacity} 人", Qt.ToolTipRole)
+        combo.lineEdit().setValidator(QtGui.QRegExpValidator(QtCore.QRegExp(CLASSROOM_PATTERN), combo))
+        combo.setCurrentText(current)
         return combo
 
     def add_classroom_prefix(self, line_edit):
@@ -813,60 +1118,27 @@ class ScheduleManager(QtWidgets.QMainWindow):
 
     def add_new_row(self):
         """添加新行"""
-        row_position = self.table_widget.rowCount()
-        self.table_widget.insertRow(row_position)
-
-        for column in range(self.table_widget.columnCount()):
-            if column == 0:  # 学生姓名列
-                combo = self.create_student_combobox()
-                self.table_widget.setCellWidget(row_position, column, combo)
-            elif column == 1:  # 班级列 - 只读文本框
-                line_edit = QLineEdit()
-                line_edit.setReadOnly(True)
-                self.table_widget.setCellWidget(row_position, column, line_edit)
-            elif column == 2:  # 课程名称列
-                combo = self.create_course_combobox()
-                self.table_widget.setCellWidget(row_position, column, combo)
-            elif column == 3:  # 学分列
-                line_edit = QLineEdit()
-                line_edit.setReadOnly(True)
-                self.table_widget.setCellWidget(row_position, column, line_edit)
-            elif column == 4:  # 星期列
-                combo = self.create_weekday_combobox()
-                self.table_widget.setCellWidget(row_position, column, combo)
-            elif column == 5:  # 时间段列
-                combo = self.create_time_slot_combobox()
-                self.table_widget.setCellWidget(row_position, column, combo)
-            elif column == 6:  # 周数列
-                line_edit = QLineEdit()
-                line_edit.setReadOnly(True)
-                self.table_widget.setCellWidget(row_position, column, line_edit)
-            elif column == 7:  # 教室列
-                line_edit = QLineEdit()
-                validator = QtGui.QRegExpValidator(QtCore.QRegExp(r"H?[124]\d{2}[1-9]"))
-                line_edit.setValidator(validator)
-                line_edit.editingFinished.connect(lambda le=line_edit: self.add_classroom_prefix(le))
-                self.table_widget.setCellWidget(row_position, column, line_edit)
+        row_position = self.schedule_model.append_row()
+        index = self.schedule_model.index(row_position, COL_STUDENT)
+        self.table_view.scrollTo(index)
+        self.table_view.setCurrentIndex(index)
+        self.table_view.edit(index)
 
 
     def delete_row(self, row):
         reply = QMessageBox.question(self, '确认删除', f'确定要删除第 {row + 1} 行吗？', QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.Yes:
-            cursor = self.db_connection.cursor()
-            student_name_item = self.table_widget.item(row, 0)
-            if student_name_item:
-                student_name = student_name_item.text()
-                cursor.execute("DELETE FROM schedule WHERE student_name = ?", (student_name,))
-                self.db_connection.commit()
-
-            self.table_widget.removeRow(row)
+            # 只移除表格中的行，保存到数据库时生效
+            self.schedule_model.remove_row(row)
         # Update template button text after deletion
-        if self.table_widget.rowCount() == 0:
+        if self.schedule_model.rowCount() == 0:
             self.init_btn.setText("生成课表模板")
 
     def generate_template(self):
+        import pandas as pd
+
         # Check if table has data
-        if self.table_widget.rowCount() > 0:
+        if self.schedule_model.rowCount() > 0:
             # Export current table data
             data = {
                 '学生姓名': [],
@@ -876,27 +1148,14 @@ class ScheduleManager(QtWidgets.QMainWindow):
                 '教室': []
             }
             
-            # Collect data from table
-            for row in range(self.table_widget.rowCount()):
-                # Get student name
-                student_name = self.table_widget.item(row, 0)
-                data['学生姓名'].append(student_name.text() if student_name else '')
-                
-                # Get course name from combobox
-                course_combo = self.table_widget.cellWidget(row, 1)
-                data['课程名称'].append(course_combo.currentText() if course_combo else '')
-                
-                # Get credit from line edit
-                credit_edit = self.table_widget.cellWidget(row, 2)
-                data['学分'].append(credit_edit.text() if credit_edit else '')
-                
-                # Get time slot from combobox
-                time_combo = self.table_widget.cellWidget(row, 3)
-                data['行课时间'].append(time_combo.currentText() if time_combo else '')
+            # Collect data from table model
+            for row_values in self.schedule_model.rows:
+                data['学生姓名'].append(row_values[COL_STUDENT])
+                data['课程名称'].append(row_values[COL_COURSE])
+                data['学分'].append(row_values[COL_CREDIT])
+                data['行课时间'].append(row_values[COL_TIME_SLOT])
                 
-                # Get classroom from line edit
-                classroom_edit = self.table_widget.cellWidget(row, 4)
-                classroom = classroom_edit.text() if classroom_edit else ''
+                classroom = row_values[COL_CLASSROOM]
                 # Remove 'H' prefix for export if it exists
                 if classroom.startswith('H'):
                     classroom = classroom[1:]
@@ -941,99 +1200,72 @@ class ScheduleManager(QtWidgets.QMainWindow):
                     QMessageBox.critical(self, "错误", f"模板生成失败: {str(e)}")
     
         # Update button text based on table content
-        if self.table_widget.rowCount() > 0:
+        if self.schedule_model.rowCount() > 0:
             self.template_btn.setText("导出课表")
         else:
             self.template_btn.setText("生成课表模板")
 
+    @traced("保存表格")
     def save_to_database(self):
-        """保存当前表格数据到数据库"""
-        try:
-            cursor = self.db_connection.cursor()
-            
-            # 清空现有数据
-            cursor.execute("DELETE FROM schedule")
-            
-            # 保存每一行数据
-            for row in range(self.table_widget.rowCount()):
-                # 获取各列的数据
-                student_widget = self.table_widget.cellWidget(row, 0)
-                course_widget = self.table_widget.cellWidget(row, 2)
-                credit_widget = self.table_widget.cellWidget(row, 3)
-                weekday_widget = self.table_widget.cellWidget(row, 4)
-                time_widget = self.table_widget.cellWidget(row, 5)
-                semester_widget = self.table_widget.cellWidget(row, 6)
-                classroom_widget = self.table_widget.cellWidget(row, 7)
-
-                # 检查必要的控件是否存在
-                if not all([student_widget, course_widget]):
-                    continue
-
-                # 根据控件类型获取值
-                student_name = student_widget.currentText() if isinstance(student_widget, QComboBox) else ""
-                course_name = course_widget.currentText() if isinstance(course_widget, QComboBox) else ""
-                credit = credit_widget.text() if isinstance(credit_widget, QLineEdit) else "0"
-                weekday = weekday_widget.currentText() if isinstance(weekday_widget, QComboBox) else ""
-                time_slot = time_widget.currentText() if isinstance(time_widget, QComboBox) else ""
-                semester = semester_widget.text() if isinstance(semester_widget, QLineEdit) else ""
-                classroom = classroom_widget.text() if isinstance(classroom_widget, QLineEdit) else ""
-
-                # 跳过空行
-                if not all([student_name, course_name]):
-                    continue
-
-                # 插入数据库
-                try:
-                    cursor.execute("""
-                        INSERT INTO schedule 
-                        (student_name, course_name, credit, weekday, time_slot, classroom, semester)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, (student_name, course_name, credit, weekday, time_slot, classroom, semester))
-                except sqlite3.Error as e:
-                    print(f"插入行 {row + 1} 时出错: {str(e)}")
-                    continue
-
-            self.db_connection.commit()
-            print("数据保存成功")
+        """只把表格中新增、修改和删除的行写入数据库"""
+        model = self.schedule_model
+        rows = model.changed_rows()
+        if not rows and not model.deleted_ids:
             return True
-
+        deleted = len(model.deleted_ids)
+        # 改动前这些行占用的教室，保存后从教室占用索引中释放
+        old_rooms = schedule_db.room_occupancy(
+            self.db_connection, [model.ids[row] for row in rows] + list(model.deleted_ids)
+        ) if self.room_engine is not None else None
+        try:
+            saved_ids = schedule_db.save_schedule_changes(
+                self.db_connection, [(model.ids[row], model.rows[row]) for row in rows], model.deleted_ids)
         except Exception as e:
             print(f"保存到数据库失败: {str(e)}")
-            self.db_connection.rollback()
             return False
 
+        model.mark_saved(rows, saved_ids)
+        self.schedule_engine = None
+        if old_rooms is not None and self.room_engine is not None:
+            self.room_engine.update_rooms(old_rooms, release=True)
+            self.room_engine.update_rooms(schedule_db.room_occupancy(self.db_connection, saved_ids))
+        else:
+            # 索引正在后台建立，可能读到保存前的课表，重新建立
+            self.reload_room_engine()
+        self.lookup_cache.invalidate()
+        if self.search_indexes is not None:
+            schedule_search.add_new_names(self.search_indexes, self.db_connection)
+        print(f"数据保存成功：写入 {len(rows)} 行，删除 {deleted} 行")
+        # 只检查与写入的行同一学生、同一教室的记录
+        self.show_clash_report(schedule_clash.find_clashes(self.db_connection, saved_ids), report_clean=False)
+        return True
+
     def import_from_sqlite(self):
         options = QFileDialog.Options()
         file_name, _ = QFileDialog.getOpenFileName(self, "从 SQLite 文件导入", "", "SQLite Files (*.db);;All Files (*)", options=options)
-        if file_name:
-            try:
-                cursor = self.db_connection.cursor()
-                cursor.execute("DELETE FROM schedule")
-                self.db_connection.commit()
-
-                new_conn = sqlite3.connect(file_name)
-                new_cursor = new_conn.cursor()
-                new_cursor.execute("SELECT student_name, course_name, credit, time_slot, classroom FROM schedule")
-                rows = new_cursor.fetchall()
-
-                cursor.executemany("""
-                    INSERT INTO schedule (student_name, course_name, credit, time_slot, classroom)
-                    VALUES (?, ?, ?, ?, ?)
-                """, rows)
-                self.db_connection.commit()
-                new_conn.close()
-
-                self.imported_file_path = file_name
-                self.update_status_label("sqlite")
-                self.load_schedule_into_table()
-                QMessageBox.information(self, "成功", "数据已从 SQLite 文件导入")
-            except sqlite3.Error as e:
-                print(f"导入失败: {str(e)}")
-                QMessageBox.critical(self, "错误", f"导入失败: {str(e)}")
-            except Exception as e:
-                print(f"导入时出现未预料的错误: {str(e)}")
-                QMessageBox.critical(self, "错误", f"导入时出现未预料的错误: {str(e)}")
-
+        if not file_name:
+            return
+        reply = QMessageBox.question(
+            self, "从 SQLite 文件导入",
+            "选择“是”用文件替换当前数据库；\n选择“否”把文件中的学生、课程和课表合并到当前数据库。",
+            QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel, QMessageBox.Cancel)
+        if reply == QMessageBox.Yes:
+            self.task_runner.start("从SQLite导入", schedule_io.import_schedule_sqlite, file_name,
+                                   on_finished=lambda count: self.on_sqlite_imported(file_name, "导入"),
+                                   on_cancelled=self.on_schedule_import_stopped, writes=True)
+        elif reply == QMessageBox.No:
+            self.task_runner.start("合并SQLite文件", schedule_io.merge_schedule_sqlite, file_name,
+                                   on_finished=lambda count: self.on_sqlite_imported(file_name, "合并"),
+                                   on_cancelled=self.on_schedule_import_stopped, writes=True)
+
+    def on_sqlite_imported(self, file_name, action):
+        self.imported_file_path = file_name
+        self.update_status_label("sqlite")
+        self.on_schedule_import_stopped()
+        # 导入或合并可能带来新的学生和课程
+        self.update_dropdowns()
+        QMessageBox.information(self, "成功", f"数据已从 SQLite 文件{action}")
+        self.check_clashes(report_clean=False)
 
     def export_to_sqlite(self):
         # Save the current table data to the database
@@ -1045,78 +1277,25 @@ class ScheduleManager(QtWidgets.QMainWindow):
         options = QFileDialog.Options()
         file_name, _ = QFileDialog.getSaveFileName(self, "导出至 SQLite 文件", "", "SQLite Files (*.db);;All Files (*)", options=options)
         if file_name:
-            try:
-                # Connect to the new SQLite file
-                new_conn = sqlite3.connect(file_name)
-                new_cursor = new_conn.cursor()
-                new_cursor.execute("""
-                    CREATE TABLE IF NOT EXISTS schedule (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        student_name TEXT,
-                        course_name TEXT,
-                        credit INTEGER,
-                        time_slot TEXT,
-                        classroom TEXT
-                    )
-                """)
-                new_conn.commit()
-
-                # Copy data from the current database to the new SQLite file
-                cursor = self.db_connection.cursor()
-                cursor.execute("SELECT student_name, course_name, credit, time_slot, classroom FROM schedule")
-                rows = cursor.fetchall()
-                new_cursor.executemany("""
-                    INSERT INTO schedule (student_name, course_name, credit, time_slot, classroom)
-                    VALUES (?, ?, ?, ?, ?)
-                """, rows)
-                new_conn.commit()
-                new_conn.close()
-                QMessageBox.information(self, "成功", "数据已导出至 SQLite 文件")
-            except sqlite3.Error as e:
-                QMessageBox.critical(self, "错误", f"导出失败: {str(e)}")
-            except Exception as e:
-                print(f"导出时出现未预料的错误: {str(e)}")
-                QMessageBox.critical(self, "错误", f"导出时出现未预料的错误: {str(e)}")
+            self.task_runner.start(
+                "导出至SQLite", schedule_io.export_schedule_sqlite, file_name,
+                on_finished=lambda count: QMessageBox.information(self, "成功", "数据已导出至 SQLite 文件"))
 
+    @traced("刷新下拉列表")
     def update_dropdowns(self):
         """更新下拉列表的内容"""
-        cursor = self.db_connection.cursor()
-        
-        # 更新学生列表
-        cursor.execute("SELECT student_name FROM students")
-        self.student_list = [row[0] for row in cursor.fetchall()]
-        
-        # 更新课程列表
-        cursor.execute("SELECT course_name FROM courses")
-        self.course_list = [row[0] for row in cursor.fetchall()]
+        # 学生和课程可能整表替换，检索索引在下次补全时重建
+        self.search_indexes = None
+        self.load_students()
+        self.load_courses()
 
-    def create_student_combobox(self, current_text=""):
+    def create_student_combobox(self, current_text="", parent=None):
         """创建学生下拉框"""
-        combo = QComboBox()
-        combo.addItems([name.strip() for name in self.student_list])
-        combo.setEditable(True)
-        combo.setCurrentText(current_text.strip())
-
-        completer = QCompleter(self.student_list, combo)
-        completer.setCompletionMode(QCompleter.PopupCompletion)
-        completer.setCaseSensitivity(QtCore.Qt.CaseInsensitive)
-        combo.setCompleter(completer)
-
-        # 添加信号连接
-        combo.currentTextChanged.connect(lambda text, c=combo: self.update_student_class(text, c))
-
-        return combo
-
-    def show_student_manager(self):
-        self.student_manager = StudentManager(self.db_connection, self)
-        self.student_manager.show()
-
-    def show_course_manager(self):
-        self.course_manager = CourseManager(self.db_connection, self)
-        self.course_manager.show()
+        return self.create_list_combobox(self.student_model, current_text.strip(), parent, search_kind="student")
 
 class StudentManager(QtWidgets.QDialog):
-    student_updated = pyqtSignal()
+    # (操作: add/edit/delete, 学生 id, 编辑前的班级)
+    student_updated = pyqtSignal(str, int, str)
 
     def __init__(self, db_connection, parent=None):
         super().__init__(parent)
@@ -1154,7 +1333,7 @@ class StudentManager(QtWidgets.QDialog):
 
     def load_students(self):
         cursor = self.db_connection.cursor()
-        cursor.execute("SELECT student_name, class_name FROM students")
+        cursor.execute("SELECT student_name, class_name, id FROM students")
         students = cursor.fetchall()
 
         self.student_table.setRowCount(len(students))
@@ -1171,9 +1350,10 @@ class StudentManager(QtWidgets.QDialog):
                 try:
                     cursor = self.db_connection.cursor()
                     cursor.execute("INSERT INTO students (student_name, class_name) VALUES (?, ?)", (name, class_name))
+                    student_id = cursor.lastrowid
                     self.db_connection.commit()
                     self.load_students()
-                    self.student_updated.emit()
+                    self.student_updated.emit("add", student_id, "")
                     QMessageBox.information(self, "成功", "学生添加成功")
                 except sqlite3.IntegrityError:
                     QMessageBox.warning(self, "错误", "该学生已存在")
@@ -1185,6 +1365,7 @@ class StudentManager(QtWidgets.QDialog):
         if current_row >= 0:
             old_name = self.student_table.item(current_row, 0).text()
             old_class = self.student_table.item(current_row, 1).text()
+            student_id = int(self.student_table.item(current_row, 2).text())
 
             name, ok = QInputDialog.getText(self, "编辑学生", "请输入新的学生姓名:", text=old_name)
             if ok and name:
@@ -1192,10 +1373,13 @@ class StudentManager(QtWidgets.QDialog):
                 if ok:
                     try:
                         cursor = self.db_connection.cursor()
-                        cursor.execute("UPDATE students SET student_name = ?, class_name = ? WHERE student_name = ?", (name, class_name, old_name))
+                        # 修改前的班级，增量排课据此判断是否需要重排
+                        cursor.execute("SELECT class_name FROM students WHERE id = ?", (student_id,))
+                        previous_class = cursor.fetchone()[0] or ""
+                        cursor.execute("UPDATE students SET student_name = ?, class_name = ? WHERE id = ?", (name, class_name, student_id))
                         self.db_connection.commit()
                         self.load_students()
-                        self.student_updated.emit()
+                        self.student_updated.emit("edit", student_id, previous_class)
                         QMessageBox.information(self, "成功", "学生信息更新成功")
                     except sqlite3.IntegrityError:
                         QMessageBox.warning(self, "错误", "该学生已存在")
@@ -1206,21 +1390,24 @@ class StudentManager(QtWidgets.QDialog):
         current_row = self.student_table.currentRow()
         if current_row >= 0:
             student_name = self.student_table.item(current_row, 0).text()
+            student_id = int(self.student_table.item(current_row, 2).text())
 
             reply = QMessageBox.question(self, '确认删除', f'确定要删除学生 {student_name} 吗？', QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
             if reply == QMessageBox.Yes:
                 try:
                     cursor = self.db_connection.cursor()
-                    cursor.execute("DELETE FROM students WHERE student_name = ?", (student_name,))
+                    # 外键级联删除该学生的课表
+                    cursor.execute("DELETE FROM students WHERE id = ?", (student_id,))
                     self.db_connection.commit()
                     self.load_students()
-                    self.student_updated.emit()
+                    self.student_updated.emit("delete", student_id, "")
                     QMessageBox.information(self, "成功", "学生删除成功")
                 except Exception as e:
                     QMessageBox.critical(self, "错误", f"删除失败: {str(e)}")
 
 class CourseManager(QtWidgets.QDialog):
-    course_updated = pyqtSignal()
+    # (操作: add/edit/delete, 课程 id, 编辑前的周数)
+    course_updated = pyqtSignal(str, int, str)
 
     def __init__(self, db_connection, parent=None):
         super().__init__(parent)
@@ -1271,22 +1458,7 @@ class CourseManager(QtWidgets.QDialog):
                 self.course_table.setItem(row, col, item)
 
     def add_course(self):
-        course_list = [
-            "高等数学", "线性代数", "大学物理", "大学物理实验", "工程数学", "大学物理", 
-            "大学物理实验", "概率论与数理统计", "工程导论", "c语言编程与实践", "电路分析基础", 
-            "工程实践", "金工实习", "工程制图", "模拟电子技术", "运筹学", "数字电路与逻辑设计", 
-            "信号与系统", "自动控制原理", "电子系统设计与实现", "微处理器与微计算机系统", 
-            "传感器与检测技术", "现代控制理论", "面向对象程序设计(C++)", "机械学基础", 
-            "机器人操作系统基础", "机器人系统软件设计", "机器人学基础", "人工智能", 
-            "机器人设计与实现", "Python编程技术", "系统仿真编程技术", "嵌入式系统原理与设计", 
-            "图像处理与机器视觉", "模式识别与机器学习", "无人驾驶技术", "三维建模及仿真", 
-            "机器人控制元件与控制系", "移动机器人定位与导航", "思想道德与法治", "中国近现代史纲要", 
-            "形势与政策", "马克思主义基本原理", "毛泽东思想和中国特色社会", 
-            "义理论体系概论", "习近平新时代中国特色社会主义思想概论", "大学英语", 
-            "创新创业教育基础", "TRIZ创新方法", "创业培训", "创新、发明与知识产权实践"
-        ]
-
-        dialog = SelectCourseDialog(course_list)
+        dialog = SelectCourseDialog(schedule_db.COURSE_CATALOG)
         if dialog.exec_() == QDialog.Accepted:
             selected_course = dialog.selected_course
             if selected_course:
@@ -1295,14 +1467,10 @@ class CourseManager(QtWidgets.QDialog):
                     semester, ok = QInputDialog.getText(self, "添加课程", "请输入周数\n(例如: 第1至17周):")
                     if ok:
                         try:
-                            cursor = self.db_connection.cursor()
-                            cursor.execute("""
-                                INSERT INTO courses (course_name, credit, semester)
-                                VALUES (?, ?, ?)
-                            """, (selected_course, credit, semester))
+                            course_id = schedule_db.insert_course(self.db_connection, selected_course, credit, semester)
                             self.db_connection.commit()
                             self.load_courses()
-                            self.course_updated.emit()
+                            self.course_updated.emit("add", course_id, "")
                             QMessageBox.information(self, "成功", "课程添加成功")
                         except sqlite3.IntegrityError:
                             QMessageBox.warning(self, "错误", "该课程已存在")
@@ -1324,14 +1492,13 @@ class CourseManager(QtWidgets.QDialog):
                     if ok:
                         try:
                             cursor = self.db_connection.cursor()
-                            cursor.execute("""
-                                UPDATE courses 
-                                SET course_name = ?, credit = ?, semester = ?
-                                WHERE course_name = ?
-                            """, (name, credit, semester, old_name))
+                            # 修改前的周数，增量排课据此判断是否需要重排
+                            cursor.execute("SELECT id, semester FROM courses WHERE course_name = ?", (old_name,))
+                            course_id, previous_semester = cursor.fetchone()
+                            schedule_db.update_course(self.db_connection, course_id, name, credit, semester)
                             self.db_connection.commit()
                             self.load_courses()
-                            self.course_updated.emit()
+                            self.course_updated.emit("edit", course_id, previous_semester or "")
                             QMessageBox.information(self, "成功", "课程信息更新成功")
                         except sqlite3.IntegrityError:
                             QMessageBox.warning(self, "错误", "该课程已存在")
@@ -1347,10 +1514,13 @@ class CourseManager(QtWidgets.QDialog):
             if reply == QMessageBox.Yes:
                 try:
                     cursor = self.db_connection.cursor()
-                    cursor.execute("DELETE FROM courses WHERE course_name = ?", (course_name,))
+                    cursor.execute("SELECT id FROM courses WHERE course_name = ?", (course_name,))
+                    course_id = cursor.fetchone()[0]
+                    # 外键级联删除该课程的课表
+                    cursor.execute("DELETE FROM courses WHERE id = ?", (course_id,))
                     self.db_connection.commit()
                     self.load_courses()
-                    self.course_updated.emit()
+                    self.course_updated.emit("delete", course_id, "")
                     QMessageBox.information(self, "成功", "课程删除成功")
                 except Exception as e:
                     QMessageBox.critical(self, "错误", f"删除失败: {str(e)}")
@@ -1385,6 +1555,15 @@ class SelectCourseDialog(QDialog):
 
         layout = QVBoxLayout()
 
+        # 按名称、名称中的字或拼音首字母查找课程，回车选择第一个匹配的课程
+        self.search_index = schedule_search.SearchIndex(enumerate(self.course_list))
+        self.search_edit = QLineEdit()
+        self.search_edit.setPlaceholderText("搜索课程，如 机器人 或 jqr")
+        self.search_edit.setClearButtonEnabled(True)
+        self.search_edit.textChanged.connect(self.find_courses)
+        self.search_edit.returnPressed.connect(self.select_course_btn)
+        layout.addWidget(self.search_edit)
+
         # 创建表格
         self.course_table = QTableWidget()
         self.course_table.setEditTriggers(QTableWidget.NoEditTriggers)  # 设置为不可编辑
@@ -1431,6 +1610,24 @@ class SelectCourseDialog(QDialog):
         layout.addLayout(button_layout)
         self.setLayout(layout)
 
+    def find_courses(self, text):
+        """未匹配的课程变灰，并选中排在最前的匹配课程"""
+        matches = self.search_index.search(text, len(self.course_list))
+        matched = set(matches) if text.strip() else None
+        first = None
+        for row in range(self.course_table.rowCount()):
+            for col in range(self.course_table.columnCount()):
+                item = self.course_table.item(row, col)
+                if item is None:
+                    continue
+                dimmed = matched is not None and item.text() not in matched
+                item.setForeground(QtGui.QBrush(Qt.gray if dimmed else Qt.black))
+                if matches and item.text() == matches[0] and first is None:
+                    first = item
+        if first is not None:
+            self.course_table.setCurrentItem(first)
+            self.course_table.scrollToItem(first)
+
     def select_course_btn(self):
         """通过按钮选择课程"""
         current_item = self.course_table.currentItem()
@@ -1448,6 +1645,7 @@ class SelectCourseDialog(QDialog):
 if __name__ == "__main__":
     try:
         app = QtWidgets.QApplication(sys.argv)
+        schedule_trace.enable()
         mainWin = ScheduleManager()
         mainWin.show()
         sys.exit(app.exec_())
@@ -0,0 +1,256 @@
+"""测试数据生成与性能基准
+
+generate_data 按给定规模生成学生、班级和课程（周数为常见的整学期、前后半学期
+和分段周次），用来在开发时复现大规模数据下的性能问题。run_benchmarks 在临时
+目录中的新数据库上依次计时排课、加载主表格、Excel/SQLite 导入导出和按班级
+统计，结果写成 JSON，便于不同版本之间对比。
+
+    python schedule_bench.py --students 100000 --classes 300 --courses 200 --output bench.json
+    python schedule_bench.py --baseline bench.json --output bench-new.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import schedule_db
+import schedule_io
+import schedule_search
+
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何林罗高郑梁谢宋唐许韩冯邓曹彭曾肖田董潘袁蔡蒋余于杜叶程魏苏吕丁任沈姚卢傅钟姜崔谭廖范汪陆金石戴贾韦夏邱方侯邹熊孟秦白江阎薛尹段雷黎史龙陶贺顾毛郝龚邵万钱严覃武"
+GIVEN_CHARS = "伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉萍红鹏飞婷宇晨浩然子轩梓涵一诺欣怡雨泽博文思远嘉琪俊熙佳怡若曦逸辰晓彤梦瑶宏志瑞雪"
+MAJORS = ["自动化", "计算机", "软件工程", "电子信息", "通信工程", "机械", "土木", "电气", "数学", "物理",
+          "化学", "材料", "经济", "会计", "英语", "法学", "建筑", "环境", "生物", "统计"]
+SUBJECTS = ["高等数学", "线性代数", "概率论与数理统计", "大学物理", "大学英语", "Python编程技术",
+            "C语言程序设计", "数据结构", "电路原理", "模拟电子技术", "数字电子技术", "信号与系统",
+            "自动控制原理", "操作系统", "计算机网络", "数据库原理", "离散数学", "工程制图",
+            "理论力学", "材料力学", "思想道德与法治", "中国近现代史纲要", "马克思主义基本原理",
+            "形势与政策", "体育", "军事理论", "大学物理实验", "机械设计", "微机原理", "嵌入式系统"]
+# 生成的教室容量，排课时按班级人数选用最小的够用教室
+ROOM_CAPACITIES = [30, 45, 60, 90, 120, 200]
+CREDITS = [1.0, 1.5, 2.0, 2.0, 2.5, 3.0, 3.0, 3.5, 4.0, 4.0, 5.0]
+DEFAULT_SCALE = {"students": 10000, "classes": 60, "courses": 20}
+BENCHMARKS = ["auto_schedule", "load_table", "export_excel", "import_excel",
+              "export_sqlite", "import_sqlite", "weekday_counts", "student_schedule", "filter_student",
+              "search_names"]
+
+
+def random_semester(rng):
+    """常见的周数写法：整学期、前半学期、后半学期，少数课程分两段上"""
+    kind = rng.random()
+    if kind < 0.15:
+        first_end = rng.randint(6, 9)
+        return f"1-{first_end},{first_end + 2}-{rng.randint(first_end + 6, 18)}"
+    if kind < 0.35:
+        return f"1-{rng.randint(8, 10)}"
+    if kind < 0.5:
+        return f"{rng.randint(8, 10)}-{rng.randint(16, 18)}"
+    start = rng.randint(1, 4)
+    return f"{start}-{rng.randint(max(start + 9, 14), 18)}"
+
+
+def unique_names(rng, count, make):
+    """生成 count 个不重复的名称，随机空间不足时加编号"""
+    names = set()
+    attempts = 0
+    while len(names) < count:
+        name = make(rng)
+        attempts += 1
+        if name in names and attempts > count * 3:
+            name = f"{name}{len(names)}"
+        names.add(name)
+    return sorted(names, key=lambda _: rng.random())
+
+
+def generate_data(conn, students=DEFAULT_SCALE["students"], classes=DEFAULT_SCALE["classes"],
+                  courses=DEFAULT_SCALE["courses"], seed=0):
+    """清空数据库并生成给定规模的学生、班级和课程，返回各自的数量；相同 seed 生成相同数据"""
+    rng = random.Random(seed)
+    class_names = unique_names(rng, classes, lambda r: f"{r.choice(MAJORS)}{r.randint(21, 24)}{r.randint(1, 9)}")
+    student_names = unique_names(
+        rng, students, lambda r: r.choice(SURNAMES) + "".join(r.choice(GIVEN_CHARS) for _ in range(r.randint(1, 2))))
+    course_names = unique_names(
+        rng, courses, lambda r: r.choice(SUBJECTS) + r.choice(["", "", "A", "B", "（一）", "（二）", "实验"]))
+    try:
+        conn.execute("DELETE FROM schedule")
+        conn.execute("DELETE FROM students")
+        conn.execute("DELETE FROM courses")
+        conn.execute("DELETE FROM classrooms")
+        conn.execute("DELETE FROM sqlite_sequence WHERE name IN ('students', 'courses', 'schedule', 'classrooms')")
+        student_classes = [(name, rng.choice(class_names)) for name in student_names]
+        conn.executemany("INSERT INTO students (student_name, class_name) VALUES (?, ?)", student_classes)
+        # 教室数随班级数增长，最大的教室能容纳最大的班级
+        largest = max(Counter(class_name for _, class_name in student_classes).values(), default=0)
+        capacities = ROOM_CAPACITIES + [largest] * (largest > ROOM_CAPACITIES[-1])
+        rooms = [f"H{building}{number:02d}" for building in (1, 2, 4) for number in range(1, max(20, classes) + 1)]
+        conn.executemany("INSERT INTO classrooms (room, building, capacity) VALUES (?, ?, ?)",
+                         ((room, room[:2], capacities[index % len(capacities)]) for index, room in enumerate(rooms)))
+        for name in course_names:
+            schedule_db.insert_course(conn, name, rng.choice(CREDITS), random_semester(rng))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return {"students": students, "classes": classes, "courses": courses}
+
+
+def git_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_table(conn):
+    """与主窗口加载表格相同：统计行数并把第一页交给表格模型；没有 PyQt5 时只计读取"""
+    schedule_db.count_schedule(conn)
+    try:
+        from StedentCourse import ScheduleTableModel
+    except ImportError:
+        return len(schedule_db.schedule_page(conn)[0])
+    model = ScheduleTableModel()
+    model.set_query(lambda after: schedule_db.schedule_page(conn, after=after))
+    return model.rowCount()
+
+
+def run_benchmarks(work_dir, scale=None, seed=0, only=None, progress=None):
+    """在 work_dir 中的新数据库上运行基准，返回 {名称: {"seconds": 用时, ...}}"""
+    scale = dict(DEFAULT_SCALE, **(scale or {}))
+    selected = [name for name in BENCHMARKS if not only or name in only]
+    db_path = os.path.join(work_dir, "bench.db")
+    excel_path = os.path.join(work_dir, "bench.xlsx")
+    sqlite_path = os.path.join(work_dir, "bench-copy.db")
+    results = {}
+
+    @contextlib.contextmanager
+    def timed(name):
+        entry = results.setdefault(name, {})
+        if progress is not None:
+            progress(len(results), len(selected) + 1, name)
+        start = time.perf_counter()
+        yield entry
+        entry["seconds"] = round(time.perf_counter() - start, 4)
+
+    conn = schedule_db.connect(db_path)
+    try:
+        with timed("generate") as entry:
+            entry.update(generate_data(conn, seed=seed, **scale))
+        # 其余基准依赖排课结果，未选中排课时也要先排一次
+        if "auto_schedule" not in selected:
+            schedule_db.auto_schedule(conn, schedule_db.WEEKDAYS, schedule_db.TIME_SLOTS)
+        for name in selected:
+            # 导入用的文件在计时之前准备好
+            if name == "import_excel" and not os.path.exists(excel_path):
+                schedule_io.export_schedule_excel(conn, excel_path)
+            if name == "import_sqlite" and not os.path.exists(sqlite_path):
+                schedule_io.export_schedule_sqlite(conn, sqlite_path)
+
+            with timed(name) as entry:
+                if name == "auto_schedule":
+                    _, result = schedule_db.auto_schedule(conn, schedule_db.WEEKDAYS, schedule_db.TIME_SLOTS)
+                    entry.update(rows=len(result.rows), unplaced=len(result.unplaced))
+                elif name == "load_table":
+                    entry["rows"] = load_table(conn)
+                elif name == "export_excel":
+                    entry["rows"] = schedule_io.export_schedule_excel(conn, excel_path)
+                elif name == "import_excel":
+                    entry["rows"] = schedule_io.import_schedule_excel(conn, excel_path)[0]
+                elif name == "export_sqlite":
+                    entry["rows"] = schedule_io.export_schedule_sqlite(conn, sqlite_path)
+                elif name == "import_sqlite":
+                    entry["rows"] = schedule_io.import_schedule_sqlite(conn, sqlite_path)
+                elif name == "weekday_counts":
+                    # 每个班级、每一周统计一次，与切换图表筛选条件相同
+                    classes = [row[0] for row in conn.execute("SELECT DISTINCT class_name FROM students")]
+                    for class_name in classes:
+                        for week in range(1, 18):
+                            schedule_db.slot_counts(conn, class_name, week, schedule_db.WEEKDAYS,
+                                                    schedule_db.TIME_SLOTS)
+                    entry["calls"] = len(classes) * 17
+                elif name == "student_schedule":
+                    names = [row[0] for row in conn.execute(
+                        "SELECT student_name FROM students ORDER BY random() LIMIT 1000")]
+                    entry["rows"] = sum(len(conn.execute(schedule_db.STUDENT_SCHEDULE_SQL, (student,)).fetchall())
+                                        for student in names)
+                    entry["calls"] = len(names)
+                elif name == "filter_student":
+                    # 在主表格筛选栏输入学生姓名：统计行数并读取第一页
+                    names = [row[0] for row in conn.execute(
+                        "SELECT student_name FROM students ORDER BY random() LIMIT 1000")]
+                    for student in names:
+                        schedule_db.count_schedule(conn, {"student": student})
+                        entry["rows"] = entry.get("rows", 0) + len(
+                            schedule_db.schedule_page(conn, {"student": student})[0])
+                    entry["calls"] = len(names)
+                elif name == "search_names":
+                    # 建立检索索引，再按姓名前缀、名称中的字和拼音首字母各查一次
+                    built = time.perf_counter()
+                    indexes = schedule_search.load_indexes(conn)
+                    entry["build_seconds"] = round(time.perf_counter() - built, 4)
+                    names = [row[0] for row in conn.execute(
+                        "SELECT student_name FROM students ORDER BY random() LIMIT 1000")]
+                    queries = [query for student in names
+                               for query in (student[:1], student[1:], schedule_search.pinyin_initials(student))]
+                    slowest = 0.0
+                    searched = time.perf_counter()
+                    for query in queries:
+                        started = time.perf_counter()
+                        entry["rows"] = entry.get("rows", 0) + len(indexes["student"].search(query))
+                        slowest = max(slowest, time.perf_counter() - started)
+                    # 不计建立索引的时间
+                    entry["ms_per_search"] = round((time.perf_counter() - searched) * 1000 / max(len(queries), 1), 4)
+                    entry["max_ms"] = round(slowest * 1000, 3)
+            if "calls" in entry:
+                entry["ms_per_call"] = round(entry["seconds"] * 1000 / max(entry["calls"], 1), 3)
+    finally:
+        conn.close()
+    return results
+
+
+def compare(results, baseline):
+    """给每项结果加上与基准文件相比的用时倍数，大于 1 表示变慢"""
+    for name, entry in results.items():
+        old = baseline.get("results", {}).get(name, {}).get("seconds")
+        if old:
+            entry["vs_baseline"] = round(entry["seconds"] / old, 3)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成测试数据并运行性能基准")
+    for name, value in DEFAULT_SCALE.items():
+        parser.add_argument(f"--{name}", type=int, default=value, help="默认 %(default)s")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="只运行这些基准")
+    parser.add_argument("--output", help="结果 JSON 文件，默认输出到标准输出")
+    parser.add_argument("--baseline", help="与之对比的旧结果 JSON 文件")
+    args = parser.parse_args(argv)
+
+    scale = {name: getattr(args, name) for name in DEFAULT_SCALE}
+    with tempfile.TemporaryDirectory() as work_dir, contextlib.redirect_stdout(sys.stderr):
+        results = run_benchmarks(work_dir, scale, args.seed, args.only,
+                                 progress=lambda done, total, name: print(f"[{done}/{total}] {name}"))
+    report = {"version": git_version(), "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+              "cpus": os.cpu_count(), "scale": scale, "seed": args.seed, "results": results}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            compare(results, json.load(f))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""统计图表面板：嵌入窗口的 matplotlib 画布，切换班级或周数时原地重绘
+
+坐标轴、中文刻度等静态部分画好后缓存为背景，筛选变化时只重画柱子或
+热力图格子（blit）；坐标范围按 1、2、5 的整数倍取整，只有超出时才整图重绘。
+本模块会导入 matplotlib，较慢，主窗口第一次打开图表时才导入。
+"""
+import math
+import os
+import sqlite3
+
+from matplotlib import font_manager
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+from matplotlib.figure import Figure
+from PyQt5 import QtWidgets
+
+import schedule_db
+
+FONT_PATH = "./ubuntu.ttf"
+CHART_BAR = "每天上课频次"
+CHART_HEATMAP = "星期 × 时段热力图"
+
+_font = None
+
+
+def chart_font():
+    """图表字体只加载一次；字体文件不存在时使用 matplotlib 默认字体"""
+    global _font
+    if _font is None:
+        _font = font_manager.FontProperties(fname=FONT_PATH) if os.path.exists(FONT_PATH) \
+            else font_manager.FontProperties()
+    return _font
+
+
+def nice_limit(value):
+    """不小于 value 的 1、2、5 × 10^n，使坐标范围在相近的数据之间保持不变"""
+    if value <= 1:
+        return 1
+    power = 10 ** math.floor(math.log10(value))
+    for step in (1, 2, 5, 10):
+        if value <= step * power:
+            return step * power
+
+
+class ChartPanel(QtWidgets.QDialog):
+    """统计图表窗口：同一个画布在柱状图与热力图之间切换，数据变化时只更新图形数据"""
+
+    def __init__(self, db_connection, weekdays, time_slots, parent=None):
+        super().__init__(parent)
+        self.db_connection = db_connection
+        self.weekdays = weekdays
+        self.time_slots = time_slots
+        self.class_name = ""
+        self.week = 1
+        self.mode = None
+        self.bars = None
+        self.image = None
+        self.labels = []
+        self.limit = None
+        self.background = None
+
+        self.setWindowTitle("上课频次统计")
+        self.resize(900, 600)
+        layout = QtWidgets.QVBoxLayout(self)
+        self.mode_combobox = QtWidgets.QComboBox(self)
+        self.mode_combobox.addItems([CHART_BAR, CHART_HEATMAP])
+        self.mode_combobox.currentTextChanged.connect(lambda _: self.refresh())
+        layout.addWidget(self.mode_combobox)
+        self.figure = Figure(figsize=(9, 6))
+        self.canvas = FigureCanvasQTAgg(self.figure)
+        self.canvas.mpl_connect("draw_event", self.on_draw)
+        layout.addWidget(self.canvas)
+
+    def set_filter(self, class_name, week):
+        self.class_name = class_name
+        self.week = week
+        self.refresh()
+
+    def refresh(self):
+        if not self.isVisible():
+            return
+        try:
+            counts = schedule_db.slot_counts(self.db_connection, self.class_name, self.week,
+                                             self.weekdays, self.time_slots)
+        except sqlite3.Error as e:
+            # 数据库暂时不可读时保留当前图形，下次切换班级或周数时再读
+            self.setWindowTitle(f"上课频次统计 - 读取失败: {e}")
+            return
+        mode = self.mode_combobox.currentText()
+        if mode != self.mode:
+            self.setup_axes(mode)
+        if mode == CHART_BAR:
+            values = [sum(row) for row in counts]
+            for bar, value in zip(self.bars, values):
+                bar.set_height(value)
+        else:
+            values = [count for row in counts for count in row]
+            self.image.set_data(counts)
+            for label, count in zip(self.labels, values):
+                label.set_text(str(count) if count else "")
+        # 班级和周数显示在窗口标题中，图中的文字不随筛选变化，重绘时不必重新排版中文
+        self.setWindowTitle(f"上课频次统计 - {self.class_name} 第{self.week}周")
+
+        limit = nice_limit(max(values))
+        if limit != self.limit or self.background is None:
+            self.limit = limit
+            if mode == CHART_BAR:
+                self.axes.set_ylim(0, limit)
+            else:
+                self.image.set_clim(0, limit)
+            self.canvas.draw_idle()
+        else:
+            self.canvas.restore_region(self.background)
+            self.draw_dynamic()
+            self.canvas.blit(self.figure.bbox)
+
+    def dynamic_artists(self):
+        return list(self.bars) if self.mode == CHART_BAR else [self.image] + self.labels
+
+    def draw_dynamic(self):
+        for artist in self.dynamic_artists():
+            self.axes.draw_artist(artist)
+
+    def on_draw(self, event):
+        """整图重绘后缓存不含数据的背景，再画上数据"""
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.draw_dynamic()
+
+    def setup_axes(self, mode):
+        """切换图表类型时重建坐标轴，之后的刷新只更新数据"""
+        font = chart_font()
+        self.mode = mode
+        self.limit = None
+        self.background = None
+        self.figure.clear()
+        self.axes = self.figure.add_subplot()
+        self.axes.set_title(mode, fontproperties=font, fontsize=16)
+        if mode == CHART_BAR:
+            self.bars = self.axes.bar(self.weekdays, [0] * len(self.weekdays), color='skyblue')
+            self.axes.set_xlabel('星期', fontproperties=font, fontsize=14)
+            self.axes.set_ylabel('上课频次', fontproperties=font, fontsize=14)
+            self.axes.set_xticks(range(len(self.weekdays)), self.weekdays, fontproperties=font)
+        else:
+            self.image = self.axes.imshow([[0] * len(self.time_slots) for _ in self.weekdays],
+                                          cmap="YlOrRd", aspect="auto")
+            self.figure.colorbar(self.image, ax=self.axes)
+            self.axes.set_xticks(range(len(self.time_slots)), self.time_slots, fontproperties=font)
+            self.axes.set_yticks(range(len(self.weekdays)), self.weekdays, fontproperties=font)
+            self.labels = [self.axes.text(j, i, "", ha="center", va="center")
+                           for i in range(len(self.weekdays)) for j in range(len(self.time_slots))]
+        # 数据部分不参与整图绘制，由 on_draw 和 blit 单独绘制
+        for artist in self.dynamic_artists():
+            artist.set_animated(True)
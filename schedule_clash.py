@@ -0,0 +1,180 @@
+"""课表冲突检查：同一学生或同一教室在同一星期、时段内周次重叠的记录
+
+第一遍由 SQLite 按 (对象, 星期, 时段) 的索引顺序分组计数，只取出多于一行的
+分组（绝大多数分组只有一行，不必读入 Python）；同一分组的行连续返回。第二遍
+对每个分组按开始周排序后做区间扫描：维护尚未结束的记录，新记录只与其中结束
+周不早于其开始周的记录比较，再用周位图确认（分段周次如 1-8,10-16 的区间重叠
+但位图不相交时不算冲突）。
+
+教室分组中同一班级同一门课的多条记录是同一个教学班的不同学生，先合并为一条
+再比较；同一门课的不同班级在同一教室同一时段上课仍算冲突。
+"""
+import time
+
+import schedule_db
+import schedule_io
+from schedule_engine import format_weeks
+
+# 没有星期或时段的记录尚未排课，不参与检查。
+# 同一学生在同一时段有多条记录的分组，分组和取行都走 idx_schedule_student
+STUDENT_ROWS_SQL = """
+    SELECT s.student_id, s.weekday, s.time_slot, s.course_id, s.id
+    FROM (SELECT student_id, weekday, time_slot FROM schedule
+          WHERE weekday IS NOT NULL AND time_slot IS NOT NULL {where}
+          GROUP BY student_id, weekday, time_slot HAVING COUNT(*) > 1) g
+    CROSS JOIN schedule s ON s.student_id = g.student_id AND s.weekday = g.weekday AND s.time_slot = g.time_slot
+"""
+
+# 同一教室在同一时段有多个教学班（课程或班级不同）的分组，走 idx_schedule_slot
+ROOM_ROWS_SQL = """
+    SELECT s.classroom, s.weekday, s.time_slot, s.course_id, s.id, COALESCE(st.class_name, '')
+    FROM (SELECT s.weekday, s.time_slot, s.classroom FROM schedule s
+          JOIN students st ON st.id = s.student_id
+          WHERE s.weekday IS NOT NULL AND s.time_slot IS NOT NULL AND s.classroom <> '' {where}
+          GROUP BY s.weekday, s.time_slot, s.classroom
+          HAVING MIN(s.course_id) <> MAX(s.course_id)
+              OR MIN(COALESCE(st.class_name, '')) <> MAX(COALESCE(st.class_name, ''))) g
+    CROSS JOIN schedule s ON s.weekday = g.weekday AND s.time_slot = g.time_slot AND s.classroom = g.classroom
+    JOIN students st ON st.id = s.student_id
+"""
+
+CHECKED_ROWS_SQL = "SELECT COUNT(*) FROM schedule WHERE weekday IS NOT NULL AND time_slot IS NOT NULL"
+
+CLASH_HEADERS = ['类型', '学生/教室', '星期', '行课时间', '冲突周次', '课程一', '课程二', '记录一', '记录二']
+# 每个 IN (...) 中的参数个数，低于旧版 SQLite 的 999 个参数上限
+IN_BATCH = 500
+# 读取多少行汇报一次进度
+PROGRESS_ROWS = 50000
+
+COURSE_ID, ROW_ID, CLASS_NAME = 3, 4, 5
+
+
+class ClashReport:
+    """检查结果：clashes 为 [(类型, 学生 id 或教室, 星期, 时段, 冲突周位图,
+    记录一 id, 课程一 id, 记录二 id, 课程二 id)]，checked 为检查的课表行数"""
+
+    def __init__(self):
+        self.clashes = []
+        self.checked = 0
+        self.seconds = 0.0
+
+    def counts(self):
+        """{类型: 冲突数}"""
+        counts = {}
+        for clash in self.clashes:
+            counts[clash[0]] = counts.get(clash[0], 0) + 1
+        return counts
+
+
+def sweep_group(kind, group, weeks, clashes):
+    """一个 (对象, 星期, 时段) 分组内的区间扫描；weeks 为 {课程 id: (开始周, 结束周, 周位图)}"""
+    group.sort(key=lambda row: weeks[row[COURSE_ID]][0])
+    active = []
+    for row in group:
+        start, _, mask = weeks[row[COURSE_ID]]
+        active = [other for other in active if weeks[other[COURSE_ID]][1] >= start]
+        for other in active:
+            overlap = weeks[other[COURSE_ID]][2] & mask
+            if overlap:
+                clashes.append((kind, row[0], row[1], row[2], overlap,
+                                other[ROW_ID], other[COURSE_ID], row[ROW_ID], row[COURSE_ID]))
+        active.append(row)
+
+
+def sweep(kind, rows, weeks, clashes, merge_courses=False, progress=None):
+    """扫描同一分组连续排列的行，返回行数
+
+    merge_courses 为真时（行中带有班级）同一分组内同一班级同一门课只保留一条。
+    """
+    count = 0
+    key = None
+    group = []
+    for row in rows:
+        count += 1
+        row_key = row[:3]
+        if row_key != key:
+            if len(group) > 1:
+                sweep_group(kind, group, weeks, clashes)
+            key = row_key
+            group = [row]
+        elif not merge_courses or all(other[COURSE_ID] != row[COURSE_ID] or other[CLASS_NAME] != row[CLASS_NAME]
+                                      for other in group):
+            group.append(row)
+        if progress is not None and count % PROGRESS_ROWS == 0:
+            progress(count, 0, f"检查{kind}")
+    if len(group) > 1:
+        sweep_group(kind, group, weeks, clashes)
+    return count
+
+
+def iter_batches(values, size=IN_BATCH):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def iter_rows(conn, sql, column, values):
+    """values 为 None 时读取全部行，否则分批读取 column IN values 的行"""
+    if values is None:
+        yield from conn.execute(sql.format(where=""))
+        return
+    for batch in iter_batches(values):
+        where = f"AND {column} IN ({','.join('?' * len(batch))})"
+        yield from conn.execute(sql.format(where=where), batch)
+
+
+def course_weeks(conn):
+    """{课程 id: (开始周, 结束周, 周位图)}"""
+    return {course_id: (start or 0, end or 0, mask) for course_id, start, end, mask in
+            conn.execute("SELECT id, start_week, end_week, week_mask FROM courses")}
+
+
+def find_clashes(conn, row_ids=None, progress=None):
+    """检查整个课表，或只检查与 row_ids 这些记录同一学生、同一教室的记录"""
+    start = time.perf_counter()
+    report = ClashReport()
+    weeks = course_weeks(conn)
+    student_ids = rooms = None
+    if row_ids is not None:
+        student_ids, rooms = set(), set()
+        for batch in iter_batches(row_id for row_id in row_ids if row_id is not None):
+            for student_id, classroom in conn.execute(
+                    f"SELECT student_id, classroom FROM schedule WHERE id IN ({','.join('?' * len(batch))})", batch):
+                student_ids.add(student_id)
+                if classroom:
+                    rooms.add(classroom)
+        # 每个分组只属于一个学生、一间教室，分批读取不会把分组拆开
+        report.checked = sum(row[0] for row in iter_rows(conn, CHECKED_ROWS_SQL + " {where}", "student_id",
+                                                         sorted(student_ids)))
+    else:
+        report.checked = conn.execute(CHECKED_ROWS_SQL).fetchone()[0]
+    sweep("学生", iter_rows(conn, STUDENT_ROWS_SQL, "student_id", student_ids), weeks, report.clashes,
+          progress=progress)
+    sweep("教室", iter_rows(conn, ROOM_ROWS_SQL, "s.classroom", rooms), weeks, report.clashes, merge_courses=True,
+          progress=progress)
+    report.seconds = time.perf_counter() - start
+    print(f"冲突检查：{report.checked} 行课表，{len(report.clashes)} 处冲突，用时 {report.seconds:.2f} 秒")
+    return report
+
+
+def clash_rows(conn, clashes):
+    """把冲突记录转换为报告中的行，列与 CLASH_HEADERS 一致"""
+    students = {student_id: name for name, student_id in
+                schedule_db.name_ids(conn, "students", "student_name").items()}
+    courses = {course_id: name for name, course_id in schedule_db.name_ids(conn, "courses", "course_name").items()}
+    for kind, entity, weekday, time_slot, weeks, first_id, first_course, second_id, second_course in clashes:
+        yield (kind, students.get(entity, entity) if kind == "学生" else entity, weekday, time_slot,
+               format_weeks(weeks), courses.get(first_course), courses.get(second_course), first_id, second_id)
+
+
+def export_clash_report(conn, clashes, path, progress=None):
+    """把冲突记录导出为 Excel，返回行数"""
+    return schedule_io.write_excel(path, CLASH_HEADERS, clash_rows(conn, clashes), len(clashes), progress)
+
+
+def check_schedule(conn, path=None, progress=None):
+    """检查整个课表，path 不为空时同时导出报告；返回 ClashReport"""
+    report = find_clashes(conn, progress=progress)
+    if path and report.clashes:
+        export_clash_report(conn, report.clashes, path, progress)
+    return report
@@ -0,0 +1,210 @@
+"""命令行批处理：不打开窗口完成排课、导入和导出，可用于定时任务或流水线
+
+每条子命令执行完后在标准输出打印一行 JSON，包含命令、是否成功、用时（秒）
+和行数等结果；过程日志和进度输出到标准错误。失败时退出码为 1。
+
+    python schedule_cli.py --db schedule.db init
+    python schedule_cli.py schedule
+    python schedule_cli.py check --report 冲突报告.xlsx
+    python schedule_cli.py search student lyx
+    python schedule_cli.py import-excel 课表.xlsx
+    python schedule_cli.py export-students 学生课表.zip
+"""
+import argparse
+import contextlib
+import json
+import sys
+import time
+
+import schedule_clash
+import schedule_db
+import schedule_io
+import schedule_search
+import schedule_trace
+from schedule_engine import week_mask
+
+
+def stderr_progress(done, total=0, stage=""):
+    label = f"{stage}: " if stage else ""
+    print(f"{label}{done}/{total}" if total else f"{label}{done}", file=sys.stderr, flush=True)
+
+
+def run_init(conn, args, progress):
+    students, courses = schedule_db.initialize_data(conn)
+    return {"students": students, "courses": courses}
+
+
+def run_generate(conn, args, progress):
+    import schedule_bench
+
+    return schedule_bench.generate_data(conn, args.students, args.classes, args.courses, args.seed)
+
+
+def run_schedule(conn, args, progress):
+    engine, result = schedule_db.auto_schedule(conn, schedule_db.WEEKDAYS, schedule_db.TIME_SLOTS, progress)
+    return {"rows": len(result.rows), "unplaced": len(result.unplaced)}
+
+
+def run_import_excel(conn, args, progress):
+    count, rate = schedule_io.import_schedule_excel(conn, args.path, progress=progress)
+    return {"rows": count, "rows_per_second": round(rate, 1)}
+
+
+def run_export_excel(conn, args, progress):
+    return {"rows": schedule_io.export_schedule_excel(conn, args.path, progress=progress)}
+
+
+def run_import_sqlite(conn, args, progress):
+    if args.merge:
+        return {"rows": schedule_io.merge_schedule_sqlite(conn, args.path, progress=progress)}
+    return {"rows": schedule_io.import_schedule_sqlite(conn, args.path, progress=progress)}
+
+
+def run_export_sqlite(conn, args, progress):
+    return {"rows": schedule_io.export_schedule_sqlite(conn, args.path, progress=progress)}
+
+
+def run_export_student(conn, args, progress):
+    return {"rows": schedule_io.export_student_schedule(conn, args.name, args.path)}
+
+
+def run_export_class(conn, args, progress):
+    return {"rows": schedule_io.export_class_schedule(conn, args.name, args.path)}
+
+
+def run_export_students(conn, args, progress):
+    total = conn.execute(schedule_db.ALL_STUDENT_SCHEDULES_COUNT_SQL).fetchone()[0]
+    return {"files": schedule_io.export_grouped_excel(
+        conn, schedule_db.ALL_STUDENT_SCHEDULES_SQL, schedule_db.STUDENT_SCHEDULE_HEADERS,
+        args.target, args.workers, total, progress)}
+
+
+def run_export_classes(conn, args, progress):
+    total = conn.execute(schedule_db.ALL_CLASS_SCHEDULES_COUNT_SQL).fetchone()[0]
+    return {"files": schedule_io.export_grouped_excel(
+        conn, schedule_db.ALL_CLASS_SCHEDULES_SQL, schedule_db.STUDENT_SCHEDULE_HEADERS,
+        args.target, args.workers, total, progress)}
+
+
+def run_check(conn, args, progress):
+    report = schedule_clash.check_schedule(conn, args.report, progress)
+    counts = report.counts()
+    return {"rows": report.checked, "clashes": len(report.clashes),
+            "student_clashes": counts.get("学生", 0), "room_clashes": counts.get("教室", 0)}
+
+
+def run_add_room(conn, args, progress):
+    schedule_db.upsert_classroom(conn, args.room, args.capacity, args.building, args.features)
+    return {"room": args.room, "capacity": args.capacity}
+
+
+def run_free_rooms(conn, args, progress):
+    engine = schedule_db.load_room_engine(conn)
+    start = time.perf_counter()
+    rooms = engine.free_rooms(args.weekday, args.time_slot, week_mask(args.weeks), args.capacity)
+    return {"rooms": rooms, "lookup_us": round((time.perf_counter() - start) * 1e6, 1)}
+
+
+def run_search(conn, args, progress):
+    start = time.perf_counter()
+    indexes = schedule_search.load_indexes(conn)
+    build_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    matches = indexes[args.kind].search(args.text, args.limit)
+    return {"matches": matches, "build_seconds": round(build_seconds, 3),
+            "lookup_us": round((time.perf_counter() - start) * 1e6, 1)}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="学生课程管理系统命令行批处理")
+    parser.add_argument("--db", default=schedule_db.DB_PATH, help="数据库文件，默认 %(default)s")
+    parser.add_argument("--progress", action="store_true", help="在标准错误输出进度")
+    parser.add_argument("--trace", metavar="FILE", help="把查询和操作耗时写入该 JSON 文件")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("init", help="清空数据并写入默认学生与课程").set_defaults(run=run_init)
+    command = commands.add_parser("generate", help="清空数据并生成给定规模的测试学生、班级和课程")
+    command.add_argument("--students", type=int, default=10000)
+    command.add_argument("--classes", type=int, default=60)
+    command.add_argument("--courses", type=int, default=20)
+    command.add_argument("--seed", type=int, default=0)
+    command.set_defaults(run=run_generate)
+    commands.add_parser("schedule", help="为全部学生重新排课").set_defaults(run=run_schedule)
+    command = commands.add_parser("check", help="检查学生和教室的时间冲突")
+    command.add_argument("--report", metavar="PATH", help="有冲突时把冲突列表导出到该 Excel 文件")
+    command.set_defaults(run=run_check)
+
+    for name, run, help_text in (("import-excel", run_import_excel, "用 Excel 文件替换课表"),
+                                 ("export-excel", run_export_excel, "把课表导出为 Excel"),
+                                 ("export-sqlite", run_export_sqlite, "把整个数据库复制到 SQLite 文件")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("path")
+        command.set_defaults(run=run)
+
+    command = commands.add_parser("import-sqlite", help="用 SQLite 文件替换数据库")
+    command.add_argument("path")
+    command.add_argument("--merge", action="store_true", help="合并到当前数据库而不是替换")
+    command.set_defaults(run=run_import_sqlite)
+
+    for name, run, help_text in (("export-student", run_export_student, "导出某学生的课程安排"),
+                                 ("export-class", run_export_class, "导出某班级的课程安排")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("name")
+        command.add_argument("path")
+        command.set_defaults(run=run)
+
+    command = commands.add_parser("add-room", help="登记教室或修改其容量")
+    command.add_argument("room")
+    command.add_argument("--capacity", type=int, help="容纳人数，省略表示不限")
+    command.add_argument("--building", help="教学楼，省略时按教室名称推断")
+    command.add_argument("--features", help="设施，如 投影,实验台")
+    command.set_defaults(run=run_add_room)
+    command = commands.add_parser("free-rooms", help="查询某时段空闲且容量足够的教室")
+    command.add_argument("weekday", help="如 周一")
+    command.add_argument("time_slot", help="如 上午一段")
+    command.add_argument("--weeks", default="1-16", help="周数，默认 %(default)s")
+    command.add_argument("--capacity", type=int, default=0, help="最少容纳人数")
+    command.set_defaults(run=run_free_rooms)
+    command = commands.add_parser("search", help="按前缀、名称中的字或拼音首字母查找学生、班级或课程")
+    command.add_argument("kind", choices=["student", "class", "course"])
+    command.add_argument("text", help="如 林悦 或 lyx")
+    command.add_argument("--limit", type=int, default=schedule_search.SEARCH_LIMIT, help="最多返回的个数")
+    command.set_defaults(run=run_search)
+
+    for name, run, help_text in (("export-students", run_export_students, "每个学生导出一个 Excel 文件"),
+                                 ("export-classes", run_export_classes, "每个班级导出一个 Excel 文件")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("target", help="以 .zip 结尾时写入压缩包，否则写入该目录")
+        command.add_argument("--workers", type=int, default=None, help="并行进程数，默认为 CPU 核数")
+        command.set_defaults(run=run)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    progress = stderr_progress if args.progress else None
+    start = time.perf_counter()
+    report = {"command": args.command, "db": args.db}
+    if args.trace:
+        schedule_trace.enable()
+    try:
+        # 核心函数的日志打印到标准错误，标准输出只保留 JSON 结果
+        with contextlib.redirect_stdout(sys.stderr):
+            conn = schedule_db.connect(args.db)
+            try:
+                with schedule_trace.span(args.command):
+                    report.update(args.run(conn, args, progress))
+            finally:
+                conn.close()
+        report["ok"] = True
+    except Exception as e:
+        report.update(ok=False, error=str(e))
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    if args.trace:
+        schedule_trace.TRACER.dump(args.trace)
+    print(json.dumps(report, ensure_ascii=False))
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,786 @@
+"""课表数据库：表结构、索引与常用查询
+
+schedule 表通过整数外键引用 students 与 courses，删除或修改学生/课程时
+级联更新课表。连接需开启 PRAGMA foreign_keys 才会执行级联操作。
+
+表结构的每次变化都是 MIGRATIONS 中的一个步骤，数据库当前所处的版本
+记录在 PRAGMA user_version 中，打开时只执行尚未应用的步骤。
+"""
+import re
+import sqlite3
+import sys
+from collections import Counter
+
+# 星期和时段与排课引擎共用同一份列表，其他模块经 schedule_db.WEEKDAYS 等引用
+from schedule_engine import (DEFAULT_CLASSROOMS, DEFAULT_WEEK_RANGE, TIME_SLOTS, WEEKDAYS, ScheduleEngine,
+                             parse_week_ranges, week_mask)
+
+DB_PATH = "schedule.db"
+# 数据库被其他连接锁住时最多等待的毫秒数
+BUSY_TIMEOUT_MS = 5000
+# connect 使用的连接类，schedule_trace.enable() 会换成记录查询耗时的连接
+connection_factory = sqlite3.Connection
+
+# 初始化时写入的默认学生 (姓名, 班级) 和课程 (名称, 学分, 周数)
+DEFAULT_STUDENTS = [
+    ('林悦溪', '自动化211'), ('苏逸晨', '自动化211'), ('林宇轩', '自动化212'),
+    ('叶梓豪', '自动化213'), ('苏锦瑶', '自动化212'), ('沈俊辉', '自动化221'),
+    ('秦泽凯', '自动化222'), ('许皓阳', '自动化223'), ('叶婉清', '自动化213'),
+    ('唐文昊', '自动化231'), ('白睿渊', '自动化232'), ('楚晨峰', '自动化233'),
+    ('沈梦璃', '自动化221'), ('柳靖琪', '自动化234'), ('赵景铄', '自动化211'),
+    ('陈俊驰', '自动化212'), ('秦诗涵', '自动化222'), ('周远航', '自动化213'),
+    ('陆博超', '自动化221'), ('郑子轩', '自动化222'), ('许静雅', '自动化223'),
+    ('何宇澄', '自动化223'), ('冯睿晨', '自动化231'), ('罗嘉豪', '自动化232'),
+    ('唐晓萱', '自动化231'), ('萧启铭', '自动化233'), ('田耀辉', '自动化234'),
+    ('孙逸飞', '自动化211'), ('白若冰', '自动化232'), ('钱锦程', '自动化212'),
+    ('吴梓轩', '自动化213'), ('梁梓铭', '自动化221'), ('楚依琳', '自动化233'),
+    ('谢翰飞', '自动化222'), ('傅晨熙', '自动化223'), ('彭俊楠', '自动化231'),
+    ('柳雨薇', '自动化234'), ('蒋睿峰', '自动化232'), ('韩浩宇', '自动化233'),
+    ('曹宇翔', '自动化234'), ('赵灵芸', '自动化211'), ('陈佳凝', '自动化212'),
+    ('周语蝶', '自动化213'), ('陆芷晴', '自动化221'), ('郑雅琪', '自动化222'),
+    ('何思瑶', '自动化223'), ('田雨昕', '自动化234'), ('钱浅兮', '自动化212'),
+    ('谢诗韵', '自动化222'), ('傅冰清', '自动化223'), ('彭晓兰', '自动化231'),
+    ('蒋雨桐', '自动化232'), ('韩紫菱', '自动化233'), ('曹静婉', '自动化234')
+]
+
+DEFAULT_COURSES = [
+    ('高等数学', 4.0, '3-16'),
+    ('线性代数', 3.0, '3-14'),
+    ('大学物理', 4.0, '6-15'),
+    ('Python编程技术', 2.5, '3-16'),
+    ('思想道德与法治', 3.5, '9-14')
+]
+
+# 课程管理中“添加课程”可选的课程目录
+COURSE_CATALOG = [
+    "高等数学", "线性代数", "大学物理", "大学物理实验", "工程数学", "大学物理",
+    "大学物理实验", "概率论与数理统计", "工程导论", "c语言编程与实践", "电路分析基础",
+    "工程实践", "金工实习", "工程制图", "模拟电子技术", "运筹学", "数字电路与逻辑设计",
+    "信号与系统", "自动控制原理", "电子系统设计与实现", "微处理器与微计算机系统",
+    "传感器与检测技术", "现代控制理论", "面向对象程序设计(C++)", "机械学基础",
+    "机器人操作系统基础", "机器人系统软件设计", "机器人学基础", "人工智能",
+    "机器人设计与实现", "Python编程技术", "系统仿真编程技术", "嵌入式系统原理与设计",
+    "图像处理与机器视觉", "模式识别与机器学习", "无人驾驶技术", "三维建模及仿真",
+    "机器人控制元件与控制系", "移动机器人定位与导航", "思想道德与法治", "中国近现代史纲要",
+    "形势与政策", "马克思主义基本原理", "毛泽东思想和中国特色社会",
+    "义理论体系概论", "习近平新时代中国特色社会主义思想概论", "大学英语",
+    "创新创业教育基础", "TRIZ创新方法", "创业培训", "创新、发明与知识产权实践"
+]
+
+# 版本 1：以整数外键关联的基础表
+TABLES_V1 = """
+    CREATE TABLE IF NOT EXISTS students (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_name TEXT UNIQUE,
+        class_name TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS courses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        course_name TEXT UNIQUE,
+        credit REAL,
+        semester TEXT
+    );
+
+    CREATE TABLE IF NOT EXISTS schedule (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER NOT NULL REFERENCES students(id) ON DELETE CASCADE ON UPDATE CASCADE,
+        course_id INTEGER NOT NULL REFERENCES courses(id) ON DELETE CASCADE ON UPDATE CASCADE,
+        weekday TEXT,
+        time_slot TEXT,
+        classroom TEXT
+    );
+"""
+
+# 版本 2：高频查询使用的索引
+INDEXES_V2 = """
+    -- 按班级查学生；索引自带 rowid，可覆盖 id 和姓名
+    CREATE INDEX IF NOT EXISTS idx_students_class ON students(class_name, student_name);
+    -- 按学生查课表，覆盖星期、时段、课程和教室
+    CREATE INDEX IF NOT EXISTS idx_schedule_student
+        ON schedule(student_id, weekday, time_slot, course_id, classroom);
+    -- 按课程查课表，也用于删除课程时的级联
+    CREATE INDEX IF NOT EXISTS idx_schedule_course ON schedule(course_id);
+    -- 按时段查教室占用
+    CREATE INDEX IF NOT EXISTS idx_schedule_slot ON schedule(weekday, time_slot, classroom);
+"""
+
+# 版本 3：课程保存解析后的开始周、结束周和周位图（第 N 周为第 N 位）
+COURSE_WEEKS_V3 = """
+    ALTER TABLE courses ADD COLUMN start_week INTEGER;
+    ALTER TABLE courses ADD COLUMN end_week INTEGER;
+    ALTER TABLE courses ADD COLUMN week_mask INTEGER NOT NULL DEFAULT 0;
+    CREATE INDEX IF NOT EXISTS idx_courses_weeks ON courses(start_week, end_week, week_mask);
+"""
+
+# 版本 4：教室表。课表的 classroom 列保存教室名称；容量为空表示未登记，不限人数
+CLASSROOMS_V4 = """
+    CREATE TABLE IF NOT EXISTS classrooms (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        room TEXT UNIQUE NOT NULL,
+        building TEXT,
+        capacity INTEGER,
+        features TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_classrooms_capacity ON classrooms(capacity, room);
+"""
+
+# 版本 5：主表格按教室筛选和排序使用的索引，表达式与 SCHEDULE_PREFIX_FILTERS、SCHEDULE_SORT_COLUMNS 一致
+CLASSROOM_INDEX_V5 = """
+    CREATE INDEX IF NOT EXISTS idx_schedule_classroom ON schedule(COALESCE(classroom, ''));
+"""
+
+# 主课表的列，SCHEDULE_TABLE_SQL 按此顺序返回
+SCHEDULE_HEADERS = ['学生姓名', '班级', '课程名称', '学分', '星期', '行课时间', '周数', '教室']
+
+# 主表格的数据，列顺序与 SCHEDULE_HEADERS 一致
+SCHEDULE_TABLE_SQL = """
+    SELECT st.student_name, st.class_name, c.course_name, c.credit,
+           s.weekday, s.time_slot, c.semester, s.classroom
+    FROM schedule s
+    JOIN students st ON s.student_id = st.id
+    JOIN courses c ON s.course_id = c.id
+"""
+
+# 主表格加载的行：在 SCHEDULE_TABLE_SQL 的列之后附加课表 id，保存时按 id 只写改动的行
+SCHEDULE_ROWS_SQL = """
+    SELECT st.student_name, st.class_name, c.course_name, c.credit,
+           s.weekday, s.time_slot, c.semester, s.classroom, s.id
+    FROM schedule s
+    JOIN students st ON s.student_id = st.id
+    JOIN courses c ON s.course_id = c.id
+"""
+
+# 主表格分页读取的行：SCHEDULE_ROWS_SQL 的列之后再附加排序键，用作下一页的起点
+SCHEDULE_PAGE_SQL = """
+    SELECT st.student_name, st.class_name, c.course_name, c.credit,
+           s.weekday, s.time_slot, c.semester, s.classroom, s.id, {key}
+    FROM {tables}
+    {where}
+    ORDER BY {key} {direction}, s.id {direction}
+    LIMIT ?
+"""
+
+# 主表格每次读取的行数，滚动到底部时再读下一页
+SCHEDULE_PAGE_ROWS = 500
+
+# 主表格按前缀筛选的条件及对应的列，前缀匹配写成范围比较以使用索引
+SCHEDULE_PREFIX_FILTERS = {
+    "student": "st.student_name",
+    "class": "st.class_name",
+    "course": "c.course_name",
+    "classroom": "COALESCE(s.classroom, '')",
+}
+
+# 主表格各列排序时使用的表达式，顺序与 SCHEDULE_HEADERS 一致。可能为空的列排序时按空字符串处理，
+# 星期按 WEEKDAYS 中的先后排序，空星期排在最前；排序键不能为空，否则键集分页在空值处中断
+SCHEDULE_SORT_COLUMNS = ["st.student_name", "COALESCE(st.class_name, '')", "c.course_name",
+                         "COALESCE(c.credit, '')", f"COALESCE(instr('{''.join(WEEKDAYS)}', s.weekday), 0)",
+                         "COALESCE(s.time_slot, '')", "COALESCE(c.semester, '')", "COALESCE(s.classroom, '')"]
+
+SCHEDULE_TABLES = """schedule s
+    JOIN students st ON s.student_id = st.id
+    JOIN courses c ON s.course_id = c.id"""
+
+# 按学生或课程名称排序时从该表的名称索引出发，按顺序连接课表，每页只读一页的行；
+# 只在筛选条件都能随之顺序判断时使用：{列号: (连接, 可用的筛选条件)}
+SCHEDULE_SORT_TABLES = {
+    0: ("""students st
+    CROSS JOIN schedule s ON s.student_id = st.id
+    JOIN courses c ON s.course_id = c.id""", {"student", "class", "weekday", "week"}),
+    2: ("""courses c
+    CROSS JOIN schedule s ON s.course_id = c.id
+    JOIN students st ON s.student_id = st.id""", {"course", "weekday", "week"}),
+}
+
+# 某学生的课程安排
+STUDENT_SCHEDULE_SQL = """
+    SELECT st.student_name, c.course_name, c.credit, s.weekday, s.time_slot, s.classroom
+    FROM students st
+    JOIN schedule s ON s.student_id = st.id
+    JOIN courses c ON s.course_id = c.id
+    WHERE st.student_name = ?
+"""
+
+# 某班级的课程安排
+CLASS_SCHEDULE_SQL = """
+    SELECT st.student_name, c.course_name, c.credit, s.weekday, s.time_slot, s.classroom
+    FROM students st
+    JOIN schedule s ON s.student_id = st.id
+    JOIN courses c ON s.course_id = c.id
+    WHERE st.class_name = ?
+"""
+
+# 单个学生/班级课程安排导出的列
+STUDENT_SCHEDULE_HEADERS = ['学生姓名', '课程名称', '学分', '星期', '行课时间', '教室']
+
+# 全部学生的课程安排，第一列为分组名，按学生排序以便边读边分组。
+# CROSS JOIN 固定先按索引顺序扫描 students，结果无需额外排序即可流式读取
+ALL_STUDENT_SCHEDULES_SQL = """
+    SELECT st.student_name, st.student_name, c.course_name, c.credit, s.weekday, s.time_slot, s.classroom
+    FROM students st
+    CROSS JOIN schedule s ON s.student_id = st.id
+    JOIN courses c ON s.course_id = c.id
+    ORDER BY st.student_name
+"""
+
+# 全部班级的课程安排，第一列为分组名，按班级、学生排序
+ALL_CLASS_SCHEDULES_SQL = """
+    SELECT st.class_name, st.student_name, c.course_name, c.credit, s.weekday, s.time_slot, s.classroom
+    FROM students st
+    CROSS JOIN schedule s ON s.student_id = st.id
+    JOIN courses c ON s.course_id = c.id
+    ORDER BY st.class_name, st.student_name
+"""
+
+# 批量导出时的分组数，仅用于显示进度
+ALL_STUDENT_SCHEDULES_COUNT_SQL = "SELECT COUNT(DISTINCT student_id) FROM schedule"
+ALL_CLASS_SCHEDULES_COUNT_SQL = """
+    SELECT COUNT(DISTINCT st.class_name) FROM students st
+    WHERE EXISTS (SELECT 1 FROM schedule s WHERE s.student_id = st.id)
+"""
+
+# 某班级在某一周每个星期、时段的上课次数，用于统计图表
+CLASS_SLOT_COUNT_SQL = """
+    SELECT s.weekday, s.time_slot, COUNT(*)
+    FROM students st
+    JOIN schedule s ON s.student_id = st.id
+    JOIN courses c ON s.course_id = c.id
+    WHERE st.class_name = ? AND (c.week_mask >> ?) & 1
+    GROUP BY s.weekday, s.time_slot
+"""
+
+# 某一周上课的课程
+COURSES_IN_WEEK_SQL = """
+    SELECT id, course_name FROM courses
+    WHERE start_week <= ?1 AND end_week >= ?1 AND (week_mask >> ?1) & 1
+"""
+
+# 排课引擎重建占用情况所需的数据
+ENGINE_ROWS_SQL = """
+    SELECT s.student_id, st.class_name, s.course_id, c.credit,
+           s.weekday, s.time_slot, s.classroom, c.semester
+    FROM schedule s
+    JOIN students st ON s.student_id = st.id
+    JOIN courses c ON s.course_id = c.id
+"""
+
+# 教室占用：同一教室、时段、周位图的课表行合并为一行并计数，{where} 可附加条件
+ROOM_OCCUPANCY_SQL = """
+    SELECT s.classroom, s.weekday, s.time_slot, c.week_mask, COUNT(*)
+    FROM schedule s
+    JOIN courses c ON s.course_id = c.id
+    WHERE s.classroom <> '' AND s.weekday IS NOT NULL AND s.time_slot IS NOT NULL {where}
+    GROUP BY s.classroom, s.weekday, s.time_slot, c.week_mask
+"""
+# 按 id 读取教室占用时每个 IN (...) 中的参数个数
+ROOM_ID_BATCH = 500
+
+INSERT_SCHEDULE_SQL = """
+    INSERT INTO schedule (student_id, course_id, weekday, time_slot, classroom)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+UPDATE_SCHEDULE_SQL = """
+    UPDATE schedule SET student_id = ?, course_id = ?, weekday = ?, time_slot = ?, classroom = ?
+    WHERE id = ?
+"""
+
+# 自动排课写入数据库时每批插入的行数
+INSERT_BATCH_ROWS = 5000
+
+# 高频查询及其必须使用的索引：(查询, 示例参数, 索引名)
+HOT_QUERIES = {
+    "student_schedule": (STUDENT_SCHEDULE_SQL, ("",), "idx_schedule_student"),
+    "class_schedule": (CLASS_SCHEDULE_SQL, ("",), "idx_students_class"),
+    "class_slot_count": (CLASS_SLOT_COUNT_SQL, ("", 1), "idx_schedule_student"),
+    "courses_in_week": (COURSES_IN_WEEK_SQL, (1,), "idx_courses_weeks"),
+    "schedule_page_student": (SCHEDULE_PAGE_SQL.format(
+        key="s.id", tables=SCHEDULE_TABLES, where="WHERE st.student_name >= ? AND st.student_name < ?",
+        direction="ASC"), ("", "", SCHEDULE_PAGE_ROWS), "idx_schedule_student"),
+    "schedule_page_classroom": (SCHEDULE_PAGE_SQL.format(
+        key="s.id", tables=SCHEDULE_TABLES, where="WHERE COALESCE(s.classroom, '') >= ? AND COALESCE(s.classroom, '') < ?",
+        direction="ASC"), ("", "", SCHEDULE_PAGE_ROWS), "idx_schedule_classroom"),
+}
+
+
+def connect(path=DB_PATH):
+    """打开数据库，开启外键并把表结构升级到最新版本
+
+    使用 WAL 日志：后台任务在自己的连接上长时间写入时，界面的连接仍可读取
+    提交前的数据，不会因数据库被锁而读取失败。
+    """
+    conn = sqlite3.connect(path, factory=connection_factory)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA foreign_keys = ON")
+    migrate(conn)
+    return conn
+
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def execute_script(conn, script):
+    """逐条执行多条 SQL 语句
+
+    与 executescript 不同，不会提交当前事务，可用于迁移步骤内部。
+    """
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+
+
+def migrate_v1_tables(conn):
+    """建立基础表；旧版以 student_name/course_name 文本关联的课表转换为整数外键
+
+    旧课表中出现但学生表、课程表中没有的姓名或课程会先补录。
+    """
+    columns = table_columns(conn, "schedule")
+    if "student_name" not in columns:
+        execute_script(conn, TABLES_V1)
+        return
+
+    credit = "credit" if "credit" in columns else "NULL"
+    semester = "semester" if "semester" in columns else "NULL"
+    weekday = "l.weekday" if "weekday" in columns else "NULL"
+    conn.execute("ALTER TABLE schedule RENAME TO schedule_legacy")
+    execute_script(conn, TABLES_V1)
+    execute_script(conn, f"""
+        INSERT OR IGNORE INTO students (student_name)
+            SELECT DISTINCT student_name FROM schedule_legacy WHERE student_name IS NOT NULL;
+        INSERT OR IGNORE INTO courses (course_name, credit, semester)
+            SELECT course_name, MAX({credit}), MAX({semester}) FROM schedule_legacy
+            WHERE course_name IS NOT NULL GROUP BY course_name;
+        INSERT INTO schedule (id, student_id, course_id, weekday, time_slot, classroom)
+            SELECT l.id, st.id, c.id, {weekday}, l.time_slot, l.classroom
+            FROM schedule_legacy l
+            JOIN students st ON st.student_name = l.student_name
+            JOIN courses c ON c.course_name = l.course_name;
+        DROP TABLE schedule_legacy;
+    """)
+
+
+def migrate_v2_indexes(conn):
+    execute_script(conn, INDEXES_V2)
+
+
+def migrate_v3_course_weeks(conn):
+    execute_script(conn, COURSE_WEEKS_V3)
+    update_course_weeks(conn, conn.execute("SELECT id, semester FROM courses").fetchall())
+
+
+def migrate_v4_classrooms(conn):
+    """建立教室表，登记默认教室和课表中已经出现过的教室"""
+    execute_script(conn, CLASSROOMS_V4)
+    used = [row[0] for row in conn.execute(
+        "SELECT DISTINCT classroom FROM schedule WHERE classroom IS NOT NULL AND classroom <> ''")]
+    conn.executemany("INSERT OR IGNORE INTO classrooms (room, building) VALUES (?, ?)",
+                     [(room, room_building(room)) for room in dict.fromkeys(DEFAULT_CLASSROOMS + used)])
+
+
+def migrate_v5_classroom_index(conn):
+    execute_script(conn, CLASSROOM_INDEX_V5)
+
+
+# 按顺序排列的迁移步骤：第 N 步把数据库从版本 N-1 升级到版本 N。
+# 只能在末尾追加新步骤，已发布的步骤不可修改。
+MIGRATIONS = [
+    migrate_v1_tables,
+    migrate_v2_indexes,
+    migrate_v3_course_weeks,
+    migrate_v4_classrooms,
+    migrate_v5_classroom_index,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """依次执行尚未应用的迁移步骤，每一步在独立事务中完成并记录到 user_version
+
+    已是最新版本时只读取一次 user_version，不执行任何建表语句。
+    """
+    version = schema_version(conn)
+    if version == SCHEMA_VERSION:
+        return
+    if version > SCHEMA_VERSION:
+        raise sqlite3.DatabaseError(f"数据库版本 {version} 高于程序支持的版本 {SCHEMA_VERSION}，请升级程序")
+
+    conn.commit()
+    isolation_level = conn.isolation_level
+    conn.isolation_level = None  # 手动控制事务
+    try:
+        for step in range(version, SCHEMA_VERSION):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                MIGRATIONS[step](conn)
+                conn.execute(f"PRAGMA user_version = {step + 1}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            print(f"数据库已升级到版本 {step + 1}")
+    finally:
+        conn.isolation_level = isolation_level
+
+
+def name_ids(conn, table, name_column):
+    """{名称: id}"""
+    return {name: row_id for row_id, name in conn.execute(f"SELECT id, {name_column} FROM {table}")}
+
+
+def ensure_student(conn, student_name, class_name=None, cache=None):
+    """返回学生 id，不存在时新建；cache 为可选的 {姓名: id} 缓存"""
+    if cache is not None and student_name in cache:
+        return cache[student_name]
+    row = conn.execute("SELECT id FROM students WHERE student_name = ?", (student_name,)).fetchone()
+    if row is None:
+        row = (conn.execute("INSERT INTO students (student_name, class_name) VALUES (?, ?)",
+                            (student_name, class_name or None)).lastrowid,)
+    if cache is not None:
+        cache[student_name] = row[0]
+    return row[0]
+
+
+def course_weeks(semester):
+    """周数文本 -> (开始周, 结束周, 周位图)；无法解析时按整个学期处理"""
+    ranges = parse_week_ranges(semester) or [DEFAULT_WEEK_RANGE]
+    return min(start for start, _ in ranges), max(end for _, end in ranges), week_mask(semester)
+
+
+def room_building(room):
+    """教室名称中的教学楼，如 H1011 -> H1；无法识别时为 None"""
+    match = re.match(r"H?([124])\d", room or "")
+    return f"H{match.group(1)}" if match else None
+
+
+def load_classrooms(conn):
+    """[(教室, 容量)]，供排课引擎使用；教室表为空时返回 None，使用默认教室"""
+    return conn.execute("SELECT room, capacity FROM classrooms").fetchall() or None
+
+
+def upsert_classroom(conn, room, capacity=None, building=None, features=None):
+    """登记教室或修改其容量、教学楼和设施；教学楼省略时按名称推断"""
+    conn.execute("""
+        INSERT INTO classrooms (room, building, capacity, features) VALUES (?, ?, ?, ?)
+        ON CONFLICT(room) DO UPDATE SET building = excluded.building, capacity = excluded.capacity,
+                                        features = excluded.features
+    """, (room, building or room_building(room), capacity, features))
+    conn.commit()
+
+
+def room_occupancy(conn, row_ids=None):
+    """教室占用 [(教室, 星期, 行课时间, 周位图, 行数)]：整个课表，或只含 row_ids 这些课表行"""
+    if row_ids is None:
+        return conn.execute(ROOM_OCCUPANCY_SQL.format(where="")).fetchall()
+    row_ids = [row_id for row_id in row_ids if row_id is not None]
+    rows = []
+    for start in range(0, len(row_ids), ROOM_ID_BATCH):
+        batch = row_ids[start:start + ROOM_ID_BATCH]
+        rows += conn.execute(ROOM_OCCUPANCY_SQL.format(where=f"AND s.id IN ({','.join('?' * len(batch))})"), batch)
+    return rows
+
+
+def load_room_engine(conn, weekdays=WEEKDAYS, time_slots=TIME_SLOTS, progress=None):
+    """只登记教室占用的排课引擎，用于查询空闲教室；之后用 update_rooms 增量更新"""
+    engine = ScheduleEngine(weekdays, time_slots, load_classrooms(conn))
+    engine.update_rooms(room_occupancy(conn))
+    return engine
+
+
+def update_course_weeks(conn, rows):
+    """按 [(课程 id, 周数)] 重新计算并保存课程的周次"""
+    conn.executemany("UPDATE courses SET start_week = ?, end_week = ?, week_mask = ? WHERE id = ?",
+                     [course_weeks(semester) + (course_id,) for course_id, semester in rows])
+
+
+def insert_course(conn, course_name, credit, semester):
+    """新增课程并同时保存解析后的周次，返回课程 id"""
+    return conn.execute("""
+        INSERT INTO courses (course_name, credit, semester, start_week, end_week, week_mask)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (course_name, credit, semester) + course_weeks(semester)).lastrowid
+
+
+def update_course(conn, course_id, course_name, credit, semester):
+    conn.execute("""
+        UPDATE courses
+        SET course_name = ?, credit = ?, semester = ?, start_week = ?, end_week = ?, week_mask = ?
+        WHERE id = ?
+    """, (course_name, credit, semester) + course_weeks(semester) + (course_id,))
+
+
+def ensure_course(conn, course_name, credit=None, semester=None, cache=None):
+    """返回课程 id，不存在时新建；cache 为可选的 {课程名称: id} 缓存"""
+    if cache is not None and course_name in cache:
+        return cache[course_name]
+    row = conn.execute("SELECT id FROM courses WHERE course_name = ?", (course_name,)).fetchone()
+    if row is None:
+        row = (insert_course(conn, course_name, credit, semester or None),)
+    if cache is not None:
+        cache[course_name] = row[0]
+    return row[0]
+
+
+def save_schedule_changes(conn, rows, deleted_ids=()):
+    """在一个事务中保存主表格的改动，返回与 rows 一一对应的课表 id
+
+    rows 为 [(课表 id, 行)]，行的列顺序与 SCHEDULE_HEADERS 一致：id 为 None 的行
+    插入，其余的更新；学生或课程为空的行不保存，已有的记录随之删除，返回 None。
+    表中没有的学生或课程会自动补录。任何一行失败时整个事务回滚。
+    """
+    student_ids, course_ids = {}, {}
+    deleted = list(deleted_ids)
+    saved_ids = []
+    try:
+        for schedule_id, values in rows:
+            student_name, class_name, course_name, credit, weekday, time_slot, semester, classroom = values
+            if not (student_name and course_name):
+                if schedule_id is not None:
+                    deleted.append(schedule_id)
+                saved_ids.append(None)
+                continue
+            params = (ensure_student(conn, student_name, class_name, cache=student_ids),
+                      ensure_course(conn, course_name, credit or 0, semester, cache=course_ids),
+                      weekday or None, time_slot or None, classroom or None)
+            if schedule_id is None:
+                schedule_id = conn.execute(INSERT_SCHEDULE_SQL, params).lastrowid
+            else:
+                conn.execute(UPDATE_SCHEDULE_SQL, params + (schedule_id,))
+            saved_ids.append(schedule_id)
+        conn.executemany("DELETE FROM schedule WHERE id = ?", ((schedule_id,) for schedule_id in deleted))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return saved_ids
+
+
+def prefix_bound(prefix):
+    """以 prefix 开头的字符串都小于此值"""
+    return prefix[:-1] + chr(min(ord(prefix[-1]) + 1, sys.maxunicode))
+
+
+def schedule_filter(filters):
+    """主表格的筛选条件 -> (WHERE 子句, 参数)
+
+    filters 的键为 SCHEDULE_PREFIX_FILTERS 中的条件（按前缀匹配）以及 weekday（星期）、
+    week（第几周上课），值为空表示不筛选。
+    """
+    clauses, params = [], []
+    for name, column in SCHEDULE_PREFIX_FILTERS.items():
+        prefix = str(filters.get(name) or "").strip()
+        if prefix:
+            clauses.append(f"{column} >= ? AND {column} < ?")
+            params += [prefix, prefix_bound(prefix)]
+    if filters.get("weekday"):
+        # 星期只有几种取值，按索引查找反而比顺序扫描慢，用 + 禁止使用索引
+        clauses.append("+s.weekday = ?")
+        params.append(filters["weekday"])
+    if filters.get("week"):
+        clauses.append("(c.week_mask >> ?) & 1")
+        params.append(int(filters["week"]))
+    return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def schedule_page(conn, filters=None, sort_column=None, descending=False, after=None, limit=SCHEDULE_PAGE_ROWS):
+    """按筛选条件和排序读取主表格的一页，返回 (SCHEDULE_ROWS_SQL 格式的行, 下一页的起点)
+
+    按 (排序键, 课表 id) 做键集分页：after 是上一页返回的起点，下一页从其后开始，
+    不使用 OFFSET，翻到多深都只读一页；没有下一页时起点为 None。sort_column 为
+    SCHEDULE_HEADERS 中的列号，为 None 时按课表 id 排序。
+    """
+    filters = {name: value for name, value in (filters or {}).items() if value}
+    where, params = schedule_filter(filters)
+    key = "s.id" if sort_column is None else SCHEDULE_SORT_COLUMNS[sort_column]
+    tables, usable = SCHEDULE_SORT_TABLES.get(sort_column, (SCHEDULE_TABLES, set()))
+    if not set(filters) <= usable:
+        tables = SCHEDULE_TABLES
+    if after is not None:
+        operator = "<" if descending else ">"
+        if sort_column is None:
+            condition = f"s.id {operator} ?"
+            params.append(after[1])
+        else:
+            # 行值比较本身不能用于索引查找，另加一个排序键的范围条件
+            condition = f"{key} {operator}= ? AND ({key}, s.id) {operator} (?, ?)"
+            params += [after[0], *after]
+        where += f" AND {condition}" if where else f"WHERE {condition}"
+    sql = SCHEDULE_PAGE_SQL.format(key=key, tables=tables, where=where, direction="DESC" if descending else "ASC")
+    rows = conn.execute(sql, params + [limit]).fetchall()
+    next_after = (rows[-1][-1], rows[-1][-2]) if len(rows) == limit else None
+    return [row[:-1] for row in rows], next_after
+
+
+def count_schedule(conn, filters=None):
+    """符合筛选条件的课表行数"""
+    where, params = schedule_filter(filters or {})
+    if not where:
+        return conn.execute("SELECT COUNT(*) FROM schedule").fetchone()[0]
+    return conn.execute(f"SELECT COUNT(*) FROM {SCHEDULE_TABLES} {where}", params).fetchone()[0]
+
+
+class LookupCache:
+    """学生 -> 班级、课程 -> (学分, 周数)、班级 -> 人数的内存缓存
+
+    首次使用时各用一次查询整表加载，之后的查找不再访问数据库；学生或
+    课程变化后调用 invalidate_*，下次使用时重新加载。
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.student_classes = None
+        self.class_counts = None
+        self.course_info = None
+
+    def invalidate_students(self):
+        self.student_classes = None
+        self.class_counts = None
+
+    def invalidate_courses(self):
+        self.course_info = None
+
+    def invalidate(self):
+        self.invalidate_students()
+        self.invalidate_courses()
+
+    def load_snapshot(self):
+        """用一次查询同时读入学生和课程，供程序启动时使用"""
+        self.student_classes = {}
+        self.class_counts = None
+        self.course_info = {}
+        for kind, name, value, semester in self.conn.execute("""
+            SELECT 's', student_name, class_name, NULL FROM students
+            UNION ALL
+            SELECT 'c', course_name, credit, semester FROM courses
+        """):
+            if kind == 's':
+                self.student_classes[name] = value
+            else:
+                self.course_info[name] = (value, semester)
+
+    def students(self):
+        """{学生姓名: 班级}"""
+        if self.student_classes is None:
+            self.student_classes = dict(self.conn.execute("SELECT student_name, class_name FROM students"))
+        return self.student_classes
+
+    def class_sizes(self):
+        """{班级: 人数}"""
+        if self.class_counts is None:
+            self.class_counts = Counter(self.students().values())
+        return self.class_counts
+
+    def courses(self):
+        """{课程名称: (学分, 周数)}"""
+        if self.course_info is None:
+            self.course_info = {name: (credit, semester) for name, credit, semester
+                                in self.conn.execute("SELECT course_name, credit, semester FROM courses")}
+        return self.course_info
+
+
+def slot_counts(conn, class_name, week, weekdays, time_slots):
+    """某班级某周每个 (星期, 时段) 的上课次数，返回 len(weekdays) × len(time_slots) 的列表"""
+    counts = [[0] * len(time_slots) for _ in weekdays]
+    day_index = {day: i for i, day in enumerate(weekdays)}
+    slot_index = {slot: i for i, slot in enumerate(time_slots)}
+    for weekday, time_slot, count in conn.execute(CLASS_SLOT_COUNT_SQL, (class_name, week)):
+        if weekday in day_index and time_slot in slot_index:
+            counts[day_index[weekday]][slot_index[time_slot]] = count
+    return counts
+
+
+def initialize_data(conn):
+    """清空课表、学生和课程，写入默认学生与课程，返回 (学生数, 课程数)"""
+    try:
+        conn.execute("DELETE FROM schedule")
+        conn.execute("DELETE FROM students")
+        conn.execute("DELETE FROM courses")
+        # 重置自增ID
+        conn.execute("DELETE FROM sqlite_sequence WHERE name IN ('students', 'courses', 'schedule')")
+        conn.executemany("INSERT INTO students (student_name, class_name) VALUES (?, ?)",
+                         [(name.strip(), class_name.strip()) for name, class_name in DEFAULT_STUDENTS])
+        for name, credit, semester in DEFAULT_COURSES:
+            insert_course(conn, name.strip(), credit, semester.strip())
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return len(DEFAULT_STUDENTS), len(DEFAULT_COURSES)
+
+
+def auto_schedule(conn, weekdays, time_slots, progress=None):
+    """为全部学生重新排课并替换课表，返回 (排课引擎, ScheduleResult)
+
+    清空与写入在同一个事务中，中途出错或 progress 抛出异常（取消）时回滚，
+    原课表保持不变。progress(已完成, 总数, 阶段) 可选。
+    """
+    print("开始自动排课...")
+    students = conn.execute("SELECT id, class_name FROM students").fetchall()
+    print(f"获取到 {len(students)} 名学生")
+    courses = conn.execute("SELECT id, credit, semester FROM courses").fetchall()
+    print(f"获取到 {len(courses)} 门课程")
+    if not students:
+        raise Exception("没有找到学生信息")
+    if not courses:
+        raise Exception("没有找到课程信息")
+
+    # 学生较多时按班级分区，在多个进程中并行求解
+    print("生成排课数据...")
+    engine = ScheduleEngine(weekdays, time_slots, load_classrooms(conn))
+    solve_progress = None if progress is None else lambda done, total: progress(done, total, "排课")
+    result = engine.solve_parallel(students, courses, progress=solve_progress)
+    print(f"生成了 {len(result.rows)} 条排课记录，{len(result.unplaced)} 个教学班无法安排")
+
+    print("插入排课数据到数据库...")
+    try:
+        conn.execute("DELETE FROM schedule")
+        for start in range(0, len(result.rows), INSERT_BATCH_ROWS):
+            conn.executemany(INSERT_SCHEDULE_SQL, (
+                (student_id, course_id, weekday, time_slot, classroom)
+                for student_id, course_id, _, weekday, time_slot, classroom, _
+                in result.rows[start:start + INSERT_BATCH_ROWS]
+            ))
+            if progress is not None:
+                progress(min(start + INSERT_BATCH_ROWS, len(result.rows)), len(result.rows), "写入")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    print("自动排课完成")
+    return engine, result
+
+
+def query_plan(conn, sql, params):
+    return [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+
+
+def check_query_plans(conn):
+    """检查高频查询是否走预期的索引，返回 [(查询名, 执行计划), ...] 形式的问题列表"""
+    problems = []
+    for name, (sql, params, index) in HOT_QUERIES.items():
+        plan = query_plan(conn, sql, params)
+        # 除临时 B 树外，不允许出现全表扫描
+        if not any(index in line for line in plan) or any(line.startswith("SCAN") for line in plan):
+            problems.append((name, plan))
+    return problems
+
+
+if __name__ == "__main__":
+    # python schedule_db.py [数据库文件]：检查高频查询的执行计划，索引失效时返回非零
+    conn = connect(sys.argv[1] if len(sys.argv) > 1 else ":memory:")
+    problems = check_query_plans(conn)
+    for name, plan in problems:
+        print(f"{name} 未使用预期索引:")
+        for line in plan:
+            print(f"    {line}")
+    print("执行计划检查通过" if not problems else f"{len(problems)} 个查询未使用预期索引")
+    sys.exit(1 if problems else 0)
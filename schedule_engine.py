@@ -0,0 +1,519 @@
+"""排课引擎：在学生不冲突、教室不冲突、周次范围内的约束下分配上课时段与教室
+
+占用情况用位图保存：每个学生、每间教室一个整数，第 slot 个时段的第 week 周
+对应第 slot * WEEK_STRIDE + week 位。判断冲突只需一次按位与。
+
+引擎只把学生和课程当作不透明的键，调用方可以使用姓名或数据库 id。
+"""
+import multiprocessing
+import os
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import reduce
+from operator import or_
+
+WEEKDAYS = ["周一", "周二", "周三", "周四", "周五", "周六"]
+TIME_SLOTS = ["上午一段", "上午二段", "下午一段", "下午二段", "晚修"]
+# 每个时段占用的位数，可表示第 1-31 周
+WEEK_STRIDE = 32
+MAX_WEEK = WEEK_STRIDE - 1
+# 周数无法解析时按整个学期处理
+DEFAULT_WEEK_RANGE = (1, 17)
+# 默认教室：H + 教学楼号(1/2/4) + 两位房间号(01-20)
+DEFAULT_CLASSROOMS = [f"H{building}{number:02d}" for building in (1, 2, 4) for number in range(1, 21)]
+# 未登记容量的教室视为不限人数
+UNLIMITED_CAPACITY = float("inf")
+# 学生数少于此值时启动进程池不划算，直接串行排课
+PARALLEL_MIN_STUDENTS = 5000
+
+
+def parse_week_ranges(semester):
+    """解析周数文本，如 '3-16'、'第1至17周'、'1-8,10-17'，返回 [(开始周, 结束周), ...]"""
+    ranges = []
+    for part in re.split(r"[,，、;；]", str(semester or "")):
+        numbers = [int(n) for n in re.findall(r"\d+", part)]
+        if not numbers:
+            continue
+        start, end = numbers[0], numbers[1] if len(numbers) > 1 else numbers[0]
+        if start > end:
+            start, end = end, start
+        start, end = max(start, 1), min(end, MAX_WEEK)
+        if start <= end:
+            ranges.append((start, end))
+    return ranges
+
+
+def week_mask(semester):
+    """周数文本对应的周位图，第 N 周为第 N 位"""
+    ranges = parse_week_ranges(semester) or [DEFAULT_WEEK_RANGE]
+    mask = 0
+    for start, end in ranges:
+        mask |= ((1 << (end - start + 1)) - 1) << start
+    return mask
+
+
+def format_weeks(mask):
+    """周位图 -> 周数文本，如 0b1110111000 -> '3-5,7-9'"""
+    ranges = []
+    week = 1
+    while mask >> week:
+        if (mask >> week) & 1:
+            start = week
+            while (mask >> (week + 1)) & 1:
+                week += 1
+            ranges.append(str(start) if start == week else f"{start}-{week}")
+        week += 1
+    return ",".join(ranges)
+
+
+def group_by_class(students):
+    """[(学生, 班级), ...] -> 按班级名排序的 [(班级, [学生, ...]), ...]"""
+    classes = defaultdict(list)
+    for name, class_name in students:
+        classes[class_name or ""].append(name)
+    return sorted(classes.items())
+
+
+def order_courses(courses):
+    """持续周数长的课程更难安排，优先处理"""
+    return sorted(courses, key=lambda course: -bin(week_mask(course[2])).count("1"))
+
+
+def default_starts(class_index, course_count, slots_per_day):
+    """不同班级、不同课程从不同时段开始搜索，使课程分散到整周"""
+    return [class_index + course_index * slots_per_day for course_index in range(course_count)]
+
+
+def solve_partition(weekdays, time_slots, classes, courses):
+    """在子进程中为一组班级选择时段（不考虑教室）
+
+    classes: [(班级序号, 班级, [学生, ...]), ...]
+    返回 {班级: ([每门课程的时段编号，无法安排时为 None], 全班学生的占用位图)}；
+    同班学生一起上课，占用相同，每个班级只需返回一个位图
+    """
+    # 每个班级一间虚拟教室，相当于不限制教室
+    engine = ScheduleEngine(weekdays, time_slots, classrooms=[f"~{index}" for index in range(len(classes))])
+    chosen = {}
+    for class_index, class_name, members in classes:
+        busy = engine.students_busy(members)
+        slots = []
+        for course, start in zip(courses, default_starts(class_index, len(courses), len(engine.time_slots))):
+            section = engine.place_section(class_name, members, course, start, busy)
+            if section is None:
+                slots.append(None)
+                continue
+            busy |= engine.slot_mask(section.slot_index, section.weeks)
+            slots.append(section.slot_index)
+        chosen[class_name] = (slots, busy)
+    return chosen
+
+
+class RoomOccupancy:
+    """教室占用索引：每间教室一个位图，位的排列与学生占用相同（时段 × 周）
+
+    教室按容量从小到大排列。查询某时段某些周空闲、容量不少于 N 的教室时，
+    先用每个时段“全部教室都已占用”的周位图排除已满的时段，再二分跳过容量
+    不足的教室，其余教室各做一次按位与。
+
+    每次占用按 (时段, 周位图) 计数，同一教室同一时段可以被多次占用（同一
+    教学班的多名学生、冲突的课表行），释放到计数为零时才清除对应的位。
+    """
+
+    def __init__(self, classrooms, slot_count):
+        """classrooms: 教室名称或 (教室, 容量) 的列表，容量为 None 表示不限"""
+        rooms = [(room, None) if isinstance(room, str) else tuple(room) for room in classrooms]
+        rooms = [(room, UNLIMITED_CAPACITY if capacity is None else capacity) for room, capacity in rooms]
+        rooms.sort(key=lambda item: item[1])
+        self.rooms = [room for room, _ in rooms]
+        self.capacities = [capacity for _, capacity in rooms]
+        self.capacity = dict(rooms)
+        self.busy = defaultdict(int)
+        # 教室 -> {(时段, 周位图): 占用次数}
+        self.holds = defaultdict(dict)
+        # 每个时段所有教室都已占用的周位图
+        self.slot_full = [0] * slot_count
+
+    def occupy(self, room, slot_index, weeks, count=1, refresh=True):
+        """占用 count 次；refresh 为假时由调用方随后对涉及的时段调用 update_slot_full"""
+        holds = self.holds[room]
+        key = (slot_index, weeks)
+        holds[key] = holds.get(key, 0) + count
+        self.busy[room] |= weeks << (slot_index * WEEK_STRIDE)
+        if refresh:
+            self.update_slot_full(slot_index)
+
+    def release(self, room, slot_index, weeks, count=1, refresh=True):
+        holds = self.holds[room]
+        key = (slot_index, weeks)
+        left = holds.get(key, 0) - count
+        if left > 0:
+            holds[key] = left
+            return
+        holds.pop(key, None)
+        # 同一时段可能还有其他周位图的占用，按剩余的占用重新计算该时段的位
+        shift = slot_index * WEEK_STRIDE
+        remaining = 0
+        for (other_slot, other_weeks) in holds:
+            if other_slot == slot_index:
+                remaining |= other_weeks
+        slot_bits = ((1 << WEEK_STRIDE) - 1) << shift
+        self.busy[room] = self.busy[room] & ~slot_bits | remaining << shift
+        if refresh:
+            self.update_slot_full(slot_index)
+
+    def update_slot_full(self, slot_index):
+        shift = slot_index * WEEK_STRIDE
+        full = (1 << WEEK_STRIDE) - 1
+        for room in self.rooms:
+            full &= self.busy[room] >> shift
+            if not full:
+                break
+        self.slot_full[slot_index] = full
+
+    def iter_free(self, slot_index, weeks, min_capacity=0):
+        """按容量从小到大逐间返回在该时段这些周都空闲、容量足够的教室"""
+        if self.slot_full[slot_index] & weeks:
+            return
+        mask = weeks << (slot_index * WEEK_STRIDE)
+        busy = self.busy
+        for index in range(bisect_left(self.capacities, min_capacity), len(self.rooms)):
+            room = self.rooms[index]
+            if not busy[room] & mask:
+                yield room
+
+    def free_rooms(self, slot_index, weeks, min_capacity=0):
+        return list(self.iter_free(slot_index, weeks, min_capacity))
+
+    def find_room(self, slot_index, weeks, min_capacity=0):
+        """容量足够的最小空闲教室，没有时返回 None"""
+        return next(self.iter_free(slot_index, weeks, min_capacity), None)
+
+
+class ScheduleResult:
+    """排课结果：rows 为待插入的课表行，unplaced 为无法安排的 (班级, 课程)"""
+
+    def __init__(self):
+        self.rows = []
+        self.unplaced = []
+
+
+class Section:
+    """教学班：同一班级在同一时段、同一教室上同一门课的一组学生"""
+    __slots__ = ("class_name", "course_name", "credit", "semester", "weeks", "slot_index", "room", "members")
+
+    def __init__(self, class_name, course_name, credit, semester, weeks, slot_index, room):
+        self.class_name = class_name
+        self.course_name = course_name
+        self.credit = credit
+        self.semester = semester
+        self.weeks = weeks
+        self.slot_index = slot_index
+        self.room = room
+        self.members = set()
+
+
+class ScheduleEngine:
+    """带硬约束的排课引擎
+
+    同一班级的学生按“教学班”一起上同一门课：为每个 (班级, 课程) 选择一个
+    时段和一间教室，使教学班内所有学生在该时段的相应周次都空闲，且教室
+    在这些周次未被其他教学班占用。
+
+    引擎保留已安排的教学班，可在学生或课程变化时只增删受影响的部分。
+    """
+
+    def __init__(self, weekdays=None, time_slots=None, classrooms=None):
+        """classrooms: 教室名称或 (教室, 容量) 的列表，省略时使用默认教室且不限容量"""
+        self.weekdays = list(weekdays or WEEKDAYS)
+        self.time_slots = list(time_slots or TIME_SLOTS)
+        # 时段编号 -> (星期, 行课时间)
+        self.slots = [(day, slot) for day in self.weekdays for slot in self.time_slots]
+        self.slot_index_of = {slot: index for index, slot in enumerate(self.slots)}
+        self.student_busy = defaultdict(int)
+        self.rooms = RoomOccupancy(classrooms or DEFAULT_CLASSROOMS, len(self.slots))
+        # (班级, 课程) -> [Section]，学生 -> [Section]
+        self.sections = defaultdict(list)
+        self.student_sections = defaultdict(list)
+
+    def slot_mask(self, slot_index, weeks):
+        return weeks << (slot_index * WEEK_STRIDE)
+
+    def students_busy(self, students):
+        """一组学生占用情况的并集"""
+        return reduce(or_, (self.student_busy[name] for name in students), 0)
+
+    def find_slot(self, students, weeks, start=0, busy=None):
+        """为一组学生寻找可用的 (时段编号, 教室)，教室容量不少于学生人数，找不到时返回 None
+
+        busy 为这组学生已知的占用并集，省略时现场计算。
+        """
+        if busy is None:
+            busy = self.students_busy(students)
+        slot_count = len(self.slots)
+        size = len(students)
+        for offset in range(slot_count):
+            slot_index = (start + offset) % slot_count
+            if busy & self.slot_mask(slot_index, weeks):
+                continue
+            room = self.rooms.find_room(slot_index, weeks, size)
+            if room is not None:
+                return slot_index, room
+        return None
+
+    def free_rooms(self, weekday, time_slot, weeks, min_capacity=0):
+        """某星期、时段在 weeks 周位图内都空闲且容量足够的教室，按容量从小到大"""
+        slot_index = self.slot_index_of.get((weekday, time_slot))
+        if slot_index is None:
+            return []
+        return self.rooms.free_rooms(slot_index, weeks, min_capacity)
+
+    def update_rooms(self, rows, release=False):
+        """按课表行登记或释放教室占用，不建立教学班，供只需查询空闲教室时使用
+
+        rows: [(教室, 星期, 行课时间, 周位图, 行数)]，没有教室、星期或行课时间的行忽略。
+        """
+        touched = set()
+        for room, weekday, time_slot, weeks, count in rows:
+            slot_index = self.slot_index_of.get((weekday, time_slot))
+            if not room or slot_index is None:
+                continue
+            if release:
+                self.rooms.release(room, slot_index, weeks, count, refresh=False)
+            else:
+                self.rooms.occupy(room, slot_index, weeks, count, refresh=False)
+            touched.add(slot_index)
+        for slot_index in touched:
+            self.rooms.update_slot_full(slot_index)
+
+    def open_section(self, class_name, course_name, credit, semester, weeks, slot_index, room):
+        """登记一个教学班并占用其教室"""
+        section = Section(class_name, course_name, credit, semester, weeks, slot_index, room)
+        self.rooms.occupy(room, slot_index, weeks)
+        self.sections[(class_name, course_name)].append(section)
+        return section
+
+    def close_section(self, section):
+        """撤销一个教学班并释放其教室"""
+        for name in list(section.members):
+            self.leave_section(section, name)
+        self.rooms.release(section.room, section.slot_index, section.weeks)
+        key = (section.class_name, section.course_name)
+        self.sections[key].remove(section)
+        if not self.sections[key]:
+            del self.sections[key]
+
+    def join_section(self, section, name):
+        self.student_busy[name] |= self.slot_mask(section.slot_index, section.weeks)
+        section.members.add(name)
+        self.student_sections[name].append(section)
+
+    def leave_section(self, section, name):
+        self.student_busy[name] &= ~self.slot_mask(section.slot_index, section.weeks)
+        section.members.discard(name)
+        self.student_sections[name].remove(section)
+        if not self.student_sections[name]:
+            del self.student_sections[name]
+            self.student_busy.pop(name, None)
+
+    def section_rows(self, section, members):
+        weekday, time_slot = self.slots[section.slot_index]
+        return [(name, section.course_name, section.credit, weekday, time_slot, section.room, section.semester)
+                for name in members]
+
+    def place_section(self, class_name, members, course, start, busy=None):
+        """为一组学生安排一门课，返回新的教学班，无法安排时返回 None"""
+        course_name, credit, semester = course
+        weeks = week_mask(semester)
+        placement = self.find_slot(members, weeks, start, busy)
+        if placement is None:
+            return None
+        slot_index, room = placement
+        section = self.open_section(class_name, course_name, credit, semester, weeks, slot_index, room)
+        mask = self.slot_mask(slot_index, weeks)
+        student_busy, student_sections = self.student_busy, self.student_sections
+        for name in members:
+            student_busy[name] |= mask
+            student_sections[name].append(section)
+        section.members.update(members)
+        return section
+
+    def place(self, class_name, members, course, start, result, busy=None):
+        """为一组学生安排一门课，结果追加到 result，返回新的教学班或 None"""
+        section = self.place_section(class_name, members, course, start, busy)
+        if section is None:
+            result.unplaced.append((class_name, course[0]))
+        else:
+            result.rows.extend(self.section_rows(section, members))
+        return section
+
+    def assign_rooms(self, class_name, members, courses, course_weeks, slots, busy_bits, starts, result):
+        """按子进程为一个班级选好的时段只分配教室，全班学生的占用最后一次性登记
+
+        course_weeks 为各门课程的周位图（所有班级共用，只解析一次），
+        slots 为每门课程选好的时段（None 表示子进程也无法安排），busy_bits 为
+        子进程算出的全班占用。所选时段没有容量足够的空闲教室时，从该时段起
+        顺延寻找其他时段，此时全班占用按实际安排重新累加。
+        """
+        busy = self.students_busy(members)
+        class_bits = 0
+        moved = False
+        sections = []
+        size = len(members)
+        for (course_name, credit, semester), weeks, slot_index, start in zip(courses, course_weeks, slots, starts):
+            room = None
+            if slot_index is not None and not busy & self.slot_mask(slot_index, weeks):
+                room = self.rooms.find_room(slot_index, weeks, size)
+            if room is None:
+                moved = True
+                placement = self.find_slot(members, weeks, start if slot_index is None else slot_index, busy)
+                if placement is None:
+                    result.unplaced.append((class_name, course_name))
+                    continue
+                slot_index, room = placement
+            section = self.open_section(class_name, course_name, credit, semester, weeks, slot_index, room)
+            section.members.update(members)
+            mask = self.slot_mask(slot_index, weeks)
+            busy |= mask
+            class_bits |= mask
+            sections.append(section)
+            result.rows.extend(self.section_rows(section, members))
+        if not moved:
+            class_bits = busy_bits
+        student_busy, student_sections = self.student_busy, self.student_sections
+        for name in members:
+            student_busy[name] |= class_bits
+            student_sections[name].extend(sections)
+
+    def place_class(self, class_name, members, courses, starts, result):
+        """依次为一个班级安排多门课程，starts 为每门课开始搜索的时段"""
+        # 排课过程中只有本班学生的占用会变化，并集只需计算一次再逐步累加
+        busy = self.students_busy(members)
+        for course, start in zip(courses, starts):
+            section = self.place(class_name, members, course, start, result, busy)
+            if section is not None:
+                busy |= self.slot_mask(section.slot_index, section.weeks)
+
+    def load(self, rows):
+        """从已有课表重建占用情况
+
+        rows: [(学生, 班级, 课程, 学分, 星期, 行课时间, 教室, 周数), ...]
+        没有星期或行课时间的行不占用时段。
+        """
+        for name, class_name, course_name, credit, weekday, time_slot, room, semester in rows:
+            slot_index = self.slot_index_of.get((weekday, time_slot))
+            if slot_index is None:
+                continue
+            class_name = class_name or ""
+            for section in self.sections.get((class_name, course_name), ()):
+                if section.slot_index == slot_index and section.room == room:
+                    break
+            else:
+                section = self.open_section(class_name, course_name, credit, semester,
+                                            week_mask(semester), slot_index, room)
+            self.join_section(section, name)
+
+    def solve(self, students, courses, progress=None):
+        """排课
+
+        students: [(学生, 班级), ...]
+        courses: [(课程, 学分, 周数), ...]
+        progress: 可选，每排完一个班级调用 progress(已完成班级数, 班级总数)
+        返回 ScheduleResult，rows 的列顺序为
+        (学生, 课程, 学分, 星期, 行课时间, 教室, 周数)
+        """
+        result = ScheduleResult()
+        classes = group_by_class(students)
+        ordered_courses = order_courses(courses)
+        for class_index, (class_name, members) in enumerate(classes):
+            self.place_class(class_name, members, ordered_courses,
+                             default_starts(class_index, len(ordered_courses), len(self.time_slots)), result)
+            if progress is not None:
+                progress(class_index + 1, len(classes))
+        return result
+
+    def solve_parallel(self, students, courses, max_workers=None, progress=None):
+        """按班级分区并行排课
+
+        各子进程只为自己分到的班级选择时段（班级之间没有共同的学生，
+        互不影响），并返回全班的占用位图；合并阶段在本进程中不再为学生
+        搜索时段，只按选好的时段依次分配教室，所选时段没有空闲教室时再
+        顺延到其他时段。结果与 solve 相同格式。
+        progress 的总数为班级数的两倍，两个阶段各占一半。
+        """
+        max_workers = max_workers or os.cpu_count() or 1
+        classes = group_by_class(students)
+        ordered_courses = order_courses(courses)
+        if max_workers <= 1 or len(classes) <= 1 or len(students) < PARALLEL_MIN_STUDENTS:
+            return self.solve(students, courses, progress)
+
+        # 轮流分配班级，使各分区的人数大致均衡
+        partition_count = min(len(classes), max_workers * 4)
+        partitions = [[] for _ in range(partition_count)]
+        for class_index, (class_name, members) in enumerate(classes):
+            partitions[class_index % partition_count].append((class_index, class_name, members))
+
+        preferred = {}
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+            futures = [pool.submit(solve_partition, self.weekdays, self.time_slots, partition, ordered_courses)
+                       for partition in partitions if partition]
+            try:
+                for future in as_completed(futures):
+                    preferred.update(future.result())
+                    if progress is not None:
+                        progress(len(preferred), len(classes) * 2)
+            except BaseException:
+                # 出错或被取消时不再启动尚未开始的分区
+                for future in futures:
+                    future.cancel()
+                raise
+
+        result = ScheduleResult()
+        course_weeks = [week_mask(semester) for _, _, semester in ordered_courses]
+        for class_index, (class_name, members) in enumerate(classes):
+            slots, busy_bits = preferred[class_name]
+            self.assign_rooms(class_name, members, ordered_courses, course_weeks, slots, busy_bits,
+                              default_starts(class_index, len(ordered_courses), len(self.time_slots)), result)
+            if progress is not None:
+                progress(len(classes) + class_index + 1, len(classes) * 2)
+        return result
+
+    def add_student(self, name, class_name, courses):
+        """新增一名学生：优先加入本班已有的教学班，冲突时单独安排"""
+        result = ScheduleResult()
+        class_name = class_name or ""
+        for course_index, course in enumerate(courses):
+            course_name = course[0]
+            for section in self.sections.get((class_name, course_name), ()):
+                if (not self.student_busy[name] & self.slot_mask(section.slot_index, section.weeks)
+                        and len(section.members) < self.rooms.capacity.get(section.room, UNLIMITED_CAPACITY)):
+                    self.join_section(section, name)
+                    result.rows.extend(self.section_rows(section, [name]))
+                    break
+            else:
+                self.place(class_name, [name], course, course_index * len(self.time_slots), result)
+        return result
+
+    def remove_student(self, name):
+        """删除一名学生，人数为零的教学班同时释放教室"""
+        for section in list(self.student_sections.get(name, ())):
+            self.leave_section(section, name)
+            if not section.members:
+                self.close_section(section)
+
+    def add_course(self, course, classes):
+        """新增一门课程：为每个班级安排一个教学班
+
+        classes: {班级: [学生, ...]}
+        """
+        result = ScheduleResult()
+        for class_index, (class_name, members) in enumerate(sorted(classes.items())):
+            self.place(class_name or "", members, course, class_index, result)
+        return result
+
+    def remove_course(self, course_name):
+        for key in [key for key in self.sections if key[1] == course_name]:
+            for section in list(self.sections.get(key, ())):
+                self.close_section(section)
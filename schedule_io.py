@@ -0,0 +1,415 @@
+"""课表文件的导入导出（不依赖 Qt）
+
+Excel 以 openpyxl 只读模式按块读取，每块在 DataFrame 上整列转换后用
+executemany 批量写入并单独提交，内存占用只与块大小有关，与文件大小无关。
+导出时用 fetchmany 分块读取查询结果，写入 write_only 模式的工作簿。
+SQLite 文件用备份接口整库复制，或 ATTACH 后以 INSERT ... SELECT 合并，
+数据不经过 Python。
+
+耗时的函数都接受可选的 progress(已完成, 总数) 回调，总数未知时为 0；
+回调抛出的异常会中止操作，后台任务借此实现取消。
+
+pandas 与 openpyxl 导入较慢，在用到的函数中才导入，不拖慢程序启动。
+"""
+import io
+import multiprocessing
+import os
+import re
+import sqlite3
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby, islice
+from operator import itemgetter
+from pathlib import Path
+
+import schedule_db
+
+# 每块读取并写入的行数
+IMPORT_CHUNK_ROWS = 5000
+EXPORT_CHUNK_ROWS = 5000
+# 批量导出时每个子任务生成的文件数
+EXPORT_BATCH_FILES = 64
+# 备份接口每一步复制的页数，步与步之间汇报进度、响应取消
+BACKUP_PAGES = 1024
+
+
+def iter_sheet_chunks(sheet, chunk_size=IMPORT_CHUNK_ROWS):
+    """逐块读取只读工作表，第一行为表头，每块为一个 DataFrame"""
+    import pandas as pd
+
+    rows = sheet.iter_rows(values_only=True)
+    header = ["" if cell is None else str(cell).strip() for cell in next(rows, ())]
+    width = len(header)
+    chunk = []
+    for row in rows:
+        row = tuple(row[:width]) + (None,) * (width - len(row))
+        if all(cell is None for cell in row):
+            continue
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield pd.DataFrame(chunk, columns=header)
+            chunk = []
+    if chunk:
+        yield pd.DataFrame(chunk, columns=header)
+
+
+def text_column(df, column):
+    """整列转为去掉首尾空白的字符串，缺失的列或单元格为空串"""
+    import pandas as pd
+
+    if column not in df:
+        return pd.Series("", index=df.index)
+    return df[column].fillna("").astype(str).str.strip()
+
+
+def schedule_chunk_rows(conn, df, student_ids, course_ids):
+    """把一块 Excel 数据转换为课表插入参数，表中没有的学生或课程会自动补录"""
+    import pandas as pd
+
+    students = text_column(df, "学生姓名")
+    courses = text_column(df, "课程名称")
+    keep = students.ne("") & courses.ne("")
+    df, students, courses = df[keep], students[keep], courses[keep]
+
+    classes = text_column(df, "班级")
+    for name, class_name in zip(students, classes):
+        if name not in student_ids:
+            schedule_db.ensure_student(conn, name, class_name, cache=student_ids)
+
+    credits = pd.to_numeric(df["学分"], errors="coerce") if "学分" in df else pd.Series(dtype=float)
+    semesters = text_column(df, "周数")
+    for name in courses[~courses.isin(course_ids)].unique():
+        first = courses.eq(name).idxmax()
+        credit = credits.get(first)
+        schedule_db.ensure_course(conn, name, None if pd.isna(credit) else float(credit),
+                                  semesters[first], cache=course_ids)
+
+    classrooms = text_column(df, "教室")
+    classrooms = classrooms.where(classrooms.eq("") | classrooms.str.startswith("H"), "H" + classrooms)
+    columns = [students.map(student_ids), courses.map(course_ids),
+               text_column(df, "星期"), text_column(df, "行课时间"), classrooms]
+    return [(int(student_id), int(course_id), weekday or None, time_slot or None, classroom or None)
+            for student_id, course_id, weekday, time_slot, classroom in zip(*columns)]
+
+
+def import_schedule_excel(conn, path, chunk_size=IMPORT_CHUNK_ROWS, progress=None):
+    """用 Excel 文件替换课表，返回 (导入行数, 每秒行数)
+
+    清空旧课表和写入各块在同一个事务中，全部读完才提交；文件读到一半出错或
+    被取消时整个事务回滚，数据库保持导入前的课表。
+    """
+    from openpyxl import load_workbook
+
+    start = time.perf_counter()
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        # 只读模式下行数来自工作表的 dimension 记录，缺失时为 None，按总数未知处理
+        total = max((sheet.max_row or 1) - 1, 0)
+        conn.execute("DELETE FROM schedule")
+        student_ids = schedule_db.name_ids(conn, "students", "student_name")
+        course_ids = schedule_db.name_ids(conn, "courses", "course_name")
+        count = read = 0
+        for df in iter_sheet_chunks(sheet, chunk_size):
+            rows = schedule_chunk_rows(conn, df, student_ids, course_ids)
+            conn.executemany(schedule_db.INSERT_SCHEDULE_SQL, rows)
+            count += len(rows)
+            read += len(df)
+            if progress is not None:
+                progress(read, total if total >= read else 0)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        workbook.close()
+
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed if elapsed > 0 else 0.0
+    print(f"导入 {count} 行，用时 {elapsed:.2f} 秒，{rate:.0f} 行/秒")
+    return count, rate
+
+
+def iter_query(conn, sql, params=(), chunk_size=EXPORT_CHUNK_ROWS):
+    """逐行返回查询结果，每次只从游标取 chunk_size 行"""
+    cursor = conn.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield from rows
+
+
+def write_excel(path, headers, rows, total=0, progress=None):
+    """把表头和任意可迭代的行流式写入 xlsx，返回写入的行数"""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(headers)
+    count = 0
+    for row in rows:
+        sheet.append(row)
+        count += 1
+        if progress is not None and count % EXPORT_CHUNK_ROWS == 0:
+            progress(count, total)
+    workbook.save(path)
+    return count
+
+
+def export_schedule_excel(conn, path, chunk_size=EXPORT_CHUNK_ROWS, progress=None):
+    """把整个课表导出为 Excel，列与主表格一致，返回导出的行数"""
+    start = time.perf_counter()
+    total = conn.execute("SELECT COUNT(*) FROM schedule").fetchone()[0]
+    count = write_excel(path, schedule_db.SCHEDULE_HEADERS,
+                        iter_query(conn, schedule_db.SCHEDULE_TABLE_SQL, chunk_size=chunk_size),
+                        total, progress)
+    print(f"导出 {count} 行，用时 {time.perf_counter() - start:.2f} 秒")
+    return count
+
+
+def export_student_schedule(conn, student_name, path):
+    """导出某学生的课程安排，返回导出的行数"""
+    return write_excel(path, schedule_db.STUDENT_SCHEDULE_HEADERS,
+                       iter_query(conn, schedule_db.STUDENT_SCHEDULE_SQL, (student_name,)))
+
+
+def export_class_schedule(conn, class_name, path):
+    """导出某班级全部学生的课程安排，返回导出的行数"""
+    return write_excel(path, schedule_db.STUDENT_SCHEDULE_HEADERS,
+                       iter_query(conn, schedule_db.CLASS_SCHEDULE_SQL, (class_name,)))
+
+
+def safe_file_name(name):
+    """把分组名转换为可用的文件名"""
+    name = re.sub(r'[\\/:*?"<>|\s]+', "_", str(name or "")).strip("._")
+    return name or "未分组"
+
+
+def excel_files(headers, groups):
+    """子进程：把 [(分组名, 行)] 分别写成 xlsx，返回 [(分组名, 文件内容)]"""
+    files = []
+    for name, rows in groups:
+        buffer = io.BytesIO()
+        write_excel(buffer, headers, rows)
+        files.append((name, buffer.getvalue()))
+    return files
+
+
+def iter_groups(rows):
+    """按第一列切分已排序的行，返回 (分组名, 去掉第一列的行)"""
+    for name, group in groupby(rows, key=itemgetter(0)):
+        yield name, [row[1:] for row in group]
+
+
+def iter_batches(items, size):
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            break
+        yield batch
+
+
+def export_grouped_excel(conn, sql, headers, target, max_workers=None, total=0, progress=None):
+    """按查询结果的第一列分组，每组导出一个 xlsx，返回文件数
+
+    查询须按第一列排序，只读一遍、边读边分组；各组的工作簿由进程池并行
+    生成，同时在途的任务数有上限，内存占用与分组数无关。target 以 .zip
+    结尾时写入压缩包，否则写入该目录。total 为预计的分组数，仅用于汇报进度。
+    """
+    start = time.perf_counter()
+    max_workers = max_workers or os.cpu_count() or 1
+    if target.lower().endswith(".zip"):
+        archive = zipfile.ZipFile(target, "w", zipfile.ZIP_STORED)
+        write_file = archive.writestr
+    else:
+        archive = None
+        os.makedirs(target, exist_ok=True)
+
+        def write_file(file_name, data):
+            with open(os.path.join(target, file_name), "wb") as f:
+                f.write(data)
+
+    used_names = set()
+
+    def save(files):
+        for name, data in files:
+            file_name = safe_file_name(name)
+            suffix = 1
+            while file_name in used_names:
+                suffix += 1
+                file_name = f"{safe_file_name(name)}_{suffix}"
+            used_names.add(file_name)
+            write_file(f"{file_name}.xlsx", data)
+        if progress is not None:
+            progress(len(used_names), max(total, len(used_names)))
+
+    batches = iter_batches(iter_groups(iter_query(conn, sql)), EXPORT_BATCH_FILES)
+    try:
+        if max_workers <= 1:
+            for batch in batches:
+                save(excel_files(headers, batch))
+        else:
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as pool:
+                pending = deque()
+                for batch in batches:
+                    pending.append(pool.submit(excel_files, headers, batch))
+                    if len(pending) >= max_workers * 2:
+                        save(pending.popleft().result())
+                while pending:
+                    save(pending.popleft().result())
+    finally:
+        if archive is not None:
+            archive.close()
+
+    print(f"批量导出 {len(used_names)} 个文件，用时 {time.perf_counter() - start:.2f} 秒")
+    return len(used_names)
+
+
+def sqlite_source_queries(conn):
+    """已附加为 src 的文件 -> (学生查询, 课程查询, 课表查询)
+
+    完整的课表数据库直接读取学生、课程表；旧版导出的文件只有一张以姓名和
+    课程名称关联的课表，学生和课程从中提取。
+    """
+    tables = {row[0] for row in conn.execute("SELECT name FROM src.sqlite_master WHERE type = 'table'")}
+    if {"students", "courses", "schedule"} <= tables:
+        return ("SELECT student_name, class_name FROM src.students",
+                "SELECT course_name, credit, semester FROM src.courses",
+                """SELECT ss.student_name, sc.course_name, s.weekday, s.time_slot, s.classroom
+                   FROM src.schedule s
+                   JOIN src.students ss ON s.student_id = ss.id
+                   JOIN src.courses sc ON s.course_id = sc.id""")
+
+    columns = {row[1] for row in conn.execute("PRAGMA src.table_info(schedule)")}
+    if not {"student_name", "course_name"} <= columns:
+        raise ValueError("文件中没有课表数据")
+    credit = "MAX(credit)" if "credit" in columns else "NULL"
+    semester = "MAX(semester)" if "semester" in columns else "NULL"
+    weekday = "weekday" if "weekday" in columns else "NULL AS weekday"
+    return ("""SELECT DISTINCT student_name, NULL FROM src.schedule
+               WHERE student_name IS NOT NULL AND student_name <> ''""",
+            f"""SELECT course_name, {credit}, {semester} FROM src.schedule
+                WHERE course_name IS NOT NULL AND course_name <> '' GROUP BY course_name""",
+            f"SELECT student_name, course_name, {weekday}, time_slot, classroom FROM src.schedule")
+
+
+def merge_attached(conn, replace=False, progress=None):
+    """把已附加为 src 的文件合并到当前数据库，返回新增的课表行数
+
+    数据全部由 INSERT ... SELECT 在 SQLite 内部复制：已有的学生和课程保持不变，
+    与已有安排完全相同的课表行跳过。replace 为真时先清空当前课表。
+    所有语句在一个事务中执行，失败或取消时整体回滚。
+    """
+    students_sql, courses_sql, schedule_sql = sqlite_source_queries(conn)
+    stages = ["清空课表"] if replace else []
+    stages += ["学生", "课程", "课表"]
+
+    def step(stage, sql):
+        if progress is not None:
+            progress(stages.index(stage), len(stages), stage)
+        return conn.execute(sql)
+
+    try:
+        if replace:
+            step("清空课表", "DELETE FROM main.schedule")
+        step("学生", f"INSERT OR IGNORE INTO main.students (student_name, class_name) {students_sql}")
+        step("课程", f"INSERT OR IGNORE INTO main.courses (course_name, credit, semester) {courses_sql}")
+        # 新课程的周次由周数文本解析，只涉及新增的课程
+        schedule_db.update_course_weeks(
+            conn, conn.execute("SELECT id, semester FROM main.courses WHERE start_week IS NULL").fetchall())
+        count = step("课表", f"""
+            INSERT INTO main.schedule (student_id, course_id, weekday, time_slot, classroom)
+            SELECT st.id, c.id, s.weekday, s.time_slot, s.classroom
+            FROM ({schedule_sql}) s
+            JOIN main.students st ON st.student_name = s.student_name
+            JOIN main.courses c ON c.course_name = s.course_name
+            WHERE NOT EXISTS (
+                SELECT 1 FROM main.schedule e
+                WHERE e.student_id = st.id AND e.weekday IS s.weekday
+                  AND e.time_slot IS s.time_slot AND e.course_id = c.id
+            )
+        """).rowcount
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    if progress is not None:
+        progress(len(stages), len(stages), "课表")
+    return count
+
+
+def merge_schedule_sqlite(conn, path, replace=False, progress=None):
+    """把另一个课表数据库或旧版导出文件合并到当前数据库，返回新增的课表行数"""
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"文件不存在: {path}")
+    start = time.perf_counter()
+    conn.commit()
+    conn.execute("ATTACH DATABASE ? AS src", (path,))
+    try:
+        count = merge_attached(conn, replace, progress)
+    finally:
+        conn.execute("DETACH DATABASE src")
+    print(f"合并 {count} 行课表，用时 {time.perf_counter() - start:.2f} 秒")
+    return count
+
+
+def backup_progress(progress):
+    """progress(已完成, 总数) -> Connection.backup 的 (状态, 剩余页数, 总页数) 回调"""
+    if progress is None:
+        return None
+    return lambda status, remaining, total: progress(total - remaining, total)
+
+
+def import_schedule_sqlite(conn, path, progress=None):
+    """用 SQLite 文件替换当前数据库，返回课表行数
+
+    完整的课表数据库用备份接口按页整体复制，再升级到当前表结构；复制完成前
+    当前数据库保持不变，取消时不受影响。旧版导出的文件只替换课表，
+    表中没有的学生或课程会自动补录。
+    """
+    start = time.perf_counter()
+    # 只读打开，文件不存在时报错而不是新建空库
+    source = sqlite3.connect(Path(path).resolve().as_uri() + "?mode=ro", uri=True)
+    try:
+        tables = {row[0] for row in source.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        full = {"students", "courses", "schedule"} <= tables
+        version = schedule_db.schema_version(source)
+        if full:
+            if version > schedule_db.SCHEMA_VERSION:
+                raise sqlite3.DatabaseError(
+                    f"文件的数据库版本 {version} 高于程序支持的版本 {schedule_db.SCHEMA_VERSION}，请升级程序")
+            conn.commit()
+            try:
+                source.backup(conn, pages=BACKUP_PAGES, progress=backup_progress(progress))
+            finally:
+                # 最后一步之后才取消时数据已复制完成，同样要升级表结构；未复制时无事可做
+                schedule_db.migrate(conn)
+    finally:
+        source.close()
+
+    if not full:
+        return merge_schedule_sqlite(conn, path, replace=True, progress=progress)
+    count = conn.execute("SELECT COUNT(*) FROM schedule").fetchone()[0]
+    print(f"导入数据库（{count} 行课表），用时 {time.perf_counter() - start:.2f} 秒")
+    return count
+
+
+def export_schedule_sqlite(conn, path, progress=None):
+    """用备份接口把整个数据库按页复制到 path（覆盖原有内容），返回课表行数"""
+    start = time.perf_counter()
+    conn.commit()
+    target = sqlite3.connect(path)
+    try:
+        conn.backup(target, pages=BACKUP_PAGES, progress=backup_progress(progress))
+        # 当前数据库使用 WAL 日志，导出的文件改回单个文件的回滚日志，便于拷贝
+        target.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        target.close()
+    count = conn.execute("SELECT COUNT(*) FROM schedule").fetchone()[0]
+    print(f"导出数据库（{count} 行课表），用时 {time.perf_counter() - start:.2f} 秒")
+    return count
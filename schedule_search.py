@@ -0,0 +1,187 @@
+"""学生姓名、班级和课程名称的检索索引：前缀、子串和拼音首字母匹配（不依赖 Qt）
+
+每类名称一个 SearchIndex。不同的名称按小写文本和拼音首字母各存一个有序列表，
+前缀查找二分定位后顺序读取，只读到凑够 limit 条为止；子串查找先对查询中各字
+的倒排表求交集，再核对字的顺序。增删改只插入或删除一个名称，不重建索引。
+同一名称可以有多个来源（同班的多个学生、课程表和课程目录中的同名课程），
+按来源计数，最后一个来源去掉时才从索引中删除。
+
+装有 pypinyin 时用它取拼音首字母；没有时按 GB2312 一级汉字的拼音顺序推算，
+另补常见于人名的二级汉字，其余字符原样保留。
+"""
+import bisect
+import functools
+import heapq
+from collections import Counter, defaultdict
+
+import schedule_db
+
+try:
+    from pypinyin import Style, lazy_pinyin
+except ImportError:
+    lazy_pinyin = None
+
+# 每次查询默认返回的候选数
+SEARCH_LIMIT = 10
+# GB2312 一级汉字按拼音排列，各声母第一个字的编码
+GB2312_INITIALS = [0xB0A1, 0xB0C5, 0xB2C1, 0xB4EE, 0xB6EA, 0xB7A2, 0xB8C1, 0xB9FE, 0xBBF7, 0xBFA6, 0xC0AC, 0xC2E8,
+                   0xC4C3, 0xC5B6, 0xC5BE, 0xC6DA, 0xC8BB, 0xC8F6, 0xCBFA, 0xCDDA, 0xCEF4, 0xD1B9, 0xD4D1]
+GB2312_LETTERS = "abcdefghjklmnopqrstwxyz"
+GB2312_LEVEL1_END = 0xD7F9
+# 不在 GB2312 一级汉字中、但常用于人名的字
+EXTRA_INITIALS = {char: letter for letter, chars in {
+    "c": "琛宸璨", "h": "晗皓珩泓", "j": "婧珈瑾璟珏", "k": "恺铠", "l": "璐珞", "m": "淼", "q": "琪琦绮倩",
+    "r": "睿", "s": "铄姝晟", "t": "潼", "w": "玮炜雯", "x": "兮昕煦萱暄璇馨曦羲", "y": "钰瑜昱煜妍懿奕滢",
+    "z": "芷梓祯"}.items() for char in chars}
+
+
+@functools.lru_cache(maxsize=None)
+def char_initial(char):
+    """单个字的拼音首字母；没有 pypinyin 时用 GB2312 推算，推算不出的字原样返回"""
+    if char.isascii():
+        return char.lower()
+    if char in EXTRA_INITIALS:
+        return EXTRA_INITIALS[char]
+    try:
+        code = char.encode("gb2312")
+    except UnicodeEncodeError:
+        return char
+    value = code[0] << 8 | code[1] if len(code) == 2 else 0
+    if GB2312_INITIALS[0] <= value <= GB2312_LEVEL1_END:
+        return GB2312_LETTERS[bisect.bisect_right(GB2312_INITIALS, value) - 1]
+    return char
+
+
+def pinyin_initials(text):
+    """名称的拼音首字母串，如 林悦溪 -> lyx；英文和数字原样保留（转为小写）"""
+    if lazy_pinyin is not None:
+        return "".join(lazy_pinyin(text, style=Style.FIRST_LETTER)).lower()
+    return "".join(char_initial(char) for char in text)
+
+
+class SearchIndex:
+    """一类名称的检索索引：names 为 {来源: 名称}，来源可以是学生 id、课程 id 等"""
+
+    def __init__(self, items=()):
+        self.build(items)
+
+    def __len__(self):
+        return len(self.sources)
+
+    def build(self, items):
+        """一次载入全部 (来源, 名称)，最后统一排序"""
+        self.names = {key: name for key, name in items if name}
+        self.sources = Counter(self.names.values())
+        self.by_text = sorted((name.lower(), name) for name in self.sources)
+        self.by_initials = sorted((pinyin_initials(name), name) for name in self.sources)
+        self.postings = defaultdict(set)
+        for lower, name in self.by_text:
+            for char in set(lower):
+                self.postings[char].add(name)
+
+    def add(self, key, name):
+        """登记或修改一个来源的名称；name 为空时等同于 remove"""
+        if self.names.get(key) == name:
+            return
+        self.remove(key)
+        if not name:
+            return
+        self.names[key] = name
+        self.sources[name] += 1
+        if self.sources[name] == 1:
+            lower = name.lower()
+            bisect.insort(self.by_text, (lower, name))
+            bisect.insort(self.by_initials, (pinyin_initials(name), name))
+            for char in set(lower):
+                self.postings[char].add(name)
+
+    def remove(self, key):
+        name = self.names.pop(key, None)
+        if name is None:
+            return
+        self.sources[name] -= 1
+        if self.sources[name]:
+            return
+        del self.sources[name]
+        lower = name.lower()
+        for entries, entry in ((self.by_text, (lower, name)), (self.by_initials, (pinyin_initials(name), name))):
+            del entries[bisect.bisect_left(entries, entry)]
+        for char in set(lower):
+            names = self.postings[char]
+            names.discard(name)
+            if not names:
+                del self.postings[char]
+
+    @staticmethod
+    def prefix_matches(entries, prefix):
+        index = bisect.bisect_left(entries, (prefix,))
+        while index < len(entries) and entries[index][0].startswith(prefix):
+            yield entries[index][1]
+            index += 1
+
+    def substring_matches(self, query, limit, exclude):
+        """包含 query 的名称中按名称排序的前 limit 个，不含 exclude 中的名称"""
+        postings = [self.postings.get(char) for char in set(query)]
+        if not all(postings):
+            return []
+        # 含有查询中每个字的名称，交集和排除都在集合运算中完成
+        candidates = set.intersection(*postings).difference(exclude)
+        if len(query) > 1:
+            candidates = [name for name in candidates if query in name.lower()]
+        return heapq.nsmallest(limit, candidates)
+
+    def search(self, text, limit=SEARCH_LIMIT):
+        """最多 limit 个候选：名称前缀匹配在前，其次拼音首字母前缀匹配，最后是子串匹配"""
+        query = text.strip().lower()
+        if not query or limit <= 0:
+            return []
+        matches = {}
+        sources = [self.prefix_matches(self.by_text, query)]
+        if query.isascii():
+            sources.append(self.prefix_matches(self.by_initials, query))
+        for names in sources:
+            for name in names:
+                matches[name] = None
+                if len(matches) >= limit:
+                    return list(matches)
+        matches.update(dict.fromkeys(self.substring_matches(query, limit - len(matches), matches)))
+        return list(matches)
+
+
+def load_indexes(conn, catalog=schedule_db.COURSE_CATALOG):
+    """{"student": 姓名索引, "class": 班级索引, "course": 课程索引}
+
+    班级以学生 id 为来源，班级的最后一名学生删除时班级才从索引中去掉；课程
+    索引同时收录课程表和课程目录，目录中的课程以 ("目录", 名称) 为来源。
+    """
+    students = conn.execute("SELECT id, student_name, class_name FROM students").fetchall()
+    courses = [*conn.execute("SELECT id, course_name FROM courses"), *((("目录", name), name) for name in catalog)]
+    return {"student": SearchIndex((student_id, name) for student_id, name, _ in students),
+            "class": SearchIndex((student_id, class_name) for student_id, _, class_name in students),
+            "course": SearchIndex(courses)}
+
+
+def add_new_names(indexes, conn):
+    """补录导入或保存课表时自动新建的学生和课程（id 大于索引中已有的最大 id）"""
+    last_student = max(indexes["student"].names, default=0)
+    for student_id, name, class_name in conn.execute(
+            "SELECT id, student_name, class_name FROM students WHERE id > ?", (last_student,)):
+        indexes["student"].add(student_id, name)
+        indexes["class"].add(student_id, class_name)
+    last_course = max((key for key in indexes["course"].names if isinstance(key, int)), default=0)
+    for course_id, name in conn.execute("SELECT id, course_name FROM courses WHERE id > ?", (last_course,)):
+        indexes["course"].add(course_id, name)
+
+
+def refresh_student(indexes, conn, student_id):
+    """学生添加、修改或删除后更新姓名和班级索引"""
+    row = conn.execute("SELECT student_name, class_name FROM students WHERE id = ?", (student_id,)).fetchone()
+    name, class_name = row or (None, None)
+    indexes["student"].add(student_id, name)
+    indexes["class"].add(student_id, class_name)
+
+
+def refresh_course(indexes, conn, course_id):
+    """课程添加、修改或删除后更新课程索引"""
+    row = conn.execute("SELECT course_name FROM courses WHERE id = ?", (course_id,)).fetchone()
+    indexes["course"].add(course_id, row[0] if row else None)
@@ -0,0 +1,308 @@
+"""本机课表查询服务：asyncio HTTP/JSON 服务，多个窗口共用同一份查询结果
+
+只读查询在一组只读连接上由线程池执行，同一时刻的相同请求只查询一次；
+结果按请求缓存，数据库被任何连接写入后（PRAGMA data_version 变化）整体失效。
+
+    python schedule_server.py serve --db schedule.db --port 8765
+    python schedule_server.py bench --requests 2000 --concurrency 200
+
+接口（GET，返回 JSON）：
+    /student?name=姓名             某学生的课程安排
+    /class?name=班级               某班级的课程安排
+    /weekday-counts?class=班级&week=周  某班级某周每天及每个时段的上课次数
+"""
+import argparse
+import asyncio
+import json
+import random
+import sqlite3
+import sys
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import parse_qs, quote, urlencode, urlsplit
+
+import schedule_db
+from schedule_engine import MAX_WEEK
+
+HOST = "127.0.0.1"
+PORT = 8765
+# 只读连接数，也是同时执行的查询数
+READERS = 4
+# 最多缓存的响应数，超出时丢弃最久未使用的
+CACHE_ENTRIES = 4096
+MAX_HEADER_BYTES = 16 * 1024
+
+
+class QueryError(Exception):
+    """请求参数有误，返回 400"""
+
+
+class ReadPool:
+    """一组只读连接，查询在线程池中执行，每个连接同一时刻只被一个线程使用"""
+
+    def __init__(self, db_path, size=READERS):
+        uri = Path(db_path).resolve().as_uri() + "?mode=ro"
+        self.connections = asyncio.Queue()
+        for _ in range(size):
+            self.connections.put_nowait(sqlite3.connect(uri, uri=True, check_same_thread=False))
+        self.executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="schedule-reader")
+
+    async def run(self, fn, *args):
+        conn = await self.connections.get()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, conn, *args)
+        finally:
+            self.connections.put_nowait(conn)
+
+    def close(self):
+        self.executor.shutdown()
+        while not self.connections.empty():
+            self.connections.get_nowait().close()
+
+
+def student_schedule(conn, params):
+    name = required(params, "name")
+    rows = conn.execute(schedule_db.STUDENT_SCHEDULE_SQL, (name,)).fetchall()
+    return {"student": name, "headers": schedule_db.STUDENT_SCHEDULE_HEADERS, "rows": rows}
+
+
+def class_schedule(conn, params):
+    name = required(params, "name")
+    rows = conn.execute(schedule_db.CLASS_SCHEDULE_SQL, (name,)).fetchall()
+    return {"class": name, "headers": schedule_db.STUDENT_SCHEDULE_HEADERS, "rows": rows}
+
+
+def weekday_counts(conn, params):
+    class_name = required(params, "class")
+    try:
+        week = int(params.get("week", "1"))
+    except ValueError:
+        raise QueryError("week 必须是整数")
+    if not 1 <= week <= MAX_WEEK:
+        raise QueryError(f"week 必须在 1 到 {MAX_WEEK} 之间")
+    counts = schedule_db.slot_counts(conn, class_name, week, schedule_db.WEEKDAYS, schedule_db.TIME_SLOTS)
+    return {"class": class_name, "week": week,
+            "weekdays": dict(zip(schedule_db.WEEKDAYS, map(sum, counts))),
+            "time_slots": schedule_db.TIME_SLOTS, "slots": counts}
+
+
+def required(params, name):
+    value = params.get(name, "")
+    if not value:
+        raise QueryError(f"缺少参数 {name}")
+    return value
+
+
+ROUTES = {
+    "/student": student_schedule,
+    "/class": class_schedule,
+    "/weekday-counts": weekday_counts,
+}
+
+
+class ScheduleServer:
+    """按 (路径, 参数) 缓存编码好的响应，数据库变化后清空缓存"""
+
+    def __init__(self, db_path=schedule_db.DB_PATH, readers=READERS):
+        # 先用普通连接打开一次，确保表结构是最新的，只读连接无法迁移
+        schedule_db.connect(db_path).close()
+        self.pool = ReadPool(db_path, readers)
+        # 专门用于检测其他连接写入的连接，只执行 PRAGMA data_version
+        self.watcher = sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True)
+        self.data_version = self.current_data_version()
+        self.cache = OrderedDict()
+        self.in_flight = {}
+        self.stats = {"requests": 0, "cache_hits": 0, "queries": 0, "invalidations": 0}
+
+    def current_data_version(self):
+        return self.watcher.execute("PRAGMA data_version").fetchone()[0]
+
+    def check_data_version(self):
+        version = self.current_data_version()
+        if version != self.data_version:
+            self.data_version = version
+            self.cache.clear()
+            self.stats["invalidations"] += 1
+
+    async def respond(self, target):
+        """请求路径 -> (状态码, JSON 字节)"""
+        url = urlsplit(target)
+        if url.path == "/stats":
+            return 200, encode(self.stats)
+        route = ROUTES.get(url.path)
+        if route is None:
+            return 404, encode({"error": f"未知接口 {url.path}"})
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        key = (url.path, tuple(sorted(params.items())))
+
+        self.stats["requests"] += 1
+        self.check_data_version()
+        body = self.cache.get(key)
+        if body is not None:
+            self.cache.move_to_end(key)
+            self.stats["cache_hits"] += 1
+            return 200, body
+
+        # 相同的请求正在查询时等待同一个结果
+        future = self.in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self.query(key, route, params))
+            self.in_flight[key] = future
+            future.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        try:
+            return 200, await asyncio.shield(future)
+        except QueryError as e:
+            return 400, encode({"error": str(e)})
+        except sqlite3.Error as e:
+            return 500, encode({"error": str(e)})
+        except Exception as e:
+            # 其他未预料的错误也要返回响应，而不是直接断开连接
+            traceback.print_exc()
+            return 500, encode({"error": f"服务器内部错误: {e}"})
+
+    async def query(self, key, route, params):
+        version = self.data_version
+        self.stats["queries"] += 1
+        body = encode(await self.pool.run(route, params))
+        # 查询期间数据库被修改时结果可能已过期，不放入缓存
+        if version == self.data_version:
+            self.cache[key] = body
+            if len(self.cache) > CACHE_ENTRIES:
+                self.cache.popitem(last=False)
+        return body
+
+    async def handle(self, reader, writer):
+        """处理一个连接上的请求，支持 keep-alive"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                method, target, version = (lines[0].split(" ") + ["", "", ""])[:3]
+                headers = {name.strip().lower(): value.strip()
+                           for name, _, value in (line.partition(":") for line in lines[1:] if line)}
+                if method != "GET":
+                    status, body = 405, encode({"error": "只支持 GET"})
+                else:
+                    status, body = await self.respond(target)
+                keep_alive = (version == "HTTP/1.1" and headers.get("connection", "").lower() != "close")
+                writer.write(b"HTTP/1.1 %d %s\r\nContent-Type: application/json; charset=utf-8\r\n"
+                             b"Content-Length: %d\r\nConnection: %s\r\n\r\n"
+                             % (status, REASONS.get(status, b"OK"), len(body),
+                                b"keep-alive" if keep_alive else b"close") + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def serve(self, host=HOST, port=PORT):
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES, backlog=1024)
+        print(f"课表查询服务已启动: http://{host}:{port}", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.pool.close()
+        self.watcher.close()
+
+
+REASONS = {200: b"OK", 400: b"Bad Request", 404: b"Not Found", 405: b"Method Not Allowed",
+           500: b"Internal Server Error"}
+
+
+def encode(data):
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+async def fetch(path, params=None, host=HOST, port=PORT):
+    """本机客户端：请求一个接口，返回 (状态码, 解析后的 JSON)"""
+    target = quote(path) + (f"?{urlencode(params)}" if params else "")
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode("latin-1"))
+        await writer.drain()
+        head = await reader.readuntil(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        return status, json.loads(await reader.read())
+    finally:
+        writer.close()
+
+
+async def bench(db_path, requests, concurrency, host=HOST, port=PORT):
+    """用随机的学生、班级和周数并发请求服务，返回延迟统计"""
+    conn = schedule_db.connect(db_path)
+    try:
+        students = list(schedule_db.name_ids(conn, "students", "student_name"))
+        classes = [row[0] for row in conn.execute(
+            "SELECT DISTINCT class_name FROM students WHERE class_name IS NOT NULL")]
+    finally:
+        conn.close()
+    if not students or not classes:
+        raise ValueError("数据库中没有学生或班级")
+
+    def random_request():
+        kind = random.randrange(3)
+        if kind == 0:
+            return "/student", {"name": random.choice(students)}
+        if kind == 1:
+            return "/class", {"name": random.choice(classes)}
+        return "/weekday-counts", {"class": random.choice(classes), "week": random.randint(1, 17)}
+
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            status, _ = await fetch(*random_request(), host=host, port=port)
+            latencies.append(time.perf_counter() - start)
+            errors += status != 200
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    _, stats = await fetch("/stats", host=host, port=port)
+    return {"requests": requests, "concurrency": concurrency, "errors": errors,
+            "seconds": round(elapsed, 3), "requests_per_second": round(requests / elapsed, 1),
+            "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+            "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+            "server": stats}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本机课表查询服务")
+    parser.add_argument("--db", default=schedule_db.DB_PATH, help="数据库文件，默认 %(default)s")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="启动服务")
+    serve.add_argument("--readers", type=int, default=READERS, help="只读连接数，默认 %(default)s")
+    load = commands.add_parser("bench", help="并发请求已启动的服务并输出延迟统计（JSON）")
+    load.add_argument("--requests", type=int, default=1000)
+    load.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        server = ScheduleServer(args.db, args.readers)
+        try:
+            asyncio.run(server.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+    else:
+        result = asyncio.run(bench(args.db, args.requests, args.concurrency, args.host, args.port))
+        print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
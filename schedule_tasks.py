@@ -0,0 +1,203 @@
+"""后台任务：在线程池中执行耗时操作，避免界面卡住
+
+任务函数的形式为 fn(conn, *args, progress)，conn 是工作线程自己打开的
+数据库连接。progress(已完成, 总数, 阶段) 把进度发回界面，并在用户点击
+“取消”后抛出 TaskCancelled，使任务在下一次汇报进度时停止。
+"""
+import time
+import traceback
+
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+import schedule_db
+import schedule_trace
+
+# 两次进度汇报之间的最短间隔（秒），避免信号过多拖慢界面
+PROGRESS_INTERVAL = 0.1
+
+
+class TaskCancelled(Exception):
+    """任务被用户取消"""
+
+
+class TaskSignals(QObject):
+    progress = pyqtSignal(int, int, str)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+
+class Task(QRunnable):
+    """在工作线程中打开数据库并执行任务函数，结果通过 signals 发回界面线程"""
+
+    def __init__(self, db_path, fn, args):
+        super().__init__()
+        self.db_path = db_path
+        self.fn = fn
+        self.args = args
+        self.signals = TaskSignals()
+        self.cancel_requested = False
+        self.last_report = 0.0
+
+    def cancel(self):
+        self.cancel_requested = True
+
+    def progress(self, done, total=0, stage=""):
+        if self.cancel_requested:
+            raise TaskCancelled()
+        now = time.perf_counter()
+        if now - self.last_report >= PROGRESS_INTERVAL or done >= total > 0:
+            self.last_report = now
+            self.signals.progress.emit(done, total, stage)
+
+    def run(self):
+        conn = None
+        try:
+            conn = schedule_db.connect(self.db_path)
+            result = self.fn(conn, *self.args, progress=self.progress)
+        except TaskCancelled:
+            if conn is not None:
+                conn.rollback()
+            self.signals.cancelled.emit()
+        except Exception as e:
+            if conn is not None:
+                conn.rollback()
+            traceback.print_exc()
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+        finally:
+            if conn is not None:
+                conn.close()
+
+
+class TaskRunner(QObject):
+    """一次执行一个后台任务，在窗口状态栏显示进度、预计剩余时间和取消按钮"""
+    # 写入数据库的任务开始 (True) 和结束 (False) 时发出，界面据此暂停编辑和筛选
+    writing_changed = pyqtSignal(bool)
+
+    def __init__(self, window, db_path=schedule_db.DB_PATH):
+        super().__init__(window)
+        self.window = window
+        self.db_path = db_path
+        self.pool = QThreadPool(self)
+        # 前台任务之外至少再留一个线程给 submit 的辅助任务
+        self.pool.setMaxThreadCount(max(2, self.pool.maxThreadCount()))
+        self.helpers = []
+        self.task = None
+        self.writing = False
+        self.title = ""
+        self.stage = ""
+        self.started = self.stage_started = 0.0
+
+        status_bar = window.statusBar()
+        self.progress_bar = QtWidgets.QProgressBar()
+        self.progress_bar.setMaximumWidth(200)
+        self.cancel_btn = QtWidgets.QPushButton("取消")
+        self.cancel_btn.clicked.connect(self.cancel)
+        status_bar.addPermanentWidget(self.progress_bar)
+        status_bar.addPermanentWidget(self.cancel_btn)
+        self.progress_bar.hide()
+        self.cancel_btn.hide()
+
+    def busy(self):
+        return self.task is not None
+
+    def start(self, title, fn, *args, on_finished=None, on_cancelled=None, writes=False):
+        """在后台执行 fn(conn, *args, progress)；已有任务在执行时返回 False
+
+        writes 为 True 表示任务会写入数据库，执行期间发出 writing_changed。
+        """
+        if self.task is not None:
+            QtWidgets.QMessageBox.warning(self.window, "提示", f"请等待“{self.title}”完成或取消后再试")
+            return False
+
+        task = Task(self.db_path, fn, args)
+        task.signals.progress.connect(self.on_progress)
+        task.signals.finished.connect(lambda result: self.on_finished(result, on_finished))
+        task.signals.failed.connect(self.on_failed)
+        task.signals.cancelled.connect(lambda: self.on_cancelled(on_cancelled))
+        self.task = task
+        self.title = title
+        self.stage = ""
+        self.started = self.stage_started = time.perf_counter()
+
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.show()
+        self.cancel_btn.setEnabled(True)
+        self.cancel_btn.show()
+        self.window.statusBar().showMessage(f"{title}...")
+        if writes:
+            self.writing = True
+            self.writing_changed.emit(True)
+        self.pool.start(task)
+        return True
+
+    def submit(self, task):
+        """在同一线程池中执行不显示进度的辅助任务（如重建索引），关闭窗口时同样取消并等待"""
+        self.helpers.append(task)
+        for signal in (task.signals.finished, task.signals.failed):
+            signal.connect(lambda _: self.helpers.remove(task))
+        task.signals.cancelled.connect(lambda: self.helpers.remove(task))
+        self.pool.start(task)
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.cancel_btn.setEnabled(False)
+            self.window.statusBar().showMessage(f"正在取消{self.title}...")
+
+    def on_progress(self, done, total, stage):
+        if self.task is None or self.task.cancel_requested:
+            return
+        now = time.perf_counter()
+        # 各阶段速度不同，剩余时间按当前阶段的速度估算
+        if stage != self.stage:
+            self.stage = stage
+            self.stage_started = now
+        label = f"{self.title}{f'（{stage}）' if stage else ''}"
+        if total > 0:
+            self.progress_bar.setRange(0, total)
+            self.progress_bar.setValue(min(done, total))
+            message = f"{label}: {done}/{total}"
+            elapsed = now - self.stage_started
+            if done > 0 and elapsed > 0:
+                message += f"，预计剩余 {elapsed / done * (total - done):.0f} 秒"
+        else:
+            self.progress_bar.setRange(0, 0)
+            message = f"{label}: {done}"
+        self.window.statusBar().showMessage(message)
+
+    def finish(self, message):
+        schedule_trace.TRACER.add_span(f"后台任务：{self.title}", time.perf_counter() - self.started)
+        self.task = None
+        if self.writing:
+            self.writing = False
+            self.writing_changed.emit(False)
+        self.progress_bar.hide()
+        self.cancel_btn.hide()
+        self.window.statusBar().showMessage(message, 5000)
+        print(message)
+
+    def on_finished(self, result, callback):
+        self.finish(f"{self.title}完成，用时 {time.perf_counter() - self.started:.1f} 秒")
+        if callback is not None:
+            callback(result)
+
+    def on_failed(self, message):
+        title = self.title
+        self.finish(f"{title}失败")
+        QtWidgets.QMessageBox.critical(self.window, "错误", f"{title}失败: {message}")
+
+    def on_cancelled(self, callback):
+        self.finish(f"{self.title}已取消")
+        if callback is not None:
+            callback()
+
+    def shutdown(self):
+        """关闭窗口时取消正在执行的任务和辅助任务，并等待其结束"""
+        for task in [self.task, *self.helpers]:
+            if task is not None:
+                task.cancel()
+        self.pool.waitForDone()
@@ -0,0 +1,245 @@
+"""性能跟踪：记录每条 SQL 的耗时和行数，以及各项操作的耗时（不依赖 Qt）
+
+enable() 之后 schedule_db.connect 打开的连接都是 TracedConnection，执行语句
+和读取结果的时间、返回的行数按语句文本汇总；操作耗时用 span() 或 traced
+装饰器记录。summary() 给出最慢的操作和查询，dump() 把汇总和最近的记录写成
+JSON，便于从用户的机器上收集慢会话的信息。所有记录由一个锁保护，后台线程
+中的连接也可以使用。
+"""
+import functools
+import json
+import platform
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import schedule_db
+
+# 保留的最近记录条数
+RECENT_EVENTS = 2000
+# 汇总时语句文本的最大长度
+SQL_KEY_LENGTH = 300
+# 遍历游标时每批读取的行数
+ITER_BATCH = 256
+
+
+def normalize_sql(sql):
+    return re.sub(r"\s+", " ", str(sql)).strip()[:SQL_KEY_LENGTH]
+
+
+class Stats:
+    __slots__ = ("count", "seconds", "max_seconds", "rows")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+
+    def as_dict(self, name):
+        return {"name": name, "count": self.count, "seconds": round(self.seconds, 6),
+                "max_ms": round(self.max_seconds * 1000, 3),
+                "avg_ms": round(self.seconds * 1000 / self.count, 3) if self.count else 0.0,
+                "rows": self.rows}
+
+
+class Tracer:
+    """按名称汇总操作和查询的耗时，并保留最近的若干条记录"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.spans = {}
+            self.queries = {}
+            self.recent = deque(maxlen=RECENT_EVENTS)
+
+    def add_span(self, name, seconds):
+        with self.lock:
+            stats = self.spans.setdefault(name, Stats())
+            stats.count += 1
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            self.recent.append({"type": "span", "name": name, "at": round(time.time() - self.started, 3),
+                                "ms": round(seconds * 1000, 3), "thread": threading.current_thread().name})
+
+    def add_query(self, sql, seconds, rows):
+        """累计一条语句执行和读取结果的总耗时与行数"""
+        with self.lock:
+            stats = self.queries.get(sql)
+            if stats is None:
+                stats = self.queries[sql] = Stats()
+            stats.count += 1
+            self.recent.append({"type": "query", "name": sql, "at": round(time.time() - self.started, 3),
+                                "ms": round(seconds * 1000, 3), "thread": threading.current_thread().name})
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.rows += rows
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, time.perf_counter() - start)
+
+    def summary(self, limit=20, key="max_seconds"):
+        """按单次最长耗时（或 key 指定的字段）排序的最慢操作和查询"""
+        with self.lock:
+            spans = sorted(self.spans.items(), key=lambda item: getattr(item[1], key), reverse=True)
+            queries = sorted(self.queries.items(), key=lambda item: getattr(item[1], key), reverse=True)
+            return {"spans": [stats.as_dict(name) for name, stats in spans[:limit]],
+                    "queries": [stats.as_dict(sql) for sql, stats in queries[:limit]]}
+
+    def dump(self, path, limit=200):
+        """把汇总和最近的记录写入 JSON 文件"""
+        report = {"started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+                  "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+                  "platform": platform.platform(), **self.summary(limit)}
+        with self.lock:
+            report["recent"] = list(self.recent)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return report
+
+
+TRACER = Tracer()
+
+
+class TracedCursor(sqlite3.Cursor):
+    """在游标内累计当前语句执行和读取结果的耗时与行数，读完、再次执行或关闭时
+    才记入 TRACER 一次，逐行读取时不占用 TRACER 的锁"""
+
+    sql = None
+    seconds = 0.0
+    rows = 0
+
+    def flush(self):
+        if self.sql is not None:
+            TRACER.add_query(self.sql, self.seconds, self.rows)
+            self.sql = None
+
+    def begin(self, sql):
+        self.flush()
+        self.sql = normalize_sql(sql)
+        self.seconds = 0.0
+        self.rows = 0
+
+    def fetched(self, start, rows, exhausted):
+        self.seconds += time.perf_counter() - start
+        self.rows += rows
+        if exhausted:
+            self.flush()
+
+    def execute(self, sql, parameters=()):
+        self.begin(sql)
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            # 没有结果集的语句（写入、建表）执行完就记录
+            self.fetched(start, max(self.rowcount, 0), self.description is None)
+
+    def executemany(self, sql, seq_of_parameters):
+        self.begin(sql)
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.fetched(start, max(self.rowcount, 0), True)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self.fetched(start, row is not None, row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        start = time.perf_counter()
+        rows = super().fetchmany(size)
+        self.fetched(start, len(rows), len(rows) < size)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self.fetched(start, len(rows), True)
+        return rows
+
+    def __iter__(self):
+        # for 循环按批读取，计时和计数按批进行，不在每一行上调用 Python 方法
+        while True:
+            rows = self.fetchmany(ITER_BATCH)
+            yield from rows
+            if len(rows) < ITER_BATCH:
+                return
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self.fetched(start, 0, True)
+            raise
+        self.seconds += time.perf_counter() - start
+        self.rows += 1
+        return row
+
+    def close(self):
+        self.flush()
+        super().close()
+
+    def __del__(self):
+        # 只读了一部分结果的游标（如 fetchone()[0]）在释放时记录
+        self.flush()
+
+
+class TracedConnection(sqlite3.Connection):
+    """所有语句都通过 TracedCursor 执行的连接"""
+
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+def enable():
+    """之后由 schedule_db.connect 打开的连接都记录查询耗时"""
+    schedule_db.connection_factory = TracedConnection
+
+
+def span(name):
+    return TRACER.span(name)
+
+
+def traced(name):
+    """把方法的每次调用记录为名为 name 的操作
+
+    PyQt 按槽函数的参数个数决定传入几个信号参数，包装后的函数必须保持
+    原方法的参数个数，因此没有参数的方法单独包装。
+    """
+    def decorate(method):
+        if method.__code__.co_argcount == 1:
+            @functools.wraps(method)
+            def wrapper(self):
+                with TRACER.span(name):
+                    return method(self)
+        else:
+            @functools.wraps(method)
+            def wrapper(self, *args, **kwargs):
+                with TRACER.span(name):
+                    return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
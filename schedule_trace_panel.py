@@ -0,0 +1,85 @@
+"""性能面板：实时显示最慢的操作和查询，可导出为 JSON"""
+from PyQt5 import QtCore, QtWidgets
+from PyQt5.QtWidgets import QFileDialog, QMessageBox
+
+from schedule_trace import TRACER
+
+# 面板打开时的刷新间隔（毫秒）
+REFRESH_MS = 1000
+SORT_KEYS = {"按单次最长耗时": "max_seconds", "按累计耗时": "seconds", "按次数": "count"}
+SPAN_HEADERS = ["操作", "次数", "最长(ms)", "平均(ms)", "累计(秒)"]
+QUERY_HEADERS = ["语句", "次数", "最长(ms)", "平均(ms)", "累计(秒)", "行数"]
+
+
+class TracePanel(QtWidgets.QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("性能面板")
+        self.resize(900, 600)
+        layout = QtWidgets.QVBoxLayout(self)
+
+        toolbar = QtWidgets.QHBoxLayout()
+        self.sort_combobox = QtWidgets.QComboBox(self)
+        self.sort_combobox.addItems(list(SORT_KEYS))
+        self.sort_combobox.currentTextChanged.connect(lambda _: self.refresh())
+        toolbar.addWidget(self.sort_combobox)
+        toolbar.addStretch()
+        clear_btn = QtWidgets.QPushButton("清空", self)
+        clear_btn.clicked.connect(self.clear)
+        toolbar.addWidget(clear_btn)
+        dump_btn = QtWidgets.QPushButton("导出 JSON", self)
+        dump_btn.clicked.connect(self.dump)
+        toolbar.addWidget(dump_btn)
+        layout.addLayout(toolbar)
+
+        layout.addWidget(QtWidgets.QLabel("最慢的操作", self))
+        self.span_table = self.create_table(SPAN_HEADERS)
+        layout.addWidget(self.span_table)
+        layout.addWidget(QtWidgets.QLabel("最慢的查询", self))
+        self.query_table = self.create_table(QUERY_HEADERS)
+        layout.addWidget(self.query_table)
+
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+
+    def create_table(self, headers):
+        table = QtWidgets.QTableWidget(0, len(headers), self)
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        return table
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.timer.start(REFRESH_MS)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        summary = TRACER.summary(key=SORT_KEYS[self.sort_combobox.currentText()])
+        self.fill(self.span_table, [(s["name"], s["count"], s["max_ms"], s["avg_ms"], s["seconds"])
+                                    for s in summary["spans"]])
+        self.fill(self.query_table, [(q["name"], q["count"], q["max_ms"], q["avg_ms"], q["seconds"], q["rows"])
+                                     for q in summary["queries"]])
+
+    def fill(self, table, rows):
+        table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                item = QtWidgets.QTableWidgetItem(str(value))
+                if column == 0:
+                    item.setToolTip(str(value))
+                table.setItem(row, column, item)
+
+    def clear(self):
+        TRACER.clear()
+        self.refresh()
+
+    def dump(self):
+        file_name, _ = QFileDialog.getSaveFileName(self, "导出性能记录", "trace.json", "JSON Files (*.json)")
+        if file_name:
+            TRACER.dump(file_name)
+            QMessageBox.information(self, "成功", f"性能记录已导出到 {file_name}")
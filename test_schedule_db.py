@@ -0,0 +1,37 @@
+"""高频查询执行计划的回归测试：索引被误删或查询改写后不再走索引时失败
+
+    python -m pytest test_schedule_db.py
+"""
+import os
+import tempfile
+import unittest
+
+import schedule_bench
+import schedule_db
+
+
+class QueryPlanTest(unittest.TestCase):
+    def test_empty_database(self):
+        conn = schedule_db.connect(":memory:")
+        try:
+            self.assertEqual(schedule_db.check_query_plans(conn), [])
+        finally:
+            conn.close()
+
+    def test_populated_database(self):
+        # 有数据并收集统计信息后，查询规划器才会按真实的行数选择索引
+        with tempfile.TemporaryDirectory() as work_dir:
+            conn = schedule_db.connect(os.path.join(work_dir, "schedule.db"))
+            try:
+                schedule_bench.generate_data(conn, students=3000, classes=30, courses=12, seed=1)
+                schedule_db.auto_schedule(conn, schedule_db.WEEKDAYS, schedule_db.TIME_SLOTS)
+                self.assertGreater(conn.execute("SELECT COUNT(*) FROM schedule").fetchone()[0], 0)
+                self.assertEqual(schedule_db.check_query_plans(conn), [])
+                conn.execute("ANALYZE")
+                self.assertEqual(schedule_db.check_query_plans(conn), [])
+            finally:
+                conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()